@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+
+import telegram
+from telegram.utils.request import Request
+
+from engine import (
+    MAX_WORKERS, MISSED_TELEGRAM_TOKEN, TELEGRAM_TOKEN, TENANT_MESSAGE,
+    TENANTS_FILE, PollingEngine, load_tenants
+)
+from homework import DECODER, request_api
+from logconfig import setup_logging
+from storage import open_store
+
+
+BACKFILL_CONCURRENCY = 16
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+FETCH_FAILED = 'История с {since} не загружена: {error}'
+BAD_DATE = 'Дата должна быть числом секунд или в формате ISO 8601: {}'
+BAD_RANGE = 'Начало периода {since} должно быть раньше конца {until}.'
+REPORT = (
+    'Аккаунтов: {tenants}, с ошибкой: {failed}. '
+    'Получено работ: {received}, новых статусов: {changed}, '
+    'доставлено: {delivered}.\n'
+    'Время: {elapsed:.1f} с, {tenant_rate:.1f} аккаунтов/с, '
+    '{homework_rate:.1f} работ/с.'
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value):
+    """Переводит дату из аргумента командной строки в Unix-время."""
+    if value.isdigit():
+        return int(value)
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(BAD_DATE.format(value))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def iso(timestamp):
+    """Переводит Unix-время в формат `date_updated` API."""
+    return time.strftime(DATE_FORMAT, time.gmtime(timestamp))
+
+
+def in_period(homework, until):
+    """Проверяет, изменилась ли работа раньше конца периода.
+
+    API знает только нижнюю границу `from_date`, поэтому конец периода
+    применяется к `date_updated` уже полученных работ. Работы без даты
+    считаются изменёнными внутри периода.
+    """
+    updated = homework.get('date_updated')
+    return updated is None or updated < iso(until)
+
+
+class Backfill:
+    """Восстанавливает пропущенные смены статусов за период.
+
+    API принимает только нижнюю границу `from_date` и всегда отдаёт
+    работы до текущего момента, поэтому деление периода на окна лишь
+    повторно скачивало бы одни и те же работы. История каждого аккаунта
+    загружается одним запросом, аккаунты — параллельно, не больше
+    `concurrency` запросов одновременно, а результаты сливаются в индекс
+    статусов. В чаты уходят только смены статусов, которых ещё нет в
+    индексе; доставку, лимиты и предохранители обеспечивает
+    `PollingEngine`.
+    """
+
+    def __init__(self, engine, since, until,
+                 concurrency=BACKFILL_CONCURRENCY, dry_run=False):
+        """Задаёт период загрузки и ограничение параллельности."""
+        self.engine = engine
+        self.since = since
+        self.until = until
+        self.concurrency = concurrency
+        self.dry_run = dry_run
+        self.semaphore = None
+        self.fetched = 0
+        self.failed = 0
+        self.received = 0
+        self.changed = 0
+        self.delivered = 0
+        self.elapsed = 0.0
+
+    async def run(self):
+        """Загружает историю всех аккаунтов и ждёт доставки сообщений."""
+        started = time.monotonic()
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        await self.engine.outbox.start()
+        try:
+            await asyncio.gather(*(
+                self.backfill(tenant)
+                for tenant in self.engine.tenants.values()
+            ))
+        finally:
+            await self.engine.outbox.stop()
+            self.engine.close()
+        self.elapsed = time.monotonic() - started
+        return self
+
+    async def backfill(self, tenant):
+        """Загружает историю аккаунта и сообщает о новых статусах."""
+        engine = self.engine
+        state = engine.state(tenant)
+        homeworks = state.index.diff(await self.fetch(tenant))
+        self.changed += len(homeworks)
+        if self.dry_run or not homeworks:
+            return
+        acks = [
+            await engine.enqueue(tenant, homework) for homework in homeworks
+        ]
+        engine.track(state, homeworks, acks, None)
+        for chats in await state.delivering:
+            self.delivered += all(chats)
+
+    async def fetch(self, tenant):
+        """Загружает работы аккаунта, изменённые внутри периода."""
+        async with self.semaphore:
+            try:
+                response = await self.engine.fetch(
+                    tenant, self.since, request_api
+                )
+                homeworks = DECODER.decode(response).homeworks
+            except Exception as error:
+                self.failed += 1
+                logger.error(TENANT_MESSAGE.format(
+                    tenant=tenant.name, message=FETCH_FAILED.format(
+                        since=iso(self.since), error=error
+                    )
+                ))
+                return []
+        self.fetched += 1
+        self.received += len(homeworks)
+        return [
+            homework for homework in homeworks
+            if in_period(homework, self.until)
+        ]
+
+    def report(self):
+        """Возвращает итоговый отчёт о восстановлении."""
+        elapsed = self.elapsed or float('inf')
+        return REPORT.format(
+            tenants=len(self.engine.tenants), failed=self.failed,
+            received=self.received, changed=self.changed,
+            delivered=self.delivered, elapsed=self.elapsed,
+            tenant_rate=(self.fetched + self.failed) / elapsed,
+            homework_rate=self.received / elapsed,
+        )
+
+
+def parse_args(args=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Восстанавливает смены статусов работ за период.'
+    )
+    parser.add_argument('--since', type=parse_date, required=True,
+                        help='начало периода: Unix-время или ISO 8601')
+    parser.add_argument('--until', type=parse_date, default=int(time.time()),
+                        help='конец периода, по умолчанию — сейчас')
+    parser.add_argument('--tenants', default=TENANTS_FILE,
+                        help='файл аккаунтов')
+    parser.add_argument('--concurrency', type=int,
+                        default=BACKFILL_CONCURRENCY,
+                        help='сколько аккаунтов загружается одновременно')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='только посчитать новые статусы, не отправляя')
+    parsed = parser.parse_args(args)
+    if parsed.since >= parsed.until:
+        parser.error(BAD_RANGE.format(since=parsed.since, until=parsed.until))
+    return parsed
+
+
+def main():
+    """Запускает восстановление статусов для аккаунтов из файла."""
+    args = parse_args()
+    if not TELEGRAM_TOKEN:
+        logger.critical(MISSED_TELEGRAM_TOKEN)
+        raise UnboundLocalError(MISSED_TELEGRAM_TOKEN)
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN, request=Request(con_pool_size=MAX_WORKERS)
+    )
+    engine = PollingEngine(
+        load_tenants(args.tenants), bot, store=open_store(),
+        max_workers=max(args.concurrency, 1)
+    )
+    backfill = asyncio.run(Backfill(
+        engine, args.since, args.until, args.concurrency, args.dry_run
+    ).run())
+    print(backfill.report())
+
+
+if __name__ == '__main__':
+    setup_logging(logging.INFO, stream=sys.stderr)
+    main()
@@ -0,0 +1,128 @@
+"""Скорость проверки ответа API и память записей о работах.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_decoder.py [работ в ответе ...]
+
+Сравниваются прежняя проверка словарей (`check_response` и проверки
+ключей из `parse_status` по каждой работе) и `ResponseDecoder`, который
+проверяет ответ за один проход и строит записи `Homework`. Память —
+прирост по `tracemalloc` для разобранного JSON и для списка записей.
+Отдельно сравнивается разбор тела ответа бэкендами `json` и `orjson`
+и размер тела после gzip.
+"""
+import gzip
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from codec import make_loads, orjson  # noqa: E402
+from decoder import ResponseDecoder  # noqa: E402
+
+SIZES = [int(size) for size in sys.argv[1:]] or [1_000, 10_000, 100_000]
+STATUSES = ('approved', 'reviewing', 'rejected')
+REPEATS = 5
+REPORT = (
+    'работ: {size:>7}, словари: {legacy:,.0f} работ/с, '
+    'декодер: {decoder:,.0f} работ/с, '
+    'память: {dict_memory:,} байт -> {record_memory:,} байт'
+)
+
+JSON_REPORT = (
+    'работ: {size:>7}, json: {json:.1f} мс, orjson: {orjson}, '
+    'тело: {body:,} байт, gzip: {compressed:,} байт'
+)
+
+
+def payload(size):
+    """Возвращает JSON ответа API с `size` работами."""
+    return json.dumps({
+        'homeworks': [{
+            'id': number,
+            'homework_name': f'student__hw{number}.zip',
+            'lesson_name': f'Урок {number}',
+            'reviewer_comment': 'Замечаний нет, отличная работа.',
+            'status': STATUSES[number % len(STATUSES)],
+            'date_updated': '2026-10-17T10:00:00Z',
+        } for number in range(size)],
+        'current_date': 1_700_000_000,
+    })
+
+
+def legacy_check(response):
+    """Повторяет проверки словарей до появления декодера."""
+    if not isinstance(response, dict):
+        raise TypeError
+    if 'homeworks' not in response:
+        raise KeyError
+    if not isinstance(response['homeworks'], list):
+        raise TypeError
+    for homework in response['homeworks']:
+        for key in ('homework_name', 'status'):
+            if key not in homework:
+                raise KeyError(key)
+        if homework['status'] not in STATUSES:
+            raise ValueError
+    return response['homeworks']
+
+
+def throughput(func, response, size):
+    """Возвращает число проверенных работ в секунду."""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func(response)
+    return size * REPEATS / (time.perf_counter() - start)
+
+
+def allocated(func):
+    """Возвращает память, удерживаемую результатом функции."""
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def parse_time(loads, body):
+    """Возвращает среднее время разбора тела в миллисекундах."""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        loads(body)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    """Сравнивает проверку словарей и декодер на ответах разного размера."""
+    decoder = ResponseDecoder(STATUSES)
+    for size in SIZES:
+        body = payload(size)
+        response = json.loads(body)
+        encoded = body.encode()
+        print(JSON_REPORT.format(
+            size=size,
+            json=parse_time(make_loads('json'), encoded),
+            orjson=(
+                f'{parse_time(make_loads("orjson"), encoded):.1f} мс'
+                if orjson else 'не установлен'
+            ),
+            body=len(encoded),
+            compressed=len(gzip.compress(encoded)),
+        ))
+        print(REPORT.format(
+            size=size,
+            legacy=throughput(legacy_check, response, size),
+            decoder=throughput(decoder.decode, response, size),
+            dict_memory=allocated(lambda: json.loads(body)['homeworks']),
+            record_memory=allocated(
+                lambda: decoder.decode(response).homeworks
+            ),
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Задержка итерации опроса, вносимая журналом.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_logging.py [итераций]
+
+Итерация повторяет горячий путь опроса: разбор небольшого ответа API и
+несколько записей в журнал уровня DEBUG и INFO. Сравниваются журнал,
+отключённый уровнем, прежняя настройка `basicConfig` с `FileHandler` и
+форматом с файлом, функцией и строкой вызова, и `setup_logging` с
+очередью в текстовом и JSON-формате. В обоих случаях поток вывода —
+`os.devnull`, чтобы не мерить терминал.
+"""
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logconfig import CALLER_FORMAT, setup_logging  # noqa: E402
+
+ITERATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+BODY = json.dumps({
+    'homeworks': [{
+        'id': number, 'homework_name': f'hw{number}.zip',
+        'status': 'approved', 'date_updated': '2026-10-17T10:00:00Z',
+    } for number in range(5)],
+    'current_date': 1_700_000_000,
+})
+REPORT = (
+    '{name:<16} среднее: {mean:6.1f} мкс, p50: {p50:6.1f} мкс, '
+    'p99: {p99:7.1f} мкс, журнал добавляет: {overhead:6.1f} мкс'
+)
+
+logger = logging.getLogger('homework')
+
+
+def iteration():
+    """Одна итерация опроса с записями в журнал."""
+    response = json.loads(BODY)
+    logger.debug('Ответ API: %d работ.', len(response['homeworks']))
+    logger.debug('В ответе API новые статусы не обнаружены.')
+    logger.info('Опрос завершён, from_date=%s.', response['current_date'])
+
+
+def reset():
+    """Убирает обработчики корневого логгера."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def measure():
+    """Возвращает задержки итераций в микросекундах."""
+    latencies = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        iteration()
+        latencies.append((time.perf_counter() - start) * 1_000_000)
+    latencies.sort()
+    return latencies
+
+
+def legacy(directory, devnull):
+    """Прежняя настройка из `homework.py`: запись на диск в потоке опроса."""
+    logging.basicConfig(
+        level=logging.DEBUG, format=CALLER_FORMAT,
+        handlers=[
+            logging.StreamHandler(devnull),
+            logging.FileHandler(os.path.join(directory, 'legacy.log')),
+        ]
+    )
+
+
+def main():
+    """Сравнивает задержку итерации опроса при разных настройках журнала."""
+    srcfile = logging._srcfile
+    with tempfile.TemporaryDirectory() as directory, \
+            open(os.devnull, 'w') as devnull:
+        setups = [
+            ('выключен', lambda: logging.getLogger().setLevel(
+                logging.CRITICAL
+            )),
+            ('basicConfig', lambda: legacy(directory, devnull)),
+            ('очередь, text', lambda: setup_logging(
+                logging.DEBUG, os.path.join(directory, 'text.log'),
+                stream=devnull
+            )),
+            ('очередь, json', lambda: setup_logging(
+                logging.DEBUG, os.path.join(directory, 'json.log'),
+                fmt='json', stream=devnull
+            )),
+        ]
+        baseline = None
+        for name, setup in setups:
+            reset()
+            logging._srcfile = srcfile
+            listener = setup()
+            latencies = measure()
+            if listener is not None:
+                listener.stop()
+            mean = sum(latencies) / len(latencies)
+            baseline = mean if baseline is None else baseline
+            print(REPORT.format(
+                name=name, mean=mean,
+                p50=latencies[len(latencies) // 2],
+                p99=latencies[int(len(latencies) * 0.99)],
+                overhead=mean - baseline,
+            ))
+        reset()
+
+
+if __name__ == '__main__':
+    main()
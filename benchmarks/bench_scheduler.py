@@ -0,0 +1,84 @@
+"""Микробенчмарк колеса таймеров в сравнении с кучей `heapq`.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_scheduler.py [количество таймеров ...]
+
+Для каждого размера таймеры разносятся по часу с помощью `jitter`,
+затем десятая часть отменяется, а колесо прокручивается до конца часа.
+"""
+import heapq
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import TimingWheel, jitter  # noqa: E402
+
+SIZES = [int(size) for size in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+HORIZON = 3600
+REPORT = (
+    '{name:<6} таймеров: {size:>9}, вставка: {insert:.2f} мкс, '
+    'отмена: {cancel:.2f} мкс, срабатывание: {fire:.2f} мкс, '
+    'всего: {total:.2f} с'
+)
+
+
+def per_op(elapsed, count):
+    """Переводит время серии в микросекунды на операцию."""
+    return elapsed / count * 1_000_000 if count else 0.0
+
+
+def bench_wheel(keys):
+    """Измеряет колесо таймеров."""
+    wheel = TimingWheel(tick=1, start=0)
+    start = time.perf_counter()
+    for key in keys:
+        wheel.schedule(key, jitter(key, HORIZON))
+    inserted = time.perf_counter()
+    for key in keys[::10]:
+        wheel.cancel(key)
+    cancelled = time.perf_counter()
+    fired = len(wheel.advance(HORIZON))
+    finished = time.perf_counter()
+    return inserted - start, cancelled - inserted, finished - cancelled, fired
+
+
+def bench_heap(keys):
+    """Измеряет кучу с ленивой отменой как базовый вариант."""
+    heap = []
+    cancelled_keys = set()
+    start = time.perf_counter()
+    for key in keys:
+        heapq.heappush(heap, (jitter(key, HORIZON), key))
+    inserted = time.perf_counter()
+    for key in keys[::10]:
+        cancelled_keys.add(key)
+    cancelled = time.perf_counter()
+    fired = 0
+    while heap:
+        _, key = heapq.heappop(heap)
+        if key not in cancelled_keys:
+            fired += 1
+    finished = time.perf_counter()
+    return inserted - start, cancelled - inserted, finished - cancelled, fired
+
+
+def main():
+    """Запускает бенчмарк для всех размеров."""
+    for size in SIZES:
+        keys = [f'tenant-{index}' for index in range(size)]
+        for name, bench in (('wheel', bench_wheel), ('heapq', bench_heap)):
+            insert, cancel, fire, fired = bench(keys)
+            print(REPORT.format(
+                name=name, size=size,
+                insert=per_op(insert, size),
+                cancel=per_op(cancel, len(keys[::10])),
+                fire=per_op(fire, fired),
+                total=insert + cancel + fire
+            ))
+
+
+if __name__ == '__main__':
+    main()
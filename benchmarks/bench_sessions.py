@@ -0,0 +1,88 @@
+"""Сравнение `requests.get` и `PooledSession` на локальном сервере.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_sessions.py [количество опросов]
+
+Сервер считает принятые TCP-соединения: каждое новое соединение к
+настоящему API означает TCP и TLS рукопожатие.
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sessions import PooledSession  # noqa: E402
+
+POLLS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+BODY = json.dumps({'homeworks': [], 'current_date': 0}).encode()
+REPORT = (
+    '{name:<14} опросов: {polls}, соединений: {connections}, '
+    'время: {elapsed:.2f} с, на опрос: {per_poll:.3f} мс'
+)
+AVOIDED = 'Рукопожатий сэкономлено на {polls} опросов: {avoided}'
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Отвечает пустым списком работ и поддерживает keep-alive."""
+
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        """Считает новое TCP-соединение и отключает алгоритм Нейгла."""
+        with StandInHandler.lock:
+            StandInHandler.connections += 1
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super().setup()
+
+    def do_GET(self):
+        """Возвращает ответ в формате API домашки."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        """Отключает журнал запросов сервера."""
+
+
+def measure(name, get, url):
+    """Выполняет серию опросов и возвращает число соединений."""
+    StandInHandler.connections = 0
+    start = time.perf_counter()
+    for timestamp in range(POLLS):
+        get(url, params={'from_date': timestamp}, timeout=5).json()
+    elapsed = time.perf_counter() - start
+    print(REPORT.format(
+        name=name, polls=POLLS, connections=StandInHandler.connections,
+        elapsed=elapsed, per_poll=elapsed / POLLS * 1000
+    ))
+    return StandInHandler.connections
+
+
+def main():
+    """Запускает сервер и сравнивает оба способа опроса."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/'
+    try:
+        plain = measure('requests.get', requests.get, url)
+        with PooledSession() as session:
+            pooled = measure('PooledSession', session.get, url)
+    finally:
+        server.shutdown()
+    print(AVOIDED.format(polls=POLLS, avoided=plain - pooled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Пропускная способность и время перезапуска хранилищ состояния.
+
+Запуск из корня репозитория:
+
+    python benchmarks/bench_storage.py [аккаунтов] [работ на аккаунт]
+
+Для каждого бэкенда записываются статусы всех работ и `from_date` всех
+аккаунтов, затем хранилище закрывается и открывается заново.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import LogStore, SQLiteStore  # noqa: E402
+
+TENANTS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+HOMEWORKS = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+REPORT = (
+    '{name:<7} обновлений: {updates}, {rate:,.0f} в секунду; '
+    'перезапуск: {reopen:.1f} мс, размер: {size:,} байт'
+)
+
+
+def bench(name, backend, path):
+    """Записывает состояние и измеряет перезапуск хранилища."""
+    store = backend(path)
+    start = time.perf_counter()
+    updates = 0
+    for tenant in range(TENANTS):
+        tenant_name = f'tenant-{tenant}'
+        index = store.load_index(tenant_name)
+        for homework in range(HOMEWORKS):
+            index.commit({
+                'id': homework, 'homework_name': f'hw{homework}',
+                'status': 'approved', 'date_updated': '2026-10-17T10:00:00Z'
+            })
+        store.save_timestamp(tenant_name, 1_700_000_000 + tenant)
+        updates += HOMEWORKS + 1
+    store.close()
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    backend(path).close()
+    reopen = (time.perf_counter() - start) * 1000
+    size = sum(
+        os.path.getsize(path + suffix) for suffix in ('', '-wal')
+        if os.path.exists(path + suffix)
+    )
+    print(REPORT.format(
+        name=name, updates=updates, rate=updates / elapsed,
+        reopen=reopen, size=size
+    ))
+
+
+def main():
+    """Сравнивает бэкенды на одинаковой нагрузке."""
+    with tempfile.TemporaryDirectory() as directory:
+        bench('sqlite', SQLiteStore, os.path.join(directory, 'state.db'))
+        bench('log', LogStore, os.path.join(directory, 'state.log'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import hashlib
+import logging
+
+import telegram
+
+from coalesce import TELEGRAM_MESSAGE_LIMIT
+from statuses import homework_key
+
+
+BOARD_TITLE = 'Статусы работ:'
+BOARD_LINE = '{label} {name}'
+BOARD_MORE = 'И ещё принятых работ: {count}.'
+BOARD_HIDDEN = 'И ещё работ: {count}.'
+BOARD_LABELS = {
+    'approved': '✅',
+    'reviewing': '👀',
+    'rejected': '❌',
+}
+NOT_MODIFIED = 'message is not modified'
+NOT_FOUND = 'message to edit not found'
+
+BOARD_PUBLISHED = 'Доска статусов опубликована в чате {chat}: {message_id}.'
+BOARD_EDITED = 'Доска статусов в чате {chat} обновлена.'
+BOARD_LOST = 'Доска статусов в чате {chat} не найдена, публикуется новая.'
+PIN_FAILED = 'Не удалось закрепить доску статусов в чате {chat}: {error}'
+
+logger = logging.getLogger(__name__)
+
+
+class StatusBoard:
+    """Одно закреплённое сообщение со статусами всех работ чата.
+
+    Вместо нового сообщения на каждую смену статуса доска перерисовывается
+    из известных статусов и редактируется через `edit_message_text`.
+    Если текст не изменился, Telegram не вызывается вовсе: сравниваются
+    хеши отрисованного и последнего опубликованного текста. Текст не
+    длиннее `limit`: если все работы не помещаются, первыми с доски
+    уходят принятые, а их число пишется последней строкой.
+    """
+
+    def __init__(self, tenant, chat_id, store, limit=TELEGRAM_MESSAGE_LIMIT):
+        """Создаёт доску статусов чата `chat_id` аккаунта `tenant`."""
+        self.tenant = tenant
+        self.chat_id = str(chat_id)
+        self.store = store
+        self.limit = limit
+        self.message_id, self.digest, self.entries = store.load_board(
+            tenant, self.chat_id
+        )
+        self.edits = 0
+        self.skipped = 0
+
+    def render(self, homeworks):
+        """Учитывает новые статусы и возвращает текст или None без изменений.
+
+        None означает, что доска уже показывает этот текст и
+        редактировать её не нужно.
+        """
+        for homework in homeworks:
+            key = homework_key(homework)
+            self.entries.pop(key, None)
+            self.entries[key] = (
+                homework.get('homework_name'), homework.get('status')
+            )
+        text = self.text()
+        if text_digest(text) == self.digest:
+            self.skipped += 1
+            return None
+        return text
+
+    def text(self):
+        """Возвращает текст доски, уложенный в `limit` символов.
+
+        Непринятые работы попадают на доску раньше принятых, а из
+        принятых — сменившие статус позже; строки выводятся по названию
+        работы.
+        """
+        entries = list(self.entries.values())
+        lines = [
+            BOARD_LINE.format(
+                label=BOARD_LABELS.get(status, status), name=name
+            )
+            for name, status in entries
+        ]
+        ranked = sorted(
+            range(len(entries)),
+            key=lambda index: (entries[index][1] == 'approved', -index)
+        )
+        budget = self.limit - len(BOARD_TITLE) - max(
+            len(footer.format(count=len(entries)))
+            for footer in (BOARD_MORE, BOARD_HIDDEN)
+        ) - 2
+        shown = set()
+        for index in ranked:
+            budget -= len(lines[index]) + 1
+            if budget < 0:
+                break
+            shown.add(index)
+        hidden = {entries[index][1] for index in ranked if index not in shown}
+        lines = [BOARD_TITLE] + [
+            lines[index] for index in sorted(
+                shown, key=lambda index: str(entries[index][0])
+            )
+        ]
+        if hidden:
+            lines.append(
+                (BOARD_MORE if hidden == {'approved'} else BOARD_HIDDEN)
+                .format(count=len(entries) - len(shown))
+            )
+        return '\n'.join(lines)
+
+    def publish(self, bot, chat_id, text):
+        """Редактирует доску или публикует и закрепляет новую.
+
+        Ошибки Telegram, кроме «message is not modified», пробрасываются
+        вызывающему, как в `homework.deliver`.
+        """
+        if self.message_id is not None:
+            try:
+                result = bot.edit_message_text(
+                    text, chat_id=chat_id, message_id=self.message_id
+                )
+            except telegram.error.BadRequest as error:
+                reason = str(error).lower()
+                if NOT_MODIFIED in reason:
+                    result = True
+                elif NOT_FOUND in reason:
+                    logger.warning(BOARD_LOST.format(chat=chat_id))
+                    self.message_id = None
+                else:
+                    raise
+            if self.message_id is not None:
+                self.edits += 1
+                logger.debug(BOARD_EDITED.format(chat=chat_id))
+                self.save(text)
+                return result
+        sent_message = bot.send_message(chat_id, text)
+        self.message_id = sent_message.message_id
+        logger.debug(BOARD_PUBLISHED.format(
+            chat=chat_id, message_id=self.message_id
+        ))
+        try:
+            bot.pin_chat_message(
+                chat_id, self.message_id, disable_notification=True
+            )
+        except telegram.error.TelegramError as error:
+            logger.warning(PIN_FAILED.format(chat=chat_id, error=error))
+        self.save(text)
+        return sent_message
+
+    def save(self, text):
+        """Запоминает опубликованный текст и сохраняет доску в хранилище."""
+        self.digest = text_digest(text)
+        self.store.save_board(
+            self.tenant, self.chat_id, self.message_id, self.digest,
+            self.entries
+        )
+
+
+def text_digest(text):
+    """Возвращает хеш текста доски."""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
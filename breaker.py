@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+
+import telegram
+
+from exceptions import CircuitOpenError, NotOkStatusResponseError
+
+
+API_FAILURE_THRESHOLD = int(os.getenv('API_FAILURE_THRESHOLD', 5))
+API_RECOVERY_TIMEOUT = float(os.getenv('API_RECOVERY_TIMEOUT', 120))
+TELEGRAM_FAILURE_THRESHOLD = int(os.getenv('TELEGRAM_FAILURE_THRESHOLD', 5))
+TELEGRAM_RECOVERY_TIMEOUT = float(os.getenv('TELEGRAM_RECOVERY_TIMEOUT', 30))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+CIRCUIT_OPEN = 'Предохранитель "{name}" разомкнут, повтор через {wait:.0f} с.'
+STATE_CHANGED = 'Предохранитель "{name}": {old} -> {new}.'
+
+logger = logging.getLogger(__name__)
+
+
+def is_api_failure(error):
+    """Отличает недоступность API от ошибок отдельного аккаунта."""
+    if isinstance(error, ConnectionError):
+        return True
+    return (
+        isinstance(error, NotOkStatusResponseError)
+        and error.status is not None and error.status >= 500
+    )
+
+
+def is_telegram_failure(error):
+    """Отличает недоступность Telegram от ошибок отдельного чата."""
+    return (
+        isinstance(error, telegram.error.NetworkError)
+        and not isinstance(error, telegram.error.BadRequest)
+    )
+
+
+class CircuitBreaker:
+    """Предохранитель для вызовов внешнего сервиса.
+
+    После `failure_threshold` сбоев подряд предохранитель размыкается, и
+    вызовы сразу завершаются `CircuitOpenError`, не обращаясь к сети.
+    Через `recovery_timeout` секунд пропускается один пробный вызов:
+    успех замыкает цепь, сбой снова размыкает её. Ошибки, для которых
+    `is_failure` возвращает False, считаются успешным ответом сервиса.
+    `on_close` вызывается, когда цепь снова замыкается: сервис
+    восстановился.
+    """
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=60,
+                 is_failure=None, clock=time.monotonic):
+        """Создаёт замкнутый предохранитель с порогом сбоев."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.is_failure = is_failure or (lambda error: True)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.rejected = 0
+        self.on_close = None
+
+    def before_call(self):
+        """Разрешает вызов или выбрасывает `CircuitOpenError`."""
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            wait = self.opened_at + self.recovery_timeout - self.clock()
+            if self.state == OPEN and wait <= 0:
+                self.switch(HALF_OPEN)
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(
+                CIRCUIT_OPEN.format(name=self.name, wait=max(wait, 0))
+            )
+
+    def on_success(self):
+        """Учитывает успешный вызов."""
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+            if self.state != CLOSED:
+                self.switch(CLOSED)
+
+    def on_error(self, error):
+        """Учитывает вызов, завершившийся исключением."""
+        if not self.is_failure(error):
+            self.on_success()
+            return
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if (self.state == HALF_OPEN
+                    or self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                if self.state != OPEN:
+                    self.switch(OPEN)
+
+    def call(self, func, *args, **kwargs):
+        """Вызывает функцию под защитой предохранителя."""
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self.on_error(error)
+            raise
+        self.on_success()
+        return result
+
+    def switch(self, state):
+        """Переводит предохранитель в новое состояние."""
+        logger.warning(STATE_CHANGED.format(
+            name=self.name, old=self.state, new=state
+        ))
+        self.state = state
+        if state == CLOSED and self.on_close is not None:
+            self.on_close()
+
+
+def api_breaker():
+    """Создаёт предохранитель для запросов к API домашки."""
+    return CircuitBreaker(
+        'practicum', API_FAILURE_THRESHOLD, API_RECOVERY_TIMEOUT,
+        is_failure=is_api_failure
+    )
+
+
+def telegram_breaker():
+    """Создаёт предохранитель для отправки сообщений в Telegram."""
+    return CircuitBreaker(
+        'telegram', TELEGRAM_FAILURE_THRESHOLD, TELEGRAM_RECOVERY_TIMEOUT,
+        is_failure=is_telegram_failure
+    )
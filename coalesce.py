@@ -0,0 +1,131 @@
+import asyncio
+import os
+
+from outbox import Message
+
+
+DELIVERY_MODE = os.getenv('DELIVERY_MODE', 'immediate')
+DIGEST_WINDOW = float(os.getenv('DIGEST_WINDOW', 5))
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+DIGEST = 'Обновления статусов работ ({count}):\n{items}'
+DIGEST_ITEM = '• {}'
+UNKNOWN_MODE = 'Неизвестный режим доставки "{name}". Доступны: {names}'
+
+
+class Coalescer:
+    """Объединяет сообщения одного чата за окно в одно сообщение-дайджест.
+
+    Первое сообщение чата открывает окно в `window` секунд; всё, что
+    приходит в чат за это время, уходит в очередь одним сообщением.
+    Подтверждение доставки дайджеста подтверждает каждое вошедшее в него
+    сообщение, поэтому для опроса `put` ведёт себя как `Outbox.put`.
+    """
+
+    def __init__(self, outbox, window=DIGEST_WINDOW,
+                 limit=TELEGRAM_MESSAGE_LIMIT):
+        """Создаёт объединитель сообщений перед очередью `outbox`."""
+        self.outbox = outbox
+        self.window = window
+        self.limit = limit
+        self.pending = {}
+        self.tasks = set()
+        self.merged = 0
+        self.digests = 0
+
+    async def put(self, message):
+        """Добавляет сообщение в окно чата и возвращает подтверждение."""
+        ack = asyncio.get_running_loop().create_future()
+        if message.chat_id not in self.pending:
+            self.pending[message.chat_id] = []
+            task = asyncio.create_task(self.flush_later(message.chat_id))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        self.pending[message.chat_id].append((message, ack))
+        return ack
+
+    async def flush_later(self, chat_id):
+        """Отправляет окно чата в очередь по истечении `window`."""
+        await asyncio.sleep(self.window)
+        await self.flush(chat_id)
+
+    async def flush(self, chat_id):
+        """Отправляет накопленные сообщения чата в очередь."""
+        items = self.pending.pop(chat_id, [])
+        for batch in split(
+            items, self.limit, text=lambda item: item[0].text
+        ):
+            message = batch[0][0] if len(batch) == 1 else self.digest(batch)
+            if len(batch) > 1:
+                self.merged += len(batch)
+                self.digests += 1
+            ack = await self.outbox.put(message)
+            ack.add_done_callback(
+                lambda done, batch=batch: [
+                    item_ack.set_result(done.result())
+                    for _, item_ack in batch if not item_ack.done()
+                ]
+            )
+
+    @staticmethod
+    def digest(batch):
+        """Собирает сообщение-дайджест из сообщений одного чата."""
+        first = batch[0][0]
+        return Message(
+            first.chat_id,
+            digest_text([message.text for message, _ in batch]),
+            kind=first.kind,
+            tenant=first.tenant,
+            timelines=tuple(
+                timeline for message, _ in batch
+                for timeline in message.timelines
+            )
+        )
+
+    def stats(self):
+        """Возвращает число открытых окон и объединённых сообщений."""
+        return {
+            'windows': len(self.pending),
+            'digests': self.digests,
+            'merged': self.merged,
+        }
+
+    async def stop(self):
+        """Отменяет ожидающие окна."""
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+def digest_text(texts):
+    """Собирает текст дайджеста из текстов сообщений."""
+    return DIGEST.format(count=len(texts), items='\n'.join(
+        DIGEST_ITEM.format(text) for text in texts
+    ))
+
+
+def split(items, limit=TELEGRAM_MESSAGE_LIMIT, text=str):
+    """Делит элементы на части, дайджест каждой из которых не длиннее limit."""
+    batch = []
+    length = len(DIGEST)
+    for item in items:
+        item_length = len(DIGEST_ITEM.format(text(item))) + 1
+        if batch and length + item_length > limit:
+            yield batch
+            batch = []
+            length = len(DIGEST)
+        batch.append(item)
+        length += item_length
+    if batch:
+        yield batch
+
+
+def make_notifier(outbox, mode=DELIVERY_MODE, window=DIGEST_WINDOW):
+    """Возвращает стадию доставки вердиктов для выбранного режима."""
+    if mode in ('immediate', 'board'):
+        return outbox
+    if mode == 'digest':
+        return Coalescer(outbox, window)
+    raise ValueError(UNKNOWN_MODE.format(
+        name=mode, names='immediate, digest, board'
+    ))
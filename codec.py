@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+from metrics import decode_seconds
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'orjson' if orjson else 'json')
+
+UNKNOWN_JSON_BACKEND = 'Неизвестный JSON-бэкенд "{name}". Доступны: {names}'
+
+
+class ResponseStats:
+    """Объём ответов API и время их разбора.
+
+    `wire_bytes` — байты, полученные из сети (сжатые, если сервер сжал
+    ответ), `body_bytes` — байты после распаковки.
+    """
+
+    def __init__(self):
+        """Создаёт пустые счётчики ответов."""
+        self.lock = threading.Lock()
+        self.responses = 0
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self.decode_time = 0.0
+        self.decode_max = 0.0
+
+    def add(self, wire_bytes, body_bytes, decode_time):
+        """Учитывает один разобранный ответ."""
+        with self.lock:
+            self.responses += 1
+            self.wire_bytes += wire_bytes
+            self.body_bytes += body_bytes
+            self.decode_time += decode_time
+            self.decode_max = max(self.decode_max, decode_time)
+
+    def stats(self):
+        """Возвращает объём ответов, степень сжатия и время разбора."""
+        with self.lock:
+            return {
+                'backend': JSON_BACKEND,
+                'responses': self.responses,
+                'wire_bytes': self.wire_bytes,
+                'body_bytes': self.body_bytes,
+                'compression': (
+                    self.body_bytes / self.wire_bytes
+                    if self.wire_bytes else 1.0
+                ),
+                'decode_mean': (
+                    self.decode_time / self.responses
+                    if self.responses else 0.0
+                ),
+                'decode_max': self.decode_max,
+            }
+
+
+response_stats = ResponseStats()
+
+
+def make_loads(name=JSON_BACKEND):
+    """Возвращает функцию разбора JSON для выбранного бэкенда."""
+    if name == 'orjson' and orjson is not None:
+        return orjson.loads
+    if name in ('json', 'orjson'):
+        return json.loads
+    raise ValueError(UNKNOWN_JSON_BACKEND.format(
+        name=name, names='orjson, json'
+    ))
+
+
+loads = make_loads()
+
+
+def wire_size(response, body):
+    """Возвращает число байт ответа, полученных из сети."""
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'tell'):
+        try:
+            return raw.tell() or len(body)
+        except (OSError, ValueError):
+            pass
+    length = response.headers.get('Content-Length')
+    return int(length) if length and length.isdigit() else len(body)
+
+
+def decode_json(response, stats=response_stats):
+    """Разбирает JSON ответа быстрым бэкендом и учитывает объём и время.
+
+    Ответы без исходного тела (например, тестовые двойники с одним
+    методом `json`) разбираются их собственным `json()`.
+    """
+    body = getattr(response, 'content', None)
+    if not isinstance(body, bytes):
+        return response.json()
+    started = time.perf_counter()
+    data = loads(body)
+    elapsed = time.perf_counter() - started
+    stats.add(wire_size(response, body), len(body), elapsed)
+    decode_seconds.observe(elapsed)
+    return data
+
+
+def accept_encoding(headers):
+    """Добавляет к заголовкам поддерживаемые способы сжатия ответа.
+
+    `br` объявляется, только если установлен пакет brotli, — иначе
+    urllib3 не смог бы распаковать ответ.
+    """
+    return {'Accept-Encoding': ACCEPT_ENCODING, **headers}
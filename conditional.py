@@ -0,0 +1,117 @@
+import hashlib
+import re
+import threading
+from http import HTTPStatus
+
+from codec import decode_json
+from decoder import Response
+from homework import DECODER, api_params, check_api_error, get_response
+
+
+CURRENT_DATE = re.compile(rb'"current_date"\s*:\s*(-?\d+)')
+
+
+class ConditionalStats:
+    """Сколько опросов обошлись без разбора ответа."""
+
+    def __init__(self):
+        """Создаёт пустые счётчики условных запросов."""
+        self.lock = threading.Lock()
+        self.polls = 0
+        self.not_modified = 0
+        self.unchanged = 0
+
+    def count(self, name):
+        """Учитывает опрос; `name` — путь, которым он прошёл."""
+        with self.lock:
+            self.polls += 1
+            if name is not None:
+                setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """Возвращает число опросов и долю быстрых."""
+        with self.lock:
+            fast = self.not_modified + self.unchanged
+            return {
+                'polls': self.polls,
+                'not_modified': self.not_modified,
+                'unchanged': self.unchanged,
+                'fast_share': fast / self.polls if self.polls else 0.0,
+            }
+
+
+conditional_stats = ConditionalStats()
+
+
+class LastResponse:
+    """Валидаторы и отпечаток последнего ответа API одного аккаунта.
+
+    Если сервер прислал `ETag` или `Last-Modified`, следующий запрос
+    отправляется с `If-None-Match` и `If-Modified-Since`, и ответ 304
+    обходится без тела. Иначе сравнивается хеш тела без `current_date`:
+    при совпадении ответ не разбирается, а используются записи работ,
+    разобранные в прошлый раз.
+    """
+
+    def __init__(self):
+        """Создаёт запись без сохранённого ответа."""
+        self.etag = None
+        self.last_modified = None
+        self.digest = None
+        self.decoded = None
+
+    def headers(self, headers):
+        """Добавляет к заголовкам запроса условия по валидаторам."""
+        if self.decoded is None:
+            return headers
+        conditions = {}
+        if self.etag is not None:
+            conditions['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            conditions['If-Modified-Since'] = self.last_modified
+        return {**headers, **conditions}
+
+    def remember(self, response, digest, decoded):
+        """Запоминает валидаторы, отпечаток и разобранный ответ."""
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self.digest = digest
+        self.decoded = decoded
+
+
+def body_digest(body):
+    """Возвращает хеш тела ответа без меняющегося `current_date`."""
+    return hashlib.blake2b(
+        CURRENT_DATE.sub(b'', body), digest_size=16
+    ).digest()
+
+
+def current_date(body):
+    """Извлекает `current_date` из тела, не разбирая JSON."""
+    match = CURRENT_DATE.search(body)
+    return int(match.group(1)) if match else None
+
+
+def request_changes(client, headers, timestamp, last, stats=conditional_stats):
+    """Запрашивает статусы работ, пропуская разбор неизменного ответа.
+
+    Возвращает `Response` с проверенными записями работ; при ответе 304
+    `current_date` равна None, и `from_date` не сдвигается.
+    """
+    rq_pars = api_params(last.headers(headers), timestamp)
+    response = get_response(
+        client, rq_pars,
+        ok_statuses=(HTTPStatus.OK, HTTPStatus.NOT_MODIFIED)
+    )
+    if response.status_code == HTTPStatus.NOT_MODIFIED and last.decoded:
+        stats.count('not_modified')
+        return Response(last.decoded.homeworks, None)
+    body = getattr(response, 'content', None)
+    digest = body_digest(body) if isinstance(body, bytes) else None
+    if digest is not None and digest == last.digest:
+        stats.count('unchanged')
+        return Response(last.decoded.homeworks, current_date(body))
+    decoded = DECODER.decode(check_api_error(decode_json(response), rq_pars))
+    last.remember(response, digest, decoded)
+    stats.count(None)
+    return decoded
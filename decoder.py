@@ -0,0 +1,133 @@
+import sys
+from collections import namedtuple
+
+from metrics import homeworks_per_response
+
+
+RESPONSE_NOT_DICT = 'Ответ API не соответствует типу словаря: {}'
+HOMEWORKS_NOT_IN_RESPONSE = 'В ответе API нет ключа `homeworks`.'
+HOMEWORK_NOT_LIST = ('Тип данных ответа API под ключом `homeworks` '
+                     'не является списком: {}')
+HOMEWORK_NOT_DICT = 'Данные о домашней работе не являются словарём: {}'
+CURRENT_DATE_NOT_INT = ('Тип данных ответа API под ключом `current_date` '
+                        'не является числом: {}')
+MISSED_HOMEWORK_KEYS = 'В данных о домашней работе нет ожидаемого ключа {}'
+UNEXPERCTED_HOMEWORK_STATUS = 'Неожиданный статус домашней работы: {}'
+
+Response = namedtuple('Response', ('homeworks', 'current_date'))
+
+
+class Homework:
+    """Компактная запись о домашней работе из ответа API.
+
+    Хранит только поля, нужные боту; строки статусов интернированы, так
+    что тысячи записей ссылаются на несколько общих строк. `get` и
+    доступ по ключу повторяют словарь из ответа API, поэтому запись
+    можно передавать туда же, куда раньше передавался словарь.
+    """
+
+    __slots__ = ('id', 'homework_name', 'status', 'date_updated')
+
+    def __init__(self, id, homework_name, status, date_updated=None):
+        """Создаёт запись работы из проверенных полей ответа."""
+        self.id = id
+        self.homework_name = homework_name
+        self.status = status
+        self.date_updated = date_updated
+
+    def get(self, key, default=None):
+        """Возвращает поле записи или `default`, как `dict.get`."""
+        value = getattr(self, key) if key in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        """Возвращает поле записи или выбрасывает KeyError."""
+        if key not in self.__slots__ or getattr(self, key) is None:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        """Проверяет, заполнено ли поле записи."""
+        return key in self.__slots__ and getattr(self, key) is not None
+
+    def __eq__(self, other):
+        """Сравнивает записи по всем полям."""
+        if not isinstance(other, Homework):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name)
+            for name in self.__slots__
+        )
+
+    def __repr__(self):
+        """Возвращает представление записи для журнала."""
+        return 'Homework({})'.format(', '.join(
+            f'{name}={getattr(self, name)!r}' for name in self.__slots__
+        ))
+
+
+class ResponseDecoder:
+    """Проверяет ответ API за один проход и строит записи `Homework`.
+
+    Набор допустимых статусов задаётся один раз при создании. Сообщения
+    об ошибках совпадают с прежними проверками `check_response` и
+    `parse_status`.
+    """
+
+    def __init__(self, statuses):
+        """Запоминает допустимые статусы работ."""
+        self.statuses = {status: sys.intern(status) for status in statuses}
+
+    def decode(self, response):
+        """Возвращает `Response` с записями работ и `current_date`."""
+        if not isinstance(response, dict):
+            raise TypeError(RESPONSE_NOT_DICT.format(type(response)))
+        try:
+            items = response['homeworks']
+        except KeyError:
+            raise KeyError(HOMEWORKS_NOT_IN_RESPONSE) from None
+        if not isinstance(items, list):
+            raise TypeError(HOMEWORK_NOT_LIST.format(type(items)))
+        homeworks_per_response.observe(len(items))
+        return Response(
+            self.homeworks(items),
+            self.current_date(response.get('current_date'))
+        )
+
+    @staticmethod
+    def current_date(value):
+        """Проверяет `current_date`: число или отсутствует."""
+        if value is not None and (
+                not isinstance(value, int) or isinstance(value, bool)):
+            raise TypeError(CURRENT_DATE_NOT_INT.format(type(value)))
+        return value
+
+    def homework(self, item):
+        """Проверяет словарь одной работы и возвращает запись `Homework`."""
+        return self.homeworks([item])[0]
+
+    def homeworks(self, items):
+        """Проверяет словари работ и возвращает записи `Homework`."""
+        statuses = self.statuses
+        records = []
+        append = records.append
+        for item in items:
+            if not isinstance(item, dict):
+                raise TypeError(HOMEWORK_NOT_DICT.format(type(item)))
+            try:
+                name = item['homework_name']
+                status = item['status']
+            except KeyError as error:
+                raise KeyError(
+                    MISSED_HOMEWORK_KEYS.format(*error.args)
+                ) from None
+            try:
+                status = statuses[status]
+            except (KeyError, TypeError):
+                raise ValueError(
+                    UNEXPERCTED_HOMEWORK_STATUS.format(status)
+                ) from None
+            append(Homework(
+                item.get('id'), name, status, item.get('date_updated')
+            ))
+        return records
@@ -0,0 +1,102 @@
+import os
+import time
+from collections import OrderedDict
+
+from statuses import homework_key
+
+
+DEDUPE_TTL = float(os.getenv('DEDUPE_TTL', 3600))
+DEDUPE_SIZE = int(os.getenv('DEDUPE_SIZE', 10000))
+
+
+def error_fingerprint(error, endpoint, tenant=None):
+    """Возвращает отпечаток ошибки: аккаунт, класс ошибки и адрес запроса.
+
+    Текст ошибки не входит в отпечаток: в нём меняются параметры запроса,
+    и одинаковые сбои никогда бы не совпали.
+    """
+    return 'error', tenant, type(error).__name__, endpoint
+
+
+def verdict_key(homework):
+    """Возвращает ключ смены статуса: работа, статус и его дата."""
+    return (
+        homework_key(homework), homework.get('status'),
+        homework.get('date_updated')
+    )
+
+
+def verdict_fingerprint(chat_id, homework):
+    """Возвращает отпечаток вердикта: чат, работа, статус и его дата."""
+    return ('verdict', str(chat_id), *verdict_key(homework))
+
+
+class DedupeCache:
+    """Ограниченный кэш недавно отправленных сообщений.
+
+    Отпечаток живёт `ttl` секунд с момента отправки, и всё это время
+    повторы подавляются. Срок жизни у всех записей одинаковый, поэтому
+    порядок добавления совпадает с порядком устаревания: устаревшие
+    записи снимаются с головы очереди, а при переполнении вытесняется
+    самая старая. Сколько бы ни длился сбой, в кэше не больше `maxsize`
+    записей.
+    """
+
+    def __init__(self, ttl=DEDUPE_TTL, maxsize=DEDUPE_SIZE,
+                 clock=time.monotonic):
+        """Создаёт пустой кэш со сроком жизни `ttl` секунд."""
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def purge(self, now):
+        """Удаляет устаревшие записи."""
+        while self.entries:
+            key, expires = next(iter(self.entries.items()))
+            if expires > now:
+                break
+            del self.entries[key]
+            self.expired += 1
+
+    def seen(self, key):
+        """Проверяет, отправлялось ли сообщение с отпечатком за окно."""
+        self.purge(self.clock())
+        if key in self.entries:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, key):
+        """Запоминает отпечаток отправленного сообщения."""
+        now = self.clock()
+        self.purge(now)
+        self.entries.pop(key, None)
+        self.entries[key] = now + self.ttl
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, key):
+        """Забывает отпечаток, например после сбоя доставки."""
+        self.entries.pop(key, None)
+
+    def __len__(self):
+        """Число запомненных отпечатков."""
+        return len(self.entries)
+
+    def stats(self):
+        """Возвращает размер кэша и счётчики попаданий и вытеснений."""
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expired': self.expired,
+        }
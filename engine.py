@@ -0,0 +1,740 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from dotenv import load_dotenv
+import telegram
+from telegram.utils.request import Request
+
+from board import StatusBoard
+from breaker import api_breaker, telegram_breaker
+from coalesce import DELIVERY_MODE, DIGEST_WINDOW, make_notifier
+from codec import response_stats
+from conditional import LastResponse, conditional_stats, request_changes
+from dedupe import DedupeCache, error_fingerprint, verdict_fingerprint
+from exceptions import (
+    ChatUnreachableError, CircuitOpenError, MessageRejectedError,
+    TooManyRequestsError
+)
+from homework import (
+    CHAT_UNREACHABLE, ENDPOINT, ERROR, LEASE_RENEW_FAILED, NO_NEW_STATUSES,
+    SEND_MESSAGE_ERROR, chat_unreachable, deliver, parse_status, request_api
+)
+from latency import Timeline, latency_tracker
+from leases import open_leases
+from logconfig import setup_logging
+from metrics import (
+    poll_cycle_seconds, poll_sleep_seconds, queue_depth,
+    scheduler_lag_seconds, start_metrics_server
+)
+from outbox import (
+    ERROR as ERROR_MESSAGE, OUTBOX_DURABLE, DurableOutbox, Message, Outbox
+)
+from policy import make_policy
+from ratelimit import api_limiter
+from scheduler import TimingWheel, jitter
+from sender import TELEGRAM_CHAT_RATE, RateLimitedSender
+from sessions import PooledSession
+from statuses import StatusIndex
+from storage import MemoryStore, open_store
+from streaming import API_STREAMING, STREAM_BATCH_SIZE, stream_api
+from subscriptions import Subscriptions
+
+
+load_dotenv()
+
+TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+TENANTS_FILE = os.getenv('TENANTS_FILE', 'tenants.json')
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', 32))
+SCHEDULER_TICK = float(os.getenv('SCHEDULER_TICK', 1))
+SCHEDULER_LAG_WARNING = float(os.getenv('SCHEDULER_LAG_WARNING', 5))
+ENGINE_REPORT_PERIOD = float(os.getenv('ENGINE_REPORT_PERIOD', 60))
+
+TENANT_FIELDS = ('name', 'practicum_token', 'chat_id')
+
+MISSED_TELEGRAM_TOKEN = 'Отсутствует переменная окружения TELEGRAM_TOKEN.'
+TENANTS_NOT_LIST = 'Файл аккаунтов {path} должен содержать список: {type}'
+SUBSCRIBERS_NOT_LIST = 'Подписчики аккаунта №{index} должны быть списком.'
+TENANT_NOT_DICT = 'Описание аккаунта №{index} не является словарём: {type}'
+MISSED_TENANT_KEYS = 'В описании аккаунта №{index} нет ключей: {keys}'
+DUPLICATE_TENANT = 'Аккаунт "{}" описан в файле несколько раз.'
+TENANTS_LOADED = 'Загружено аккаунтов: {count} из файла {path}.'
+TENANT_MESSAGE = '[{tenant}] {message}'
+STILL_DELIVERING = 'Опрос пропущен: сообщения прошлого опроса не доставлены.'
+LEASES_CHANGED = (
+    'Аренда аккаунтов: получено {gained}, отдано {lost}, всего {owned}.'
+)
+THROTTLED = 'API ограничило частоту запросов, опрос замедлен: {}'
+MESSAGE_REJECTED = (
+    'Telegram отклонил сообщение в чат {chat}, повтора не будет: {error}'
+)
+ENGINE_REPORT = (
+    'Очередь: {outbox}. Отправка: {sender}. API: {limiter}. '
+    'Ответы API: {responses}, без разбора: {conditional}. '
+    'Дайджесты: {digests}. Повторы: {dedupe}. '
+    'Пропущено опросов: {skipped}. Задержка вердиктов, с: {latency}.'
+)
+SCHEDULER_LAG = (
+    'Опросы запущены с отставанием до {lag:.1f} с: {count} аккаунтов. '
+    'Среднее отставание за всё время: {mean:.3f} с.'
+)
+
+logger = logging.getLogger(__name__)
+
+Tenant = namedtuple(
+    'Tenant', TENANT_FIELDS + ('subscribers',), defaults=((),)
+)
+
+
+class TenantState:
+    """Изменяемое состояние опроса одного аккаунта."""
+
+    def __init__(self, name, timestamp, index=None):
+        """Создаёт состояние аккаунта с `from_date` `timestamp`."""
+        self.name = name
+        self.timestamp = timestamp
+        self.idle_polls = 0
+        self.changed = False
+        self.failed = False
+        self.reviewing = set()
+        self.index = StatusIndex() if index is None else index
+        self.delivering = None
+        self.polling = False
+        self.reached = set()
+        self.last_response = LastResponse()
+
+    @property
+    def busy(self):
+        """Проверяет, ждут ли доставки сообщения прошлого опроса."""
+        return self.delivering is not None and not self.delivering.done()
+
+    def observe(self, homeworks):
+        """Учитывает результат успешного опроса для политики опроса."""
+        self.failed = False
+        self.changed = bool(homeworks)
+        self.idle_polls = 0 if homeworks else self.idle_polls + 1
+        for homework in homeworks:
+            if homework.get('status') == 'reviewing':
+                self.reviewing.add(homework.get('homework_name'))
+            else:
+                self.reviewing.discard(homework.get('homework_name'))
+
+
+def load_tenants(path):
+    """Читает список аккаунтов из JSON-файла."""
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    if not isinstance(data, list):
+        raise TypeError(TENANTS_NOT_LIST.format(path=path, type=type(data)))
+    tenants = []
+    names = set()
+    for index, item in enumerate(data):
+        if not isinstance(item, dict):
+            raise TypeError(TENANT_NOT_DICT.format(
+                index=index, type=type(item)
+            ))
+        missed_keys = [key for key in TENANT_FIELDS if not item.get(key)]
+        if missed_keys:
+            raise KeyError(MISSED_TENANT_KEYS.format(
+                index=index, keys=missed_keys
+            ))
+        if item['name'] in names:
+            raise ValueError(DUPLICATE_TENANT.format(item['name']))
+        names.add(item['name'])
+        subscribers = item.get('subscribers', [])
+        if not isinstance(subscribers, list):
+            raise TypeError(SUBSCRIBERS_NOT_LIST.format(index=index))
+        tenants.append(Tenant(
+            *(str(item[key]) for key in TENANT_FIELDS),
+            tuple(str(chat_id) for chat_id in subscribers)
+        ))
+    logger.info(TENANTS_LOADED.format(count=len(tenants), path=path))
+    return tenants
+
+
+class PollingEngine:
+    """Опрашивает API домашки для множества аккаунтов в одном процессе.
+
+    Моменты опросов хранит колесо таймеров: старты аккаунтов разнесены
+    по периоду опроса, а каждый сработавший таймер запускает задачу опроса.
+    Блокирующие запросы к API и к Telegram выполняются в общем пуле
+    потоков, поэтому ожидание ответа одного аккаунта не задерживает
+    остальные. Аккаунты с одним токеном опрашиваются как один, а статусы
+    рассылаются всем чатам, подписанным на токен.
+    """
+
+    def __init__(self, tenants, bot, client=None, policy=None,
+                 limiter=api_limiter, store=None, max_workers=MAX_WORKERS,
+                 tick=SCHEDULER_TICK, chat_rate=TELEGRAM_CHAT_RATE,
+                 delivery_mode=DELIVERY_MODE, digest_window=DIGEST_WINDOW,
+                 streaming=API_STREAMING, stream_batch=STREAM_BATCH_SIZE,
+                 durable=OUTBOX_DURABLE, leases=None):
+        """Создаёт движок для аккаунтов `tenants` и бота `bot`."""
+        self.subscriptions = Subscriptions.from_tenants(tenants)
+        self.tenants = {
+            tenant.name: tenant for tenant in self.subscriptions.tenants()
+        }
+        self.bot = bot
+        self.own_client = client is None
+        self.client = (
+            PooledSession(pool_size=max_workers) if client is None else client
+        )
+        self.policy = make_policy() if policy is None else policy
+        self.limiter = limiter
+        self.store = MemoryStore() if store is None else store
+        self.api_breaker = api_breaker()
+        self.telegram_breaker = telegram_breaker()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='engine'
+        )
+        self.states = {}
+        self.wheel = TimingWheel(tick=tick, start=time.monotonic())
+        self.tasks = set()
+        self.sender = RateLimitedSender(self.send, chat_rate=chat_rate)
+        self.leases = leases
+        send = partial(self.sender.send, reserved=True)
+        self.outbox = (
+            DurableOutbox(
+                send, self.store, self.tenants if leases is None else {},
+                ready=self.sender.chat_delay
+            )
+            if durable else Outbox(send, ready=self.sender.chat_delay)
+        )
+        if durable:
+            self.telegram_breaker.on_close = self.outbox.wake
+        self.delivery_mode = delivery_mode
+        self.streaming = streaming
+        self.stream_batch = stream_batch
+        self.boards = {}
+        self.notifier = make_notifier(
+            self.outbox, delivery_mode, digest_window
+        )
+        self.dedupe = DedupeCache()
+        self.polls = 0
+        self.skipped = 0
+        self.reported_at = time.monotonic()
+        self.renewed_at = None
+
+    async def run(self):
+        """Запускает бесконечный опрос всех аккаунтов."""
+        now = time.monotonic()
+        for name in self.tenants:
+            self.wheel.schedule(name, now + jitter(name, self.policy.period))
+        await self.outbox.start()
+        try:
+            while True:
+                started = time.monotonic()
+                await self.renew_leases(started)
+                self.dispatch(time.monotonic())
+                await self.call(self.store.flush)
+                now = time.monotonic()
+                self.report(now)
+                poll_cycle_seconds.observe(now - started)
+                poll_sleep_seconds.set(self.wheel.tick)
+                await asyncio.sleep(self.wheel.tick)
+        finally:
+            if self.notifier is not self.outbox:
+                await self.notifier.stop()
+            await self.outbox.stop()
+            self.close()
+
+    def dispatch(self, now):
+        """Запускает опросы аккаунтов, чьи таймеры сработали к `now`."""
+        due = self.wheel.advance(now)
+        for name, when in due:
+            task = asyncio.create_task(self.poll_scheduled(self.tenants[name]))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            scheduler_lag_seconds.observe(now - when)
+        lag = max((now - when for _, when in due), default=0.0)
+        if lag > SCHEDULER_LAG_WARNING:
+            logger.warning(SCHEDULER_LAG.format(
+                lag=lag, count=len(due), mean=self.wheel.lag.mean
+            ))
+
+    def queue_depths(self):
+        """Возвращает глубину очередей отправки для страницы метрик.
+
+        Вызывается из потока HTTP-сервера, поэтому только читает размеры
+        очередей и не трогает их содержимое.
+        """
+        outbox = self.outbox
+        depths = {
+            ('outbox',): outbox.queue.qsize() if outbox.queue else 0,
+            ('parked',): outbox.parked,
+            ('polls',): len(self.tasks),
+        }
+        if isinstance(outbox, DurableOutbox):
+            depths[('pending',)] = len(outbox.pending)
+        if self.notifier is not outbox:
+            depths[('digest_windows',)] = len(self.notifier.pending)
+        return depths
+
+    def report(self, now):
+        """Раз в `ENGINE_REPORT_PERIOD` секунд журналирует показатели."""
+        if now - self.reported_at < ENGINE_REPORT_PERIOD:
+            return
+        self.reported_at = now
+        logger.info(ENGINE_REPORT.format(
+            outbox=self.outbox.stats(), sender=self.sender.stats(),
+            limiter=self.limiter.stats(), skipped=self.skipped,
+            responses=response_stats.stats(),
+            conditional=conditional_stats.stats(),
+            dedupe=self.dedupe.stats(),
+            latency=latency_tracker.stats(),
+            digests=(
+                self.notifier.stats() if self.notifier is not self.outbox
+                else None
+            )
+        ))
+
+    async def renew_leases(self, now):
+        """Раз в период продления обновляет аренду аккаунтов.
+
+        Перед продлением состояние записывается на диск, чтобы реплика,
+        которая получит отданный аккаунт, продолжила с того же места.
+        Аккаунты, которые сейчас опрашиваются или чьи сообщения ещё
+        доставляются или ждут в очереди `DurableOutbox`, не отдаются.
+        Для полученного аккаунта состояние перечитывается из хранилища.
+        """
+        if self.leases is None or (
+                self.renewed_at is not None
+                and now - self.renewed_at < self.leases.renew_period):
+            return
+        self.renewed_at = now
+        busy = {
+            name for name, state in self.states.items()
+            if state.polling or state.busy
+        }
+        if isinstance(self.outbox, DurableOutbox):
+            busy |= self.outbox.queued_tenants()
+        try:
+            await self.call(self.store.flush)
+            await self.call(self.leases.acquire, list(self.tenants), busy)
+        except Exception as error:
+            logger.warning(LEASE_RENEW_FAILED.format(error))
+            return
+        if self.leases.lost or self.leases.gained:
+            await self.hand_over(self.leases.lost, self.leases.gained)
+            logger.info(LEASES_CHANGED.format(
+                gained=len(self.leases.gained), lost=len(self.leases.lost),
+                owned=len(self.leases.owned)
+            ))
+
+    async def hand_over(self, lost, gained):
+        """Сбрасывает кэш аккаунтов, сменивших реплику."""
+        durable = isinstance(self.outbox, DurableOutbox)
+        for name in lost | gained:
+            self.states.pop(name, None)
+            for key in [key for key in self.boards if key[0] == name]:
+                del self.boards[key]
+        for name in lost:
+            latency_tracker.forget(name)
+            if durable:
+                self.outbox.forget(name)
+        for name in gained:
+            await self.call(self.store.reload, name)
+            if durable:
+                self.outbox.adopt(self.tenants[name])
+
+    def close(self):
+        """Освобождает пул потоков, соединения с API и хранилище.
+
+        Аренда отдаётся после записи состояния, чтобы другая реплика
+        сразу могла продолжить опрос.
+        """
+        self.executor.shutdown(wait=False)
+        self.store.close()
+        if self.leases is not None:
+            self.leases.close()
+        if self.own_client:
+            self.client.close()
+
+    async def call(self, func, *args):
+        """Выполняет блокирующую функцию в пуле потоков."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    def owned(self, tenant):
+        """Проверяет, что аккаунт опрашивает эта реплика."""
+        return self.leases is None or self.leases.owns(tenant.name)
+
+    def state(self, tenant):
+        """Возвращает состояние аккаунта, создавая его при первом опросе."""
+        if tenant.name not in self.states:
+            self.states[tenant.name] = TenantState(
+                tenant.name,
+                self.store.load_timestamp(tenant.name, int(time.time())),
+                self.store.load_index(tenant.name)
+            )
+        return self.states[tenant.name]
+
+    async def poll_scheduled(self, tenant):
+        """Опрашивает аккаунт и планирует его следующий опрос.
+
+        Пока сообщения прошлого опроса не доставлены, опрос пропускается:
+        новый ответ API повторил бы ещё не подтверждённые статусы.
+        Аккаунт, арендованный другой репликой, не опрашивается, в том
+        числе если аренду потеряли, пока шёл опрос.
+        """
+        if not self.owned(tenant):
+            self.wheel.schedule(
+                tenant.name, time.monotonic() + self.leases.renew_period
+            )
+            return
+        if self.state(tenant).busy:
+            self.skipped += 1
+            logger.debug(TENANT_MESSAGE.format(
+                tenant=tenant.name, message=STILL_DELIVERING
+            ))
+        else:
+            await self.poll(tenant)
+        if not self.owned(tenant):
+            self.wheel.schedule(
+                tenant.name, time.monotonic() + self.leases.renew_period
+            )
+            return
+        decision = self.policy.next_delay(self.state(tenant))
+        self.wheel.schedule(tenant.name, time.monotonic() + decision.delay)
+
+    async def fetch(self, tenant, timestamp, request=request_api):
+        """Запрашивает статусы работ через лимитер и предохранитель API."""
+        headers = {'Authorization': f'OAuth {tenant.practicum_token}'}
+        self.api_breaker.before_call()
+        try:
+            await asyncio.sleep(self.limiter.reserve())
+            response = await self.call(
+                request, self.client, headers, timestamp
+            )
+        except Exception as error:
+            self.api_breaker.on_error(error)
+            raise
+        self.api_breaker.on_success()
+        return response
+
+    async def poll(self, tenant):
+        """Выполняет одну итерацию опроса аккаунта.
+
+        Пока идёт опрос, аккаунт не отдаётся другой реплике. Если аренда
+        всё же истекла, пока ответ API загружался, сообщения не
+        ставятся в очередь: аккаунт уже опрашивает новый владелец.
+        """
+        self.polls += 1
+        state = self.state(tenant)
+        state.polling = True
+        try:
+            if self.streaming:
+                return await self.poll_stream(tenant, state)
+            decoded = await self.fetch(
+                tenant, state.timestamp,
+                partial(request_changes, last=state.last_response)
+            )
+            if not self.owned(tenant):
+                return
+            timeline = Timeline(time.time(), tenant=tenant.name)
+            homeworks = state.index.diff(decoded.homeworks)
+            state.observe(homeworks)
+            if not homeworks:
+                logger.debug(TENANT_MESSAGE.format(
+                    tenant=tenant.name, message=NO_NEW_STATUSES
+                ))
+            await self.notify(
+                tenant, state, homeworks,
+                state.timestamp if decoded.current_date is None
+                else decoded.current_date,
+                timeline
+            )
+        except CircuitOpenError as error:
+            state.failed = True
+            logger.debug(TENANT_MESSAGE.format(
+                tenant=tenant.name, message=error
+            ))
+        except Exception as error:
+            state.failed = True
+            await self.report_error(tenant, state, error)
+        finally:
+            state.polling = False
+
+    async def notify(self, tenant, state, homeworks, current_date,
+                     timeline=None):
+        """Ставит сообщения о новых статусах в очередь отправки.
+
+        Статусы попадают в индекс, а `from_date` сдвигается к
+        `current_date` только после подтверждения доставки, как и при
+        синхронной отправке в `homework.main`. Статус считается
+        доставленным, когда его получили все подписанные чаты. В режиме
+        digest сообщения проходят через `Coalescer` и уходят в чат одним
+        дайджестом. Вердикт, уже доставленный в чат, повторно не
+        отправляется. С `DurableOutbox` подтверждением считается запись
+        вердикта в хранилище, и `from_date` сдвигается, не дожидаясь
+        Telegram. По `timeline` с моментом получения ответа учитывается
+        задержка доставки вердиктов.
+        """
+        if self.delivery_mode == 'board' and homeworks:
+            board_acks = [
+                await self.update_board(tenant, chat_id, homeworks)
+                for chat_id in self.subscriptions.chats_of(tenant)
+            ]
+            acks = [asyncio.gather(*board_acks)] * len(homeworks)
+        else:
+            for homework in homeworks:
+                parse_status(homework)
+            if timeline is not None:
+                timeline.stamp('parsed')
+            acks = [
+                await self.enqueue(tenant, homework, timeline)
+                for homework in homeworks
+            ]
+        self.track(state, homeworks, acks, current_date)
+
+    async def poll_stream(self, tenant, state):
+        """Опрашивает аккаунт, разбирая ответ API по мере загрузки.
+
+        Записи забираются из потока пачками по `stream_batch` в пуле
+        потоков, и о каждой изменившейся работе сообщение ставится в
+        очередь сразу, не дожидаясь конца загрузки. При сбое посреди
+        ответа доставленные статусы фиксируются, а `from_date` остаётся
+        прежним. Если аренда аккаунта истекла, чтение ответа
+        прекращается и новые сообщения в очередь не ставятся.
+        """
+        stream = await self.fetch(tenant, state.timestamp, stream_api)
+        fetched = time.time()
+        homeworks = []
+        acks = []
+        current_date = None
+        try:
+            records = iter(stream)
+            while True:
+                batch = await self.call(take, records, self.stream_batch)
+                if not batch:
+                    break
+                if not self.owned(tenant):
+                    return
+                changed = list(filter(state.index.changed, batch))
+                homeworks.extend(changed)
+                timeline = Timeline(
+                    fetched, time.time(), tenant=tenant.name
+                )
+                if self.delivery_mode != 'board':
+                    for homework in changed:
+                        acks.append(
+                            await self.enqueue(tenant, homework, timeline)
+                        )
+            current_date = stream.current_date
+            if current_date is None:
+                current_date = state.timestamp
+        finally:
+            stream.close()
+            state.observe(homeworks)
+            if self.delivery_mode != 'board':
+                self.track(state, homeworks, acks, current_date)
+            elif self.owned(tenant):
+                await self.notify(tenant, state, homeworks, current_date)
+        if not homeworks:
+            logger.debug(TENANT_MESSAGE.format(
+                tenant=tenant.name, message=NO_NEW_STATUSES
+            ))
+
+    async def enqueue(self, tenant, homework, timeline=None):
+        """Ставит вердикт в очередь для всех чатов, подписанных на токен.
+
+        Возвращает future со списком подтверждений по чатам. Задержка
+        доставки в каждый чат учитывается, если передан `timeline`. Чаты,
+        уже получившие вердикт, пока он не зафиксирован, пропускаются:
+        сбой одного чата не повторяет вердикт остальным.
+        """
+        text = parse_status(homework)
+        state = self.state(tenant)
+        acks = []
+        for chat_id in self.subscriptions.chats_of(tenant):
+            fingerprint = verdict_fingerprint(chat_id, homework)
+            if fingerprint in state.reached:
+                acks.append(delivered())
+                continue
+            acks.append(await self.put_once(
+                self.notifier, fingerprint,
+                Message(
+                    chat_id, text, tenant=tenant, key=fingerprint,
+                    timelines=(
+                        () if timeline is None else (timeline.of(homework),)
+                    )
+                )
+            ))
+            acks[-1].add_done_callback(partial(
+                self.on_reached, state, fingerprint
+            ))
+        return asyncio.gather(*acks)
+
+    @staticmethod
+    def on_reached(state, fingerprint, ack):
+        """Запоминает чат, получивший ещё не зафиксированный вердикт."""
+        if ack.result():
+            state.reached.add(fingerprint)
+
+    def track(self, state, homeworks, acks, current_date):
+        """Ждёт подтверждений доставки, чтобы зафиксировать статусы."""
+        state.delivering = asyncio.gather(*acks)
+        state.delivering.add_done_callback(partial(
+            self.on_delivered, state, homeworks, current_date
+        ))
+
+    async def update_board(self, tenant, chat_id, homeworks):
+        """Ставит обновление доски статусов чата в очередь отправки.
+
+        Возвращает подтверждение; если текст доски не изменился, оно
+        завершено сразу и Telegram не вызывается.
+        """
+        if (tenant.name, chat_id) not in self.boards:
+            self.boards[tenant.name, chat_id] = StatusBoard(
+                tenant.name, chat_id, self.store
+            )
+        board = self.boards[tenant.name, chat_id]
+        text = board.render(homeworks)
+        if text is None:
+            return delivered()
+        return await self.outbox.put(Message(
+            chat_id, text, tenant=tenant, board=board
+        ))
+
+    async def put_once(self, queue, fingerprint, message):
+        """Ставит сообщение в очередь, если оно не отправлялось за окно.
+
+        Отпечаток запоминается сразу, чтобы параллельные опросы не
+        отправили повтор, и забывается, если доставка не удалась.
+        """
+        if self.dedupe.seen(fingerprint):
+            return delivered()
+        self.dedupe.add(fingerprint)
+        ack = await queue.put(message)
+        ack.add_done_callback(partial(self.on_put_once, fingerprint))
+        return ack
+
+    def on_put_once(self, fingerprint, ack):
+        """Разрешает повторить сообщение, если оно не доставлено."""
+        if not ack.result():
+            self.dedupe.discard(fingerprint)
+
+    def on_delivered(self, state, homeworks, current_date, delivering):
+        """Фиксирует доставленные статусы и сдвигает `from_date`.
+
+        Состояние аккаунта, отданного другой реплике, не сохраняется:
+        его `from_date` уже ведёт новый владелец.
+        """
+        if self.states.get(state.name) is not state:
+            return
+        results = [all(chats) for chats in delivering.result()]
+        chats = self.subscriptions.chats_of(self.tenants[state.name])
+        for homework, delivered in zip(homeworks, results):
+            if delivered:
+                state.index.commit(homework)
+                state.reached.difference_update(
+                    verdict_fingerprint(chat_id, homework)
+                    for chat_id in chats
+                )
+        if all(results) and current_date is not None:
+            state.timestamp = current_date
+            self.store.save_timestamp(state.name, state.timestamp)
+
+    async def report_error(self, tenant, state, error):
+        """Журналирует сбой опроса и сообщает о новом сбое в чат.
+
+        Повтор сбоя того же класса в пределах окна кэша в чат не уходит.
+        Ограничение частоты (429/503) студенту не сообщается: как и
+        разомкнутый предохранитель, это состояние API, которое движок
+        переживает сам, замедляя все запросы.
+        """
+        if isinstance(error, TooManyRequestsError):
+            self.limiter.penalize(error.retry_after)
+            logger.warning(TENANT_MESSAGE.format(
+                tenant=tenant.name,
+                message=THROTTLED.format(self.limiter.stats())
+            ))
+            return
+        message_error = ERROR.format(error)
+        logger.error(TENANT_MESSAGE.format(
+            tenant=tenant.name, message=message_error
+        ))
+        await self.put_once(
+            self.outbox,
+            error_fingerprint(error, ENDPOINT, tenant.name),
+            Message(
+                tenant.chat_id, message_error, kind=ERROR_MESSAGE,
+                tenant=tenant
+            )
+        )
+
+    async def send(self, message):
+        """Отправляет сообщение из очереди, не блокируя цикл событий.
+
+        Возвращает отправленное сообщение или None, если Telegram вернул
+        ошибку либо его предохранитель разомкнут. `RetryAfter`
+        пробрасывается отправителю, который учитывает ограничения, а
+        ошибка недоступного чата — очереди как `ChatUnreachableError`.
+        Остальные `BadRequest` при повторе не пройдут и пробрасываются
+        очереди как `MessageRejectedError`.
+        """
+        publish = deliver if message.board is None else message.board.publish
+        try:
+            return await self.call(
+                self.telegram_breaker.call,
+                publish, self.bot, message.chat_id, message.text
+            )
+        except telegram.error.RetryAfter:
+            raise
+        except CircuitOpenError as error:
+            logger.debug(TENANT_MESSAGE.format(
+                tenant=message.tenant.name, message=error
+            ))
+        except telegram.error.TelegramError as error:
+            if chat_unreachable(error):
+                raise ChatUnreachableError(CHAT_UNREACHABLE.format(
+                    chat=message.chat_id, error=error
+                )) from error
+            if isinstance(error, telegram.error.BadRequest):
+                raise MessageRejectedError(MESSAGE_REJECTED.format(
+                    chat=message.chat_id, error=error
+                )) from error
+            logger.exception(SEND_MESSAGE_ERROR.format(message.text, error))
+        return None
+
+
+def take(iterator, count):
+    """Возвращает до `count` следующих элементов итератора."""
+    return list(itertools.islice(iterator, count))
+
+
+def delivered():
+    """Возвращает уже завершённое подтверждение доставки."""
+    ack = asyncio.get_running_loop().create_future()
+    ack.set_result(True)
+    return ack
+
+
+def main():
+    """Запускает опрос API для всех аккаунтов из файла."""
+    if not TELEGRAM_TOKEN:
+        logger.critical(MISSED_TELEGRAM_TOKEN)
+        raise UnboundLocalError(MISSED_TELEGRAM_TOKEN)
+    tenants = load_tenants(sys.argv[1] if len(sys.argv) > 1 else TENANTS_FILE)
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN, request=Request(con_pool_size=MAX_WORKERS)
+    )
+    engine = PollingEngine(
+        tenants, bot, store=open_store(), leases=open_leases()
+    )
+    queue_depth.function = engine.queue_depths
+    start_metrics_server()
+    asyncio.run(engine.run())
+
+
+if __name__ == '__main__':
+    setup_logging(logging.DEBUG)
+    main()
@@ -1,6 +1,40 @@
 class NotOkStatusResponseError(Exception):
     """Вызывается, если код ответа отличен от 200."""
 
+    def __init__(self, message, status=None):
+        """Запоминает код ответа API."""
+        super().__init__(message)
+        self.status = status
+
 
 class ResponseError(Exception):
     """Вызывается, если ответ API не соответствует ожидаемому."""
+
+
+class TooManyRequestsError(NotOkStatusResponseError):
+    """Вызывается, если API просит снизить частоту запросов (429, 503)."""
+
+    def __init__(self, message, status=None, retry_after=None):
+        """Запоминает код ответа и паузу `Retry-After`."""
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+
+class MessageRejectedError(Exception):
+    """Вызывается, если Telegram отклонил сообщение и повтор не поможет.
+
+    Например, текст сообщения слишком длинный или разметка неверна.
+    Такое сообщение не повторяется.
+    """
+
+
+class ChatUnreachableError(MessageRejectedError):
+    """Вызывается, если чат не примет сообщение и при повторе.
+
+    Например, бот заблокирован пользователем, исключён из группы или чат
+    не найден. Такое сообщение не повторяется.
+    """
+
+
+class CircuitOpenError(Exception):
+    """Вызывается, если предохранитель сервиса разомкнут."""
@@ -1,13 +1,35 @@
 import logging
 import os
-import sys
+import threading
 import time
+from http import HTTPStatus
 
 from dotenv import load_dotenv
 import requests
 import telegram
 
-from exceptions import NotOkStatusResponseError, ResponseError
+from board import StatusBoard
+from coalesce import DELIVERY_MODE, digest_text, split
+from codec import accept_encoding, decode_json
+from decoder import (
+    MISSED_HOMEWORK_KEYS, UNEXPERCTED_HOMEWORK_STATUS, Homework,
+    ResponseDecoder
+)
+from dedupe import DedupeCache, error_fingerprint, verdict_key
+from exceptions import (
+    NotOkStatusResponseError, ResponseError, TooManyRequestsError
+)
+from latency import Timeline, latency_tracker
+from leases import open_leases
+from logconfig import LOG_FILE, setup_logging
+from metrics import (
+    api_request_seconds, api_requests, poll_cycle_seconds,
+    poll_sleep_seconds, start_metrics_server, telegram_send_seconds,
+    telegram_sends
+)
+from ratelimit import API_DEFAULT_RETRY_AFTER, parse_retry_after
+from sessions import HTTP_TIMEOUT
+from storage import open_store
 
 
 load_dotenv()
@@ -15,6 +37,11 @@ load_dotenv()
 PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+TELEGRAM_SUBSCRIBERS = [
+    chat_id.strip()
+    for chat_id in os.getenv('TELEGRAM_SUBSCRIBERS', '').split(',')
+    if chat_id.strip()
+]
 
 TOKEN_NAMES = (
     'PRACTICUM_TOKEN',
@@ -23,20 +50,37 @@ TOKEN_NAMES = (
 )
 
 RETRY_PERIOD = 600
+STATE_TENANT = 'main'
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
 HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
+THROTTLING_STATUSES = (HTTPStatus.TOO_MANY_REQUESTS,
+                       HTTPStatus.SERVICE_UNAVAILABLE)
+UNREACHABLE_CHAT_REASONS = (
+    'forbidden', 'bot was blocked', 'bot was kicked', 'user is deactivated',
+    'chat not found', 'not enough rights', 'have no rights'
+)
+
 HOMEWORK_VERDICTS = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
+DECODER = ResponseDecoder(HOMEWORK_VERDICTS)
+UNREACHABLE = object()
 
 VERDICT = ('Изменился статус проверки работы "{name}". {verdict}')
 ERROR = 'Сбой в работе программы: {}'
+THROTTLED = (
+    'API ограничило частоту запросов, следующий опрос через '
+    '{delay:.0f} с: {error}'
+)
 MISSED_TOKENS = 'Отсутствуют переменные окружения: {}.'
 MESSAGE_SENT_SUCCESSFULLY = 'Бот отправил сообщение: "{}"'
 SEND_MESSAGE_ERROR = 'Ошибка при отправлении в Telegram сообщения: "{}". {}'
+CHAT_UNREACHABLE = (
+    'Чат {chat} недоступен, сообщение ему не будет доставлено: {error}'
+)
 BAD_REQUEST_ERROR = (
     'Ошибка запроса к API {error}. '
     'Параметры запроса: эндпоинт={url}, headers={headers}, params={params}'
@@ -49,13 +93,9 @@ RESPONSE_ERROR = (
     'Ответ API вернул ошибку: {name}={error}. '
     'Параметры запроса: эндпоинт={url}, headers={headers}, params={params}'
 )
-RESPONSE_NOT_DICT = 'Ответ API не соответствует типу словаря: {}'
-HOMEWORKS_NOT_IN_RESPONSE = 'В ответе API нет ключа `homeworks`.'
-HOMEWORK_NOT_LIST = ('Тип данных ответа API под ключом `homeworks` '
-                     'не является списком: {}')
-MISSED_HOMEWORK_KEYS = 'В данных о домашней работе нет ожидаемого ключа {}'
-UNEXPERCTED_HOMEWORK_STATUS = 'Неожиданный статус домашней работы: {}'
 NO_NEW_STATUSES = 'В ответе API новые статусы не обнаружены.'
+NOT_LEASE_OWNER = 'Опрос пропущен: аккаунт арендован другой репликой.'
+LEASE_RENEW_FAILED = 'Не удалось продлить аренду аккаунтов: {}'
 
 logger = logging.getLogger(__name__)
 
@@ -70,29 +110,105 @@ def check_tokens():
 
 def send_message(bot, message):
     """Отправляет сообщение в Telegram чат."""
+    return send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+def send_to_chat(bot, chat_id, message):
+    """Отправляет сообщение в заданный Telegram чат.
+
+    Возвращает отправленное сообщение, None при сбое, который стоит
+    повторить, или `UNREACHABLE`, если чат сообщение не примет никогда.
+    """
     try:
-        sent_message = bot.send_message(TELEGRAM_CHAT_ID, message)
-        logging.debug(MESSAGE_SENT_SUCCESSFULLY.format(message))
-        return sent_message
+        return deliver(bot, chat_id, message)
     except telegram.error.TelegramError as error:
+        if chat_unreachable(error):
+            logging.error(CHAT_UNREACHABLE.format(chat=chat_id, error=error))
+            return UNREACHABLE
         logging.exception(SEND_MESSAGE_ERROR.format(message, error))
         return None
 
 
+def chat_unreachable(error):
+    """Проверяет, что ошибка Telegram не пройдёт при повторе отправки.
+
+    Это ошибки самого чата: бот заблокирован или исключён, чат не найден,
+    нет прав писать в него. Неверный токен бота сюда не относится: он
+    мешает всем чатам сразу.
+    """
+    return isinstance(
+        error, (telegram.error.Unauthorized, telegram.error.BadRequest)
+    ) and any(
+        reason in str(error).lower() for reason in UNREACHABLE_CHAT_REASONS
+    )
+
+
+def deliver(bot, chat_id, message):
+    """Отправляет сообщение, пробрасывая ошибки Telegram вызывающему."""
+    started = time.perf_counter()
+    try:
+        sent_message = bot.send_message(chat_id, message)
+    except Exception as error:
+        telegram_sends.inc(type(error).__name__)
+        raise
+    finally:
+        telegram_send_seconds.observe(time.perf_counter() - started)
+    telegram_sends.inc('ok')
+    logging.debug(MESSAGE_SENT_SUCCESSFULLY.format(message))
+    return sent_message
+
+
 def get_api_answer(timestamp):
     """Отправляет запрос к API и возвращает данные в json-формате."""
-    rq_pars = dict(
-        url=ENDPOINT, headers=HEADERS, params={'from_date': timestamp}
+    return request_api(requests, HEADERS, timestamp)
+
+
+def request_api(client, headers, timestamp):
+    """Запрашивает статусы работ через HTTP-клиент с методом `get`."""
+    rq_pars = api_params(headers, timestamp)
+    response = get_response(client, rq_pars)
+    return check_api_error(decode_json(response), rq_pars)
+
+
+def api_params(headers, timestamp):
+    """Возвращает параметры запроса статусов работ."""
+    return dict(
+        url=ENDPOINT, headers=accept_encoding(headers),
+        params={'from_date': timestamp}
     )
+
+
+def get_response(client, rq_pars, ok_statuses=(HTTPStatus.OK,), **kwargs):
+    """Выполняет запрос и проверяет код ответа API."""
+    started = time.perf_counter()
     try:
-        response = requests.get(**rq_pars)
+        response = client.get(timeout=HTTP_TIMEOUT, **rq_pars, **kwargs)
     except requests.RequestException as error:
+        api_requests.inc('error')
         raise ConnectionError(BAD_REQUEST_ERROR.format(error=error, **rq_pars))
-    if response.status_code != 200:
-        raise NotOkStatusResponseError(NOT_OK_STATUS_RESPONSE.format(
-            status=response.status_code, **rq_pars
-        ))
-    response = response.json()
+    finally:
+        api_request_seconds.observe(time.perf_counter() - started)
+    api_requests.inc(str(response.status_code))
+    if response.status_code in THROTTLING_STATUSES:
+        raise TooManyRequestsError(
+            NOT_OK_STATUS_RESPONSE.format(
+                status=response.status_code, **rq_pars
+            ),
+            response.status_code,
+            parse_retry_after(response.headers.get('Retry-After'))
+        )
+    if response.status_code not in ok_statuses:
+        raise NotOkStatusResponseError(
+            NOT_OK_STATUS_RESPONSE.format(
+                status=response.status_code, **rq_pars
+            ),
+            response.status_code
+        )
+    return response
+
+
+def check_api_error(response, rq_pars):
+    """Выбрасывает ResponseError, если API вернуло ошибку в теле ответа."""
     for name in ('code', 'error'):
         if name in response:
             raise ResponseError(RESPONSE_ERROR.format(
@@ -102,17 +218,17 @@ def get_api_answer(timestamp):
 
 
 def check_response(response):
-    """Проверка ответа API."""
-    if not isinstance(response, dict):
-        raise TypeError(RESPONSE_NOT_DICT.format(type(response)))
-    if 'homeworks' not in response:
-        raise KeyError(HOMEWORKS_NOT_IN_RESPONSE)
-    if not isinstance(response['homeworks'], list):
-        raise TypeError(HOMEWORK_NOT_LIST.format(type(response["homeworks"])))
+    """Проверка ответа API. Возвращает проверенные записи работ."""
+    return DECODER.decode(response)
 
 
 def parse_status(homework):
     """Извлекает из данных о домашней работе её статус."""
+    if isinstance(homework, Homework):
+        return VERDICT.format(
+            name=homework.homework_name,
+            verdict=HOMEWORK_VERDICTS[homework.status]
+        )
     for key in ('homework_name', 'status'):
         if key not in homework:
             raise KeyError(MISSED_HOMEWORK_KEYS.format(key))
@@ -124,47 +240,263 @@ def parse_status(homework):
     )
 
 
+def broadcast(bot, message, reached=None):
+    """Отправляет сообщение в чат и подписчикам. True, если доставлено всем.
+
+    Чаты из `reached` пропускаются, а обслуженные добавляются в него.
+    Недоступный чат считается обслуженным: повтор ему не поможет, а
+    ожидание задержало бы остальные чаты и `from_date`.
+    """
+    reached = set() if reached is None else reached
+    if TELEGRAM_CHAT_ID not in reached and send_message(
+        bot, message
+    ) is not None:
+        reached.add(TELEGRAM_CHAT_ID)
+    for chat_id in TELEGRAM_SUBSCRIBERS:
+        if chat_id not in reached and send_to_chat(
+            bot, chat_id, message
+        ) is not None:
+            reached.add(chat_id)
+    return reached.issuperset((TELEGRAM_CHAT_ID, *TELEGRAM_SUBSCRIBERS))
+
+
+def broadcast_batch(bot, message, batch, reached):
+    """Рассылает сообщение о пачке работ чатам, ещё не получившим её.
+
+    `reached` между опросами хранит для каждой смены статуса чаты, уже
+    получившие вердикт, поэтому при сбое одного чата остальные его не
+    получают повторно. Когда вердикт доставлен всем, запись удаляется.
+    """
+    keys = [verdict_key(homework) for homework in batch]
+    chats = set.intersection(*(reached.setdefault(key, set()) for key in keys))
+    delivered = broadcast(bot, message, chats)
+    for key in keys:
+        if delivered:
+            del reached[key]
+        else:
+            reached[key].update(chats)
+    return delivered
+
+
+def notify(bot, index, homeworks, mode=DELIVERY_MODE, boards=(),
+           timeline=None, reached=None):
+    """Сообщает о новых статусах работ. True, если доставлены все.
+
+    В режиме digest все изменения одного опроса уходят одним сообщением,
+    а с досками статусов `boards` вместо сообщений редактируются они.
+    По `timeline` с моментом получения ответа API учитывается задержка
+    доставки каждого вердикта от проверки работы. В `reached` между
+    вызовами хранятся чаты, уже получившие ещё не зафиксированные
+    вердикты; записи о сменах статусов, которых больше нет в ответе,
+    удаляются.
+    """
+    timeline = Timeline() if timeline is None else timeline.stamp('parsed')
+    reached = {} if reached is None else reached
+    for key in reached.keys() - set(map(verdict_key, homeworks)):
+        del reached[key]
+    if boards:
+        return update_boards(bot, index, homeworks, boards)
+    batches = (
+        split(homeworks, text=parse_status) if mode == 'digest'
+        else ([homework] for homework in homeworks)
+    )
+    delivered = 0
+    for batch in batches:
+        message = (
+            parse_status(batch[0]) if len(batch) == 1
+            else digest_text([parse_status(homework) for homework in batch])
+        )
+        timeline.stamp('enqueued')
+        if broadcast_batch(bot, message, batch, reached):
+            timeline.stamp('delivered')
+            for homework in batch:
+                index.commit(homework)
+                track_latency(timeline, homework)
+            delivered += len(batch)
+    return delivered == len(homeworks)
+
+
+def track_latency(timeline, homework):
+    """Учитывает задержку доставки вердикта, если известен ответ API."""
+    if timeline.fetched is not None:
+        latency_tracker.record(STATE_TENANT, timeline.of(homework))
+
+
+def update_boards(bot, index, homeworks, boards):
+    """Обновляет доски статусов чатов. True, если все доски актуальны."""
+    if not homeworks:
+        return True
+    for homework in homeworks:
+        parse_status(homework)
+    updated = True
+    for board in boards:
+        text = board.render(homeworks)
+        if text is None:
+            continue
+        try:
+            board.publish(bot, board.chat_id, text)
+        except telegram.error.TelegramError as error:
+            if chat_unreachable(error):
+                logging.error(CHAT_UNREACHABLE.format(
+                    chat=board.chat_id, error=error
+                ))
+                continue
+            logging.exception(SEND_MESSAGE_ERROR.format(text, error))
+            updated = False
+    if updated:
+        for homework in homeworks:
+            index.commit(homework)
+    return updated
+
+
+def load_state(store, timestamp):
+    """Читает из хранилища `from_date`, индекс статусов и доски чатов."""
+    boards = [
+        StatusBoard(STATE_TENANT, chat_id, store)
+        for chat_id in (TELEGRAM_CHAT_ID, *TELEGRAM_SUBSCRIBERS)
+    ] if DELIVERY_MODE == 'board' else []
+    return (
+        store.load_timestamp(STATE_TENANT, timestamp),
+        store.load_index(STATE_TENANT),
+        boards
+    )
+
+
+class LeaseKeeper(threading.Thread):
+    """Поток, продлевающий аренду аккаунта каждые `renew_period` секунд.
+
+    Опрос спит `RETRY_PERIOD` секунд, а аренда истекает через `LEASE_TTL`,
+    обычно куда раньше. Продлевай аренду сам цикл опроса, она истекала
+    бы между опросами, и реплики опрашивали бы аккаунт по очереди.
+    """
+
+    def __init__(self, leases):
+        """Создаёт поток продления аренды `leases`."""
+        super().__init__(name='leases', daemon=True)
+        self.leases = leases
+        self.stopped = threading.Event()
+
+    def renew(self):
+        """Продлевает аренду аккаунта, журналируя сбой."""
+        try:
+            self.leases.acquire([STATE_TENANT])
+        except Exception as error:
+            logging.warning(LEASE_RENEW_FAILED.format(error))
+
+    def run(self):
+        """Продлевает аренду, пока поток не остановлен."""
+        while not self.stopped.wait(self.leases.renew_period):
+            self.renew()
+
+    def stop(self):
+        """Останавливает продление и отдаёт аренду другим репликам."""
+        self.stopped.set()
+        self.join()
+        self.leases.close()
+
+
+def keep_lease(leases):
+    """Арендует аккаунт и запускает продление; None, если аренды нет."""
+    if leases is None:
+        return None
+    keeper = LeaseKeeper(leases)
+    keeper.renew()
+    keeper.start()
+    return keeper
+
+
+def hold_lease(leases, store, state, held):
+    """Возвращает состояние аккаунта; None, если он у другой реплики.
+
+    Без аренды (`leases` равен None) состояние возвращается как есть.
+    Если в прошлом опросе аккаунт не был арендован (`held` ложно),
+    состояние перечитывается: до этого аккаунт опрашивала другая реплика.
+    """
+    if leases is None:
+        return state
+    if not leases.owns(STATE_TENANT):
+        return None
+    if not held:
+        store.reload(STATE_TENANT)
+        state = load_state(store, state[0])
+    return state
+
+
+def report_error(bot, error, sent_errors):
+    """Журналирует сбой опроса и возвращает паузу до следующего опроса.
+
+    Ограничение частоты (429/503) в чат не сообщается: бот ждёт
+    `Retry-After`, но не меньше `RETRY_PERIOD`. Повтор сбоя того же
+    класса в пределах окна `sent_errors` в чат не уходит.
+    """
+    if isinstance(error, TooManyRequestsError):
+        delay = max(RETRY_PERIOD, (
+            API_DEFAULT_RETRY_AFTER if error.retry_after is None
+            else error.retry_after
+        ))
+        logging.warning(THROTTLED.format(delay=delay, error=error))
+        return delay
+    message_error = ERROR.format(error)
+    logging.error(message_error)
+    fingerprint = error_fingerprint(error, ENDPOINT)
+    if not sent_errors.seen(fingerprint) and send_message(
+        bot, message_error
+    ) is not None:
+        sent_errors.add(fingerprint)
+    return RETRY_PERIOD
+
+
 def main():
     """Основная логика работы бота."""
     check_tokens()
 
     bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    timestamp = int(time.time())
+    store = open_store()
+    timestamp, index, boards = load_state(store, int(time.time()))
+    leases = open_leases()
+    keeper = keep_lease(leases)
+    held = False
 
-    message_error = ''
+    sent_errors = DedupeCache()
+    reached = {}
 
-    while True:
-        try:
-            response = get_api_answer(timestamp)
-            check_response(response)
-            homeworks = response['homeworks']
-            if not homeworks:
-                logging.debug(NO_NEW_STATUSES)
-                continue
-            last_homework = homeworks[0]
-            if send_message(bot, parse_status(last_homework)) is not None:
-                timestamp = response.get('current_date', timestamp)
-        except Exception as error:
-            new_message_error = ERROR.format(error)
-            logging.error(new_message_error)
-            if new_message_error != message_error and send_message(
-                bot, new_message_error
-            ) is not None:
-                message_error = new_message_error
-        finally:
-            time.sleep(RETRY_PERIOD)
+    try:
+        while True:
+            started = time.perf_counter()
+            delay = RETRY_PERIOD
+            try:
+                state = hold_lease(
+                    leases, store, (timestamp, index, boards), held
+                )
+                held = state is not None
+                if state is None:
+                    logging.debug(NOT_LEASE_OWNER)
+                    continue
+                timestamp, index, boards = state
+                response = get_api_answer(timestamp)
+                timeline = Timeline(time.time())
+                decoded = check_response(response)
+                homeworks = index.diff(decoded.homeworks)
+                if not homeworks:
+                    logging.debug(NO_NEW_STATUSES)
+                if notify(bot, index, homeworks, boards=boards,
+                          timeline=timeline, reached=reached):
+                    if decoded.current_date is not None:
+                        timestamp = decoded.current_date
+                    store.save_timestamp(STATE_TENANT, timestamp)
+            except Exception as error:
+                delay = report_error(bot, error, sent_errors)
+            finally:
+                store.flush()
+                poll_cycle_seconds.observe(time.perf_counter() - started)
+                poll_sleep_seconds.set(delay)
+                time.sleep(delay)
+    finally:
+        if keeper is not None:
+            keeper.stop()
 
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format=(
-            '%(asctime)s [%(levelname)s] File "%(pathname)s", '
-            'function "%(funcName)s", line %(lineno)d: %(message)s'
-        ),
-        handlers=[
-            logging.StreamHandler(stream=sys.stdout),
-            logging.FileHandler(__file__ + '.log')
-        ]
-    )
+    setup_logging(logging.DEBUG, LOG_FILE or __file__ + '.log')
+    start_metrics_server()
     main()
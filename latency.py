@@ -0,0 +1,212 @@
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from metrics import (
+    notification_latency_quantiles, notification_latency_seconds
+)
+
+
+LATENCY_WINDOW = int(os.getenv('LATENCY_WINDOW', 1000))
+QUANTILES = (0.5, 0.9, 0.99)
+SLOWEST_TENANTS = int(os.getenv('LATENCY_SLOWEST_TENANTS', 10))
+ALL = 'all'
+TOTAL = 'total'
+STAGES = (
+    ('fetch', 'reviewed', 'fetched'),
+    ('parse', 'fetched', 'parsed'),
+    ('enqueue', 'parsed', 'enqueued'),
+    ('delivery', 'enqueued', 'delivered'),
+    (TOTAL, 'reviewed', 'delivered'),
+)
+
+VERDICT_LATENCY = 'Вердикт аккаунта {tenant} доставлен: {stages}.'
+
+logger = logging.getLogger(__name__)
+
+
+def reviewed_at(homework):
+    """Возвращает `date_updated` работы в Unix-времени или None."""
+    value = homework.get('date_updated')
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+class Timeline:
+    """Моменты прохождения вердикта от проверки работы до доставки.
+
+    Все моменты — Unix-время, потому что момент проверки приходит из API
+    как дата `date_updated`. Неизвестные моменты равны None, и этапы,
+    которые на них опираются, не учитываются. `tenant` — имя аккаунта
+    вердикта: в дайджест попадают вердикты разных аккаунтов, и задержка
+    каждого учитывается по его аккаунту.
+    """
+
+    __slots__ = (
+        'reviewed', 'fetched', 'parsed', 'enqueued', 'delivered', 'tenant'
+    )
+
+    def __init__(self, fetched=None, parsed=None, reviewed=None,
+                 enqueued=None, delivered=None, tenant=None):
+        """Запоминает уже известные моменты."""
+        self.fetched = fetched
+        self.parsed = parsed
+        self.reviewed = reviewed
+        self.enqueued = enqueued
+        self.delivered = delivered
+        self.tenant = tenant
+
+    def stamp(self, moment):
+        """Отмечает момент `moment` текущим временем."""
+        setattr(self, moment, time.time())
+        return self
+
+    def of(self, homework):
+        """Возвращает копию с моментом проверки работы `homework`."""
+        return Timeline(
+            self.fetched, self.parsed, reviewed_at(homework),
+            self.enqueued, self.delivered, self.tenant
+        )
+
+    def stages(self):
+        """Возвращает длительности известных этапов в секундах.
+
+        Часы API и бота могут расходиться, поэтому отрицательная
+        длительность считается нулевой.
+        """
+        return {
+            stage: max(getattr(self, end) - getattr(self, start), 0.0)
+            for stage, start, end in STAGES
+            if getattr(self, start) is not None
+            and getattr(self, end) is not None
+        }
+
+
+def percentiles(values):
+    """Возвращает квантили `QUANTILES` значений методом ближайшего ранга."""
+    values = sorted(values)
+    if not values:
+        return {}
+    return {
+        quantile: values[max(math.ceil(quantile * len(values)) - 1, 0)]
+        for quantile in QUANTILES
+    }
+
+
+class LatencyTracker:
+    """Квантили задержки доставки вердиктов по аккаунтам и в целом.
+
+    Хранит последние `window` задержек каждого этапа по всем аккаунтам
+    и полной задержки каждого аккаунта. Записи идут из цикла событий или
+    основного потока, а квантили читает и поток сервера метрик, поэтому
+    окна защищены блокировкой; запись — одна на доставленный вердикт.
+    Окно аккаунта, перешедшего к другой реплике, удаляет `forget`.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        """Создаёт пустые окна по `window` значений."""
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.recorded = 0
+
+    def record(self, tenant, timeline):
+        """Учитывает доставленный вердикт аккаунта `tenant`."""
+        stages = timeline.stages()
+        for stage, seconds in stages.items():
+            notification_latency_seconds.observe(seconds, stage)
+        with self.lock:
+            self.recorded += 1
+            for stage, seconds in stages.items():
+                self.append(ALL, stage, seconds)
+            if TOTAL in stages:
+                self.append(tenant, TOTAL, stages[TOTAL])
+        logger.debug(VERDICT_LATENCY.format(tenant=tenant, stages=', '.join(
+            f'{stage} {seconds:.3f} с' for stage, seconds in stages.items()
+        )))
+
+    def append(self, tenant, stage, seconds):
+        """Добавляет задержку в окно, вытесняя самую старую."""
+        key = tenant, stage
+        if key not in self.samples:
+            self.samples[key] = deque(maxlen=self.window)
+        self.samples[key].append(seconds)
+
+    def percentiles(self, tenant=ALL, stage=TOTAL):
+        """Возвращает квантили задержки этапа `stage` аккаунта `tenant`."""
+        with self.lock:
+            values = list(self.samples.get((tenant, stage), ()))
+        return percentiles(values)
+
+    def forget(self, tenant):
+        """Удаляет окна аккаунта, который опрашивает другая реплика."""
+        with self.lock:
+            for key in [key for key in self.samples if key[0] == tenant]:
+                del self.samples[key]
+
+    def tenants(self):
+        """Возвращает квантили полной задержки по аккаунтам."""
+        with self.lock:
+            windows = {
+                tenant: list(values)
+                for (tenant, stage), values in self.samples.items()
+                if stage == TOTAL and tenant != ALL
+            }
+        return {
+            tenant: percentiles(values) for tenant, values in windows.items()
+        }
+
+    def slowest(self, count=SLOWEST_TENANTS):
+        """Возвращает квантили `count` аккаунтов с наибольшим p99."""
+        return dict(sorted(
+            self.tenants().items(),
+            key=lambda item: item[1][QUANTILES[-1]], reverse=True
+        )[:count])
+
+    def quantile_samples(self):
+        """Возвращает квантили полной задержки для страницы метрик.
+
+        Кроме общих квантилей отдаются только `SLOWEST_TENANTS` самых
+        медленных аккаунтов, чтобы число рядов не росло с числом
+        аккаунтов.
+        """
+        tenants = self.slowest()
+        tenants[ALL] = self.percentiles()
+        return {
+            (tenant, f'{quantile:g}'): seconds
+            for tenant, quantiles in tenants.items()
+            for quantile, seconds in quantiles.items()
+        }
+
+    def stats(self):
+        """Возвращает квантили этапов в целом и самые медленные аккаунты."""
+        stats = {'delivered': self.recorded}
+        for stage, _, _ in STAGES:
+            quantiles = self.percentiles(ALL, stage)
+            if quantiles:
+                stats[stage] = {
+                    f'p{quantile * 100:g}': round(seconds, 3)
+                    for quantile, seconds in quantiles.items()
+                }
+        slowest = self.slowest()
+        if slowest:
+            stats['slowest'] = {
+                tenant: round(quantiles[QUANTILES[-1]], 3)
+                for tenant, quantiles in slowest.items()
+            }
+        return stats
+
+
+latency_tracker = LatencyTracker()
+notification_latency_quantiles.function = latency_tracker.quantile_samples
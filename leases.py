@@ -0,0 +1,175 @@
+import math
+import os
+import socket
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+
+
+LEASE_BACKEND = os.getenv('LEASE_BACKEND', 'none')
+LEASE_PATH = os.getenv('LEASE_PATH', 'leases.db')
+LEASE_TTL = float(os.getenv('LEASE_TTL', 30))
+REPLICA_ID = os.getenv(
+    'REPLICA_ID', f'{socket.gethostname()}-{os.getpid()}'
+)
+
+UNKNOWN_LEASE_BACKEND = 'Неизвестный бэкенд аренды "{name}". Доступны: {names}'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS replicas (
+    owner TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    tenant TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+'''
+
+
+class Leases(ABC):
+    """Аренда аккаунтов несколькими репликами бота.
+
+    Реплика опрашивает только аккаунты, которые арендовала. Аренда
+    продлевается вызовом `acquire` и истекает через `ttl` секунд, так что
+    аккаунты упавшей реплики переходят к живым не позже чем через `ttl`
+    плюс период продления. Каждая реплика держит не больше своей доли
+    аккаунтов и отдаёт лишние, когда появляются новые реплики. Наследники
+    реализуют `claim` поверх общего хранилища.
+    """
+
+    def __init__(self, owner=REPLICA_ID, ttl=LEASE_TTL, clock=time.time):
+        """Создаёт набор аренд реплики `owner` без аккаунтов."""
+        self.owner = owner
+        self.ttl = ttl
+        self.clock = clock
+        self.owned = set()
+        self.gained = set()
+        self.lost = set()
+        self.deadline = 0.0
+
+    @property
+    def renew_period(self):
+        """Как часто продлевать аренду, чтобы она не истекла."""
+        return self.ttl / 3
+
+    def acquire(self, names, keep=()):
+        """Продлевает аренду и арендует свободные аккаунты.
+
+        Аккаунты из `keep` не отдаются другим репликам, даже если их
+        больше доли. После вызова `gained` и `lost` — аккаунты, которые
+        реплика получила и потеряла.
+        """
+        started = self.clock()
+        owned = set(self.claim(list(names), set(keep), started))
+        self.gained = owned - self.owned
+        self.lost = self.owned - owned
+        self.owned = owned
+        self.deadline = started + self.ttl
+        return owned
+
+    def owns(self, name):
+        """Проверяет, что аккаунт арендован и аренда не истекла."""
+        return name in self.owned and self.clock() < self.deadline
+
+    @abstractmethod
+    def claim(self, names, keep, now):
+        """Обновляет аренду в хранилище и возвращает свои аккаунты."""
+
+    def close(self):
+        """Отдаёт все аккаунты реплики."""
+        self.owned = set()
+
+
+class SQLiteLeases(Leases):
+    """Аренда в общем файле SQLite для реплик на одной машине или диске.
+
+    Каждый вызов `claim` — одна транзакция `BEGIN IMMEDIATE`, поэтому
+    реплики меняют аренду по очереди и не могут арендовать один аккаунт
+    дважды.
+    """
+
+    def __init__(self, path=LEASE_PATH, **kwargs):
+        """Открывает базу аренд в файле `path`."""
+        super().__init__(**kwargs)
+        self.path = path
+        self.connection = sqlite3.connect(
+            path, timeout=self.renew_period, isolation_level=None,
+            check_same_thread=False
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+
+    def claim(self, names, keep, now):
+        """Продлевает аренду, отдаёт лишнее и забирает свободное."""
+        execute = self.connection.execute
+        execute('BEGIN IMMEDIATE')
+        try:
+            execute(
+                'INSERT OR REPLACE INTO replicas VALUES (?, ?)',
+                (self.owner, now + self.ttl)
+            )
+            execute('DELETE FROM replicas WHERE expires < ?', (now,))
+            (replicas,), = execute('SELECT COUNT(*) FROM replicas')
+            share = math.ceil(len(names) / replicas)
+            leases = {
+                tenant: (owner, expires)
+                for tenant, owner, expires in execute(
+                    'SELECT tenant, owner, expires FROM leases'
+                )
+            }
+            mine = [
+                name for name in names
+                if leases.get(name, (None, 0))[0] == self.owner
+            ]
+            excess = set([
+                name for name in mine if name not in keep
+            ][:max(len(mine) - share, 0)])
+            self.connection.executemany(
+                'DELETE FROM leases WHERE tenant = ? AND owner = ?',
+                [(name, self.owner) for name in excess]
+            )
+            owned = [name for name in mine if name not in excess]
+            taken = set(mine)
+            free = [
+                name for name in names
+                if name not in taken
+                and (name not in leases or leases[name][1] < now)
+            ]
+            owned.extend(free[:max(share - len(owned), 0)])
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO leases VALUES (?, ?, ?)',
+                [(name, self.owner, now + self.ttl) for name in owned]
+            )
+            execute('COMMIT')
+        except BaseException:
+            execute('ROLLBACK')
+            raise
+        return owned
+
+    def close(self):
+        """Отдаёт все аккаунты реплики и закрывает базу."""
+        super().close()
+        self.connection.execute(
+            'DELETE FROM leases WHERE owner = ?', (self.owner,)
+        )
+        self.connection.execute(
+            'DELETE FROM replicas WHERE owner = ?', (self.owner,)
+        )
+        self.connection.close()
+
+
+BACKENDS = {
+    'none': lambda path: None,
+    'sqlite': SQLiteLeases,
+}
+
+
+def open_leases(backend=LEASE_BACKEND, path=LEASE_PATH):
+    """Открывает аренду по имени бэкенда; None — аренда не нужна."""
+    if backend not in BACKENDS:
+        raise ValueError(UNKNOWN_LEASE_BACKEND.format(
+            name=backend, names=', '.join(BACKENDS)
+        ))
+    return BACKENDS[backend](path)
@@ -0,0 +1,157 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import sys
+import time
+from logging.handlers import (
+    QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+)
+
+
+LOG_FILE = os.getenv('LOG_FILE')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', '')
+LOG_COMPRESS = os.getenv('LOG_COMPRESS', 'true').lower() == 'true'
+LOG_CALLER = os.getenv('LOG_CALLER', 'false').lower() == 'true'
+
+TEXT_FORMAT = (
+    '%(asctime)s [%(levelname)s] %(processName)s %(threadName)s '
+    '%(name)s: %(message)s'
+)
+CALLER_FORMAT = (
+    '%(asctime)s [%(levelname)s] File "%(pathname)s", '
+    'function "%(funcName)s", line %(lineno)d: %(message)s'
+)
+
+UNKNOWN_LOG_FORMAT = 'Неизвестный формат журнала "{name}". Доступны: {names}'
+
+
+class LogListener(QueueListener):
+    """`QueueListener`, который можно остановить повторно."""
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток, если он запущен."""
+        if self._thread is not None:
+            super().stop()
+
+
+class JsonFormatter(logging.Formatter):
+    """Записывает событие журнала одной строкой JSON."""
+
+    def __init__(self, caller=LOG_CALLER):
+        """Задаёт, писать ли файл, функцию и строку вызова."""
+        super().__init__()
+        self.caller = caller
+
+    def format(self, record):
+        """Возвращает строку JSON с полями события."""
+        event = {
+            'time': time.strftime(
+                '%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)
+            ) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.processName,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if self.caller:
+            event.update(
+                file=record.pathname, function=record.funcName,
+                line=record.lineno
+            )
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False)
+
+
+def make_formatter(name=LOG_FORMAT, caller=LOG_CALLER):
+    """Возвращает форматтер журнала: text или json."""
+    if name == 'json':
+        return JsonFormatter(caller)
+    if name == 'text':
+        return logging.Formatter(CALLER_FORMAT if caller else TEXT_FORMAT)
+    raise ValueError(UNKNOWN_LOG_FORMAT.format(name=name, names='text, json'))
+
+
+def compress(source, destination):
+    """Сжимает ротированный журнал в gzip и удаляет исходный файл."""
+    with open(source, 'rb') as plain, gzip.open(destination, 'wb') as packed:
+        shutil.copyfileobj(plain, packed)
+    os.remove(source)
+
+
+def rotating_handler(path, max_bytes=LOG_MAX_BYTES,
+                     backup_count=LOG_BACKUP_COUNT, when=LOG_ROTATE_WHEN,
+                     compressed=LOG_COMPRESS):
+    """Возвращает обработчик файла с ротацией по размеру или времени.
+
+    При `when` (например, `midnight`) файл ротируется по времени, иначе —
+    по достижении `max_bytes`. Ротированные файлы сжимаются в gzip.
+    """
+    if when:
+        handler = TimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, encoding='utf-8'
+        )
+    else:
+        handler = RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8'
+        )
+    if compressed:
+        handler.namer = lambda name: name + '.gz'
+        handler.rotator = compress
+    return handler
+
+
+def setup_logging(level=logging.INFO, path=LOG_FILE, fmt=LOG_FORMAT,
+                  stream=sys.stdout, log_queue=None, caller=LOG_CALLER):
+    """Настраивает журнал без дискового ввода-вывода в рабочих потоках.
+
+    Корневой логгер только кладёт события в очередь, а форматирует и
+    пишет их в `stream` и в ротируемый файл `path` отдельный поток
+    `QueueListener`. Без `caller` логгер не ищет файл, функцию и строку
+    вызова: это обход стека на каждом событии. Очередь `log_queue`
+    можно передать из `multiprocessing`, чтобы в неё писали и дочерние
+    процессы. Возвращает запущенный слушатель; он останавливается при
+    выходе из программы.
+    """
+    if not caller:
+        logging._srcfile = None
+    formatter = make_formatter(fmt, caller)
+    handlers = [logging.StreamHandler(stream)]
+    if path:
+        handlers.append(rotating_handler(path))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue() if log_queue is None else log_queue
+    listener = LogListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    redirect_logging(log_queue, level)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def current_queue():
+    """Возвращает очередь, в которую пишет корневой логгер, или None."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, QueueHandler):
+            return handler.queue
+    return None
+
+
+def redirect_logging(log_queue, level=logging.INFO):
+    """Направляет все события корневого логгера в очередь."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
@@ -0,0 +1,295 @@
+import bisect
+import logging
+import os
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1,
+    2.5, 5, 10, 30
+)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 10000)
+NOTIFICATION_BUCKETS = (
+    0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+METRICS_STARTED = 'Метрики доступны на http://{host}:{port}/metrics'
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    """Набор метрик, отдаваемых одной страницей."""
+
+    def __init__(self):
+        """Создаёт пустой набор метрик."""
+        self.metrics = []
+
+    def register(self, metric):
+        """Добавляет метрику в набор."""
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Возвращает все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{format_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def format_labels(labels):
+    """Возвращает метки в виде `{name="value",...}`."""
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"'
+        ).replace('\n', r'\n'))
+        for name, value in labels
+    ) + '}'
+
+
+class Metric:
+    """Основа счётчиков и гистограмм без блокировок на горячем пути.
+
+    Каждый поток пишет в собственный словарь, поэтому запись — это
+    обычное изменение словаря без блокировки и без потерянных
+    обновлений. Блокировка берётся только при первой записи потока и
+    при чтении, когда словари потоков суммируются.
+    """
+
+    type = None
+
+    def __init__(self, name, help, labels=(), registry=REGISTRY):
+        """Создаёт метрику и добавляет её в `registry`."""
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.shards = []
+        registry.register(self)
+
+    def shard(self):
+        """Возвращает словарь значений текущего потока."""
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = {}
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def merged(self, add):
+        """Складывает значения всех потоков функцией `add`."""
+        with self.lock:
+            shards = [shard.copy() for shard in self.shards]
+        total = {}
+        for shard in shards:
+            for key, value in shard.items():
+                total[key] = add(total[key], value) if key in total else value
+        return total
+
+    def labelled(self, key, *extra):
+        """Сопоставляет значения меток их именам."""
+        return tuple(zip(self.labels, key)) + extra
+
+
+class Counter(Metric):
+    """Монотонный счётчик."""
+
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        """Увеличивает счётчик с метками `labels`."""
+        shard = self.shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def value(self, *labels):
+        """Возвращает текущее значение счётчика."""
+        return self.merged(lambda a, b: a + b).get(labels, 0)
+
+    def samples(self):
+        """Возвращает значения для страницы метрик."""
+        for key, value in sorted(self.merged(lambda a, b: a + b).items()):
+            yield self.name, self.labelled(key), value
+
+
+class Histogram(Metric):
+    """Гистограмма значений с фиксированными границами корзин."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS,
+                 registry=REGISTRY):
+        """Создаёт гистограмму с границами корзин `buckets`."""
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        """Учитывает одно значение."""
+        shard = self.shard()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def totals(self):
+        """Возвращает по меткам число значений в корзинах и их сумму."""
+        return self.merged(lambda a, b: [
+            [x + y for x, y in zip(a[0], b[0])], a[1] + b[1]
+        ])
+
+    def samples(self):
+        """Возвращает накопленные корзины, сумму и число значений."""
+        for key, (counts, total) in sorted(self.totals().items()):
+            cumulative = 0
+            bounds = [f'{bound:g}' for bound in self.buckets] + ['+Inf']
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket',
+                    self.labelled(key, ('le', bound)), cumulative
+                )
+            yield f'{self.name}_sum', self.labelled(key), total
+            yield f'{self.name}_count', self.labelled(key), cumulative
+
+
+class Gauge(Metric):
+    """Текущее значение: задаётся `set` или читается функцией при запросе.
+
+    `function` возвращает число или словарь {метки: значение}; так
+    глубина очередей читается, только когда метрики запрашивают.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labels=(), function=None,
+                 registry=REGISTRY):
+        """Создаёт показатель, читаемый функцией `function`."""
+        super().__init__(name, help, labels, registry)
+        self.values = {}
+        self.function = function
+
+    def set(self, value, *labels):
+        """Задаёт значение с метками `labels`."""
+        self.values[labels] = value
+
+    def samples(self):
+        """Возвращает заданные и вычисленные значения."""
+        values = dict(self.values)
+        if self.function is not None:
+            result = self.function()
+            values.update(
+                result if isinstance(result, dict) else {(): result}
+            )
+        for key, value in sorted(values.items()):
+            yield self.name, self.labelled(key), value
+
+
+api_requests = Counter(
+    'homework_api_requests_total', 'Запросы к API домашки по коду ответа.',
+    ('status',)
+)
+api_request_seconds = Histogram(
+    'homework_api_request_seconds', 'Время запроса к API домашки.'
+)
+decode_seconds = Histogram(
+    'homework_api_decode_seconds', 'Время разбора JSON ответа API.'
+)
+homeworks_per_response = Histogram(
+    'homework_api_homeworks_per_response', 'Число работ в ответе API.',
+    buckets=SIZE_BUCKETS
+)
+status_transitions = Counter(
+    'homework_status_transitions_total',
+    'Доставленные смены статусов работ по новому статусу.', ('status',)
+)
+telegram_sends = Counter(
+    'homework_telegram_sends_total',
+    'Отправки в Telegram: ok или класс ошибки.', ('result',)
+)
+telegram_send_seconds = Histogram(
+    'homework_telegram_send_seconds', 'Время отправки сообщения в Telegram.'
+)
+queue_depth = Gauge(
+    'homework_queue_depth', 'Сообщений в очередях отправки.', ('queue',)
+)
+poll_cycle_seconds = Histogram(
+    'homework_poll_cycle_seconds',
+    'Длительность итерации опроса без учёта сна.'
+)
+poll_sleep_seconds = Gauge(
+    'homework_poll_sleep_seconds', 'Пауза между итерациями опроса.'
+)
+scheduler_lag_seconds = Histogram(
+    'homework_scheduler_lag_seconds',
+    'Отставание запуска опроса от запланированного времени.'
+)
+notification_latency_seconds = Histogram(
+    'homework_notification_latency_seconds',
+    'Задержка доставки вердикта по этапам: fetch, parse, enqueue, '
+    'delivery и total — от проверки работы до доставки.', ('stage',),
+    buckets=NOTIFICATION_BUCKETS
+)
+notification_latency_quantiles = Gauge(
+    'homework_notification_latency_quantile_seconds',
+    'Квантили задержки от проверки работы до доставки вердикта за '
+    'последние доставки; tenant="all" — по всем аккаунтам, остальные '
+    'ряды — самые медленные аккаунты.',
+    ('tenant', 'quantile')
+)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Отдаёт страницу метрик по адресу `/metrics`."""
+
+    registry = REGISTRY
+
+    def do_GET(self):
+        """Отвечает на запрос страницы метрик."""
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Пишет запросы к странице метрик в журнал на уровне DEBUG."""
+        logger.debug(format, *args)
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST,
+                         registry=REGISTRY):
+    """Запускает HTTP-сервер метрик в фоновом потоке.
+
+    Возвращает сервер или None, если порт не задан.
+    """
+    if not port:
+        return None
+    handler = type('Handler', (MetricsHandler,), {'registry': registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    logger.info(METRICS_STARTED.format(host=host, port=server.server_port))
+    return server
@@ -0,0 +1,480 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import time
+
+from exceptions import ChatUnreachableError, MessageRejectedError
+from latency import latency_tracker
+
+
+OUTBOX_SIZE = int(os.getenv('OUTBOX_SIZE', 1000))
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 8))
+OUTBOX_DURABLE = os.getenv('OUTBOX_DURABLE', 'false').lower() == 'true'
+OUTBOX_RETRY_PERIOD = float(os.getenv('OUTBOX_RETRY_PERIOD', 30))
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_MESSAGE_TTL = float(os.getenv('OUTBOX_MESSAGE_TTL', 24 * 60 * 60))
+
+VERDICT = 'verdict'
+ERROR = 'error'
+PRIORITIES = {VERDICT: 0, ERROR: 1}
+
+DELIVERY_FAILED = 'Сбой доставки сообщения в чат {chat_id}: {error}'
+REDELIVERING = 'Повторная отправка сохранённых сообщений: {count}.'
+MESSAGE_EXPIRED = (
+    '[{tenant}] Сообщение {id} в чат {chat_id} не доставлено за {ttl:g} с '
+    'и удалено.'
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Message:
+    """Исходящее сообщение и подтверждение его доставки.
+
+    `ack` — future, который очередь создаёт при постановке сообщения и
+    завершает значением True после доставки или False после сбоя.
+    Вердикты уходят раньше сообщений об ошибках. Если задана `board`,
+    текст не отправляется новым сообщением, а обновляет доску статусов.
+    `key` — отпечаток смены статуса, по которому сообщение хранится в
+    `DurableOutbox`. `timelines` — моменты прохождения вошедших в
+    сообщение вердиктов; очередь отмечает в них постановку и доставку.
+    """
+
+    def __init__(self, chat_id, text, kind=VERDICT, tenant=None, board=None,
+                 key=None, timelines=()):
+        """Создаёт сообщение в чат `chat_id`."""
+        self.chat_id = chat_id
+        self.text = text
+        self.kind = kind
+        self.tenant = tenant
+        self.board = board
+        self.key = key
+        self.timelines = timelines
+        self.priority = PRIORITIES[kind]
+        self.enqueued = None
+        self.ack = None
+
+
+class LatencyStats:
+    """Количество, сумма и максимум задержек в секундах."""
+
+    def __init__(self):
+        """Создаёт пустые счётчики задержек."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, latency):
+        """Учитывает одну задержку."""
+        self.count += 1
+        self.total += latency
+        if latency > self.max:
+            self.max = latency
+
+    @property
+    def mean(self):
+        """Средняя задержка."""
+        return self.total / self.count if self.count else 0.0
+
+
+class Outbox:
+    """Ограниченная очередь исходящих сообщений с пулом отправителей.
+
+    Опрос только ставит сообщения в очередь и получает подтверждения
+    доставки, а отправкой занимаются `workers` сопрограмм. Если очередь
+    заполнена, `put` ждёт свободного места — так медленный Telegram
+    притормаживает опрос, а не раздувает память.
+
+    `ready(chat_id)` занимает место в лимите чата и возвращает 0 или
+    время до свободного места. Сообщение чата, который ещё не может
+    принять сообщение, откладывается в очередь этого чата, и отправитель
+    сразу берёт следующее сообщение: серия сообщений в один чат не
+    занимает всех отправителей ожиданием. Очередь чата разбирается по
+    таймеру по одному сообщению, как только лимит чата позволяет.
+    """
+
+    def __init__(self, send, workers=OUTBOX_WORKERS, maxsize=OUTBOX_SIZE,
+                 ready=None):
+        """Задаёт функцию отправки, число отправителей и размер очереди."""
+        self.send = send
+        self.workers = workers
+        self.maxsize = maxsize
+        self.ready = ready
+        self.queue = None
+        self.sequence = itertools.count()
+        self.lanes = {}
+        self.timers = {}
+        self.releasing = set()
+        self.parked = 0
+        self.tasks = []
+        self.enqueued = 0
+        self.delivered = 0
+        self.failed = 0
+        self.unreachable = 0
+        self.rejected = 0
+        self.blocked = 0
+        self.latency = LatencyStats()
+
+    async def start(self):
+        """Создаёт очередь и запускает отправителей."""
+        self.queue = asyncio.PriorityQueue(self.maxsize)
+        self.tasks = [
+            asyncio.create_task(self.worker()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Останавливает отправителей, не дожидаясь очереди."""
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers = {}
+        tasks = [*self.tasks, *self.releasing]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def join(self):
+        """Ждёт доставки всех поставленных сообщений."""
+        await self.queue.join()
+
+    async def put(self, message):
+        """Ставит сообщение в очередь и возвращает future подтверждения."""
+        loop = asyncio.get_running_loop()
+        message.ack = loop.create_future()
+        if self.queue.full():
+            self.blocked += 1
+        await self.queue.put(
+            (message.priority, next(self.sequence), message)
+        )
+        message.enqueued = loop.time()
+        for timeline in message.timelines:
+            timeline.stamp('enqueued')
+        self.enqueued += 1
+        return message.ack
+
+    async def worker(self):
+        """Отправляет сообщения из очереди, пока не отменён."""
+        while True:
+            entry = await self.queue.get()
+            if self.admit(entry):
+                await self.process(entry[2])
+
+    def admit(self, entry):
+        """Проверяет, можно ли отправить сообщение сразу.
+
+        Если у чата уже есть отложенные сообщения или его лимит исчерпан,
+        сообщение откладывается в очередь чата и будет отправлено по
+        таймеру.
+        """
+        chat_id = entry[2].chat_id
+        if chat_id not in self.lanes:
+            delay = 0.0 if self.ready is None else self.ready(chat_id)
+            if delay <= 0:
+                return True
+            self.lanes[chat_id] = []
+            self.schedule(chat_id, delay)
+        heapq.heappush(self.lanes[chat_id], entry)
+        self.parked += 1
+        return False
+
+    def schedule(self, chat_id, delay):
+        """Ставит таймер разбора очереди чата через `delay` секунд."""
+        self.timers[chat_id] = asyncio.get_running_loop().call_later(
+            delay, self.release, chat_id
+        )
+
+    def release(self, chat_id):
+        """Отправляет следующее отложенное сообщение чата, если можно."""
+        delay = self.ready(chat_id)
+        if delay > 0:
+            self.schedule(chat_id, delay)
+            return
+        lane = self.lanes[chat_id]
+        _, _, message = heapq.heappop(lane)
+        self.parked -= 1
+        if lane:
+            self.schedule(chat_id, 0)
+        else:
+            del self.lanes[chat_id]
+            del self.timers[chat_id]
+        task = asyncio.create_task(self.process(message))
+        self.releasing.add(task)
+        task.add_done_callback(self.releasing.discard)
+
+    async def process(self, message):
+        """Отправляет сообщение и завершает его подтверждение.
+
+        Сообщение, отклонённое Telegram окончательно, в том числе
+        недоступному чату, не повторяется: оно подтверждается как
+        обслуженное и учитывается отдельно от доставленных.
+        """
+        loop = asyncio.get_running_loop()
+        rejected = None
+        try:
+            delivered = await self.send(message) is not None
+        except MessageRejectedError as error:
+            logger.error(str(error))
+            delivered = False
+            rejected = error
+        except Exception as error:
+            logger.exception(DELIVERY_FAILED.format(
+                chat_id=message.chat_id, error=error
+            ))
+            delivered = False
+        finally:
+            self.queue.task_done()
+        if delivered:
+            self.delivered += 1
+            self.latency.add(loop.time() - message.enqueued)
+            for timeline in message.timelines:
+                latency_tracker.record(
+                    timeline.tenant, timeline.stamp('delivered')
+                )
+        elif isinstance(rejected, ChatUnreachableError):
+            self.unreachable += 1
+        elif rejected is not None:
+            self.rejected += 1
+        else:
+            self.failed += 1
+        self.settle(message, delivered or rejected is not None)
+
+    def settle(self, message, delivered):
+        """Завершает подтверждение сообщения результатом доставки."""
+        if not message.ack.done():
+            message.ack.set_result(delivered)
+
+    def stats(self):
+        """Возвращает глубину очереди и счётчики доставки."""
+        return {
+            'depth': self.queue.qsize() if self.queue else 0,
+            'maxsize': self.maxsize,
+            'parked': self.parked,
+            'enqueued': self.enqueued,
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'unreachable': self.unreachable,
+            'rejected': self.rejected,
+            'blocked': self.blocked,
+            'latency_mean': self.latency.mean,
+            'latency_max': self.latency.max,
+        }
+
+
+def message_id(message):
+    """Возвращает постоянный идентификатор сообщения в хранилище.
+
+    Вердикт определяется сменой статуса, поэтому одна смена даёт один
+    идентификатор при любом числе повторных опросов и перезапусков.
+    Сообщения без отпечатка (дайджесты) определяются чатом и текстом.
+    """
+    if message.key is not None:
+        return '|'.join(map(str, message.key))
+    return hashlib.blake2b(
+        f'{message.chat_id}|{message.text}'.encode(), digest_size=16
+    ).hexdigest()
+
+
+class DurableOutbox(Outbox):
+    """Очередь, сохраняющая вердикты в хранилище до их доставки.
+
+    Вердикт записывается через `store.put_message` и сразу
+    подтверждается, поэтому опрос фиксирует статусы и сдвигает
+    `from_date`, не дожидаясь Telegram. Доставленное сообщение удаляется
+    через `store.ack_message`, а недоставленное остаётся в хранилище и
+    отправляется повторно пачками по `batch_size` раз в `retry_period`
+    секунд. Раньше срока пачка уходит, только когда Telegram
+    восстановился после сбоя (`wake`) или когда прошлая пачка доставлена
+    целиком без сбоев, а в хранилище ещё есть сообщения. После
+    перезапуска сохранённые сообщения досылаются первой же пачкой.
+    Повтор возможен, только если процесс упал между отправкой и
+    удалением сообщения. Сообщение, которое Telegram отклонил
+    окончательно, удаляется сразу, а недоставленное за `ttl` секунд —
+    перед очередной попыткой.
+    Сообщения об ошибках и доски статусов не сохраняются. Досылаются
+    сообщения только аккаунтов из `tenants`; `adopt` и `forget` меняют
+    этот набор, когда аккаунты переходят между репликами.
+
+    `pending` хранит сохранённые сообщения от старых к новым, поэтому
+    пачка набирается с начала словаря без чтения хранилища и сортировки.
+    """
+
+    def __init__(self, send, store, tenants, workers=OUTBOX_WORKERS,
+                 maxsize=OUTBOX_SIZE, retry_period=OUTBOX_RETRY_PERIOD,
+                 batch_size=OUTBOX_BATCH_SIZE, ready=None,
+                 ttl=OUTBOX_MESSAGE_TTL):
+        """Читает из хранилища неотправленные сообщения аккаунтов."""
+        super().__init__(send, workers, maxsize, ready)
+        self.store = store
+        self.tenants = {}
+        self.retry_period = retry_period
+        self.batch_size = batch_size
+        self.ttl = ttl
+        self.pending = {}
+        self.queued = set()
+        self.loop = None
+        self.wakeup = None
+        self.failing = False
+        self.redelivered = 0
+        self.expired = 0
+        for tenant in tenants.values():
+            self.adopt(tenant)
+
+    def adopt(self, tenant):
+        """Начинает досылать сохранённые сообщения аккаунта."""
+        self.tenants[tenant.name] = tenant
+        self.pending.update(
+            ((tenant.name, pending_id), (created, chat_id, text))
+            for pending_id, chat_id, text, created in (
+                self.store.pending_messages(tenant.name)
+            )
+        )
+        self.pending = dict(
+            sorted(self.pending.items(), key=lambda item: item[1][0])
+        )
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def wake(self):
+        """Досылает сохранённые сообщения, не дожидаясь `retry_period`.
+
+        Вызывается из любого потока, например предохранителем Telegram,
+        когда Telegram восстановился.
+        """
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.wakeup.set)
+
+    def forget(self, name):
+        """Перестаёт досылать сообщения аккаунта."""
+        self.tenants.pop(name, None)
+        self.pending = {
+            pending: message for pending, message in self.pending.items()
+            if pending[0] != name
+        }
+
+    def queued_tenants(self):
+        """Возвращает аккаунты, чьи сообщения стоят в очереди отправки.
+
+        Такие аккаунты нельзя отдавать другой реплике: она прочитает те
+        же сообщения из хранилища и отправит их повторно.
+        """
+        return {name for name, _ in self.queued}
+
+    async def start(self):
+        """Запускает отправителей и досылку сохранённых сообщений."""
+        await super().start()
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.tasks.append(asyncio.create_task(self.redeliver()))
+
+    @staticmethod
+    def durable(message):
+        """Проверяет, хранится ли сообщение до доставки."""
+        return (
+            message.kind == VERDICT and message.board is None
+            and message.tenant is not None
+        )
+
+    async def put(self, message):
+        """Сохраняет вердикт, ставит его в очередь и сразу подтверждает."""
+        if not self.durable(message):
+            return await super().put(message)
+        pending = message.tenant.name, message_id(message)
+        if pending in self.pending:
+            ack = asyncio.get_running_loop().create_future()
+            ack.set_result(True)
+            return ack
+        created = time.time()
+        self.store.put_message(
+            *pending, message.chat_id, message.text, created
+        )
+        self.pending[pending] = created, message.chat_id, message.text
+        self.queued.add(pending)
+        ack = await super().put(message)
+        ack.set_result(True)
+        return ack
+
+    def settle(self, message, delivered):
+        """Удаляет доставленный вердикт из хранилища.
+
+        Доставка последнего сообщения в очереди будит досылку, если в
+        хранилище ещё есть сообщения, а со времени прошлой пачки не было
+        сбоев: иначе повтор ждёт `retry_period` или `wake`.
+        """
+        super().settle(message, delivered)
+        if not self.durable(message):
+            return
+        pending = message.tenant.name, message_id(message)
+        self.queued.discard(pending)
+        if not delivered:
+            self.failing = True
+            return
+        self.store.ack_message(*pending)
+        self.pending.pop(pending, None)
+        if not (self.failing or self.queued) and self.pending:
+            self.wakeup.set()
+
+    async def redeliver(self):
+        """Пачками досылает сообщения, оставшиеся в хранилище."""
+        while True:
+            self.wakeup.clear()
+            batch = self.waiting()
+            if batch:
+                self.failing = False
+                logger.info(REDELIVERING.format(count=len(batch)))
+            for message in batch:
+                self.queued.add((message.tenant.name, message_id(message)))
+                self.redelivered += 1
+                await super().put(message)
+            try:
+                await asyncio.wait_for(
+                    self.wakeup.wait(), self.retry_period
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    def waiting(self):
+        """Возвращает до `batch_size` старейших сообщений вне очереди.
+
+        Сообщения старше `ttl` секунд удаляются из хранилища.
+        """
+        if len(self.pending) <= len(self.queued):
+            return []
+        deadline = time.time() - self.ttl
+        batch = []
+        expired = []
+        for pending, (created, chat_id, text) in self.pending.items():
+            if len(batch) >= self.batch_size:
+                break
+            if pending in self.queued:
+                continue
+            if created < deadline:
+                expired.append((pending, chat_id))
+                continue
+            name, pending_id = pending
+            batch.append(Message(
+                chat_id, text, tenant=self.tenants[name], key=(pending_id,)
+            ))
+        for pending, chat_id in expired:
+            self.expire(pending, chat_id)
+        return batch
+
+    def expire(self, pending, chat_id):
+        """Удаляет из хранилища сообщение, не доставленное за `ttl`."""
+        logger.error(MESSAGE_EXPIRED.format(
+            tenant=pending[0], id=pending[1], chat_id=chat_id, ttl=self.ttl
+        ))
+        self.store.ack_message(*pending)
+        del self.pending[pending]
+        self.expired += 1
+
+    def stats(self):
+        """Добавляет к показателям очереди число сохранённых сообщений."""
+        return {
+            **super().stats(),
+            'pending': len(self.pending),
+            'redelivered': self.redelivered,
+            'expired': self.expired,
+        }
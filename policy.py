@@ -0,0 +1,83 @@
+import logging
+import os
+from collections import Counter, namedtuple
+
+from homework import RETRY_PERIOD
+
+
+POLL_POLICY = os.getenv('POLL_POLICY', 'adaptive')
+POLL_FAST_PERIOD = int(os.getenv('POLL_FAST_PERIOD', 60))
+POLL_MAX_PERIOD = int(os.getenv('POLL_MAX_PERIOD', 3600))
+POLL_BACKOFF = float(os.getenv('POLL_BACKOFF', 2))
+
+UNKNOWN_POLICY = 'Неизвестная политика опроса "{name}". Доступны: {names}'
+DECISION = 'Следующий опрос "{tenant}" через {delay} с ({reason}).'
+
+logger = logging.getLogger(__name__)
+
+Decision = namedtuple('Decision', ('delay', 'reason'))
+
+
+class FixedPolicy:
+    """Опрашивает API с постоянным периодом."""
+
+    def __init__(self, period=RETRY_PERIOD):
+        """Задаёт период опроса в секундах."""
+        self.period = period
+        self.decisions = Counter()
+
+    def next_delay(self, state):
+        """Возвращает задержку до следующего опроса и её причину."""
+        return self.decide(state, Decision(self.period, 'fixed'))
+
+    def decide(self, state, decision):
+        """Учитывает решение в счётчиках и журнале."""
+        self.decisions[decision.reason] += 1
+        logger.debug(DECISION.format(
+            tenant=state.name, delay=decision.delay, reason=decision.reason
+        ))
+        return decision
+
+
+class AdaptivePolicy(FixedPolicy):
+    """Подстраивает период опроса под активность аккаунта.
+
+    Пока хотя бы одна работа на ревью или последний опрос принёс изменения,
+    аккаунт опрашивается с коротким периодом. Каждый опрос без изменений
+    увеличивает период в `factor` раз, но не выше `cap`.
+    """
+
+    def __init__(self, period=RETRY_PERIOD, fast=POLL_FAST_PERIOD,
+                 cap=POLL_MAX_PERIOD, factor=POLL_BACKOFF):
+        """Задаёт обычный, частый и наибольший периоды опроса."""
+        super().__init__(period)
+        self.fast = fast
+        self.cap = cap
+        self.factor = factor
+
+    def next_delay(self, state):
+        """Возвращает задержку до следующего опроса и её причину."""
+        if state.failed:
+            return self.decide(state, Decision(self.period, 'error'))
+        if state.reviewing:
+            return self.decide(state, Decision(self.fast, 'reviewing'))
+        if state.changed:
+            return self.decide(state, Decision(self.fast, 'changed'))
+        backoff = self.factor ** max(state.idle_polls - 1, 0)
+        delay = min(self.period * backoff, self.cap)
+        return self.decide(state, Decision(int(delay), 'idle'))
+
+
+POLICIES = {
+    'fixed': FixedPolicy,
+    'adaptive': AdaptivePolicy,
+}
+
+
+def make_policy(name=POLL_POLICY):
+    """Создаёт политику опроса по её имени."""
+    if name not in POLICIES:
+        raise ValueError(UNKNOWN_POLICY.format(
+            name=name, names=', '.join(POLICIES)
+        ))
+    return POLICIES[name]()
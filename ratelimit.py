@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+API_RATE_LIMIT = float(os.getenv('API_RATE_LIMIT', 10))
+API_BURST = int(os.getenv('API_BURST', 10))
+API_DEFAULT_RETRY_AFTER = float(os.getenv('API_DEFAULT_RETRY_AFTER', 60))
+
+
+def parse_retry_after(value):
+    """Переводит заголовок `Retry-After` в секунды или возвращает None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max((moment - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """Потокобезопасное ведро токенов для всех запросов процесса.
+
+    Реализовано по алгоритму GCRA: вместо счётчика токенов хранится
+    теоретическое время следующего запроса, поэтому резервирование — это
+    одно сравнение под блокировкой. `reserve` сразу занимает место в
+    очереди и возвращает, сколько нужно подождать, так что ждать можно
+    как в потоке, так и в сопрограмме.
+    """
+
+    def __init__(self, rate=API_RATE_LIMIT, burst=API_BURST,
+                 clock=time.monotonic):
+        """Создаёт полное ведро на `burst` запросов."""
+        self.interval = 1 / rate
+        self.burst = burst
+        self.tau = (burst - 1) * self.interval
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.tat = clock()
+        self.paused_until = 0.0
+        self.throttled = 0
+        self.delayed = 0
+        self.waited = 0.0
+
+    def reserve(self):
+        """Занимает токен и возвращает время ожидания в секундах."""
+        with self.lock:
+            now = self.clock()
+            start = max(now, self.paused_until)
+            tat = max(self.tat, start)
+            allowed_at = max(tat - self.tau, start)
+            self.tat = tat + self.interval
+            wait = allowed_at - now
+            if wait > 0:
+                self.delayed += 1
+                self.waited += wait
+            return max(wait, 0.0)
+
+    def try_reserve(self):
+        """Занимает токен, только если ждать не нужно.
+
+        Возвращает 0, если токен занят, или время до свободного токена;
+        в этом случае ведро не меняется.
+        """
+        with self.lock:
+            now = self.clock()
+            start = max(now, self.paused_until)
+            tat = max(self.tat, start)
+            wait = max(tat - self.tau, start) - now
+            if wait > 0:
+                return wait
+            self.tat = tat + self.interval
+            return 0.0
+
+    def acquire(self):
+        """Занимает токен, блокируя поток на время ожидания."""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def penalize(self, retry_after=None):
+        """Приостанавливает все запросы после ответа 429 или 503."""
+        if retry_after is None:
+            retry_after = API_DEFAULT_RETRY_AFTER
+        with self.lock:
+            self.throttled += 1
+            self.paused_until = max(
+                self.paused_until, self.clock() + retry_after
+            )
+            self.tat = max(self.tat, self.paused_until + self.tau)
+
+    def stats(self):
+        """Возвращает текущий бюджет и счётчики ограничений."""
+        with self.lock:
+            now = self.clock()
+            budget = (now + self.tau + self.interval - self.tat)
+            budget /= self.interval
+            return {
+                'rate': 1 / self.interval,
+                'budget': max(0.0, min(float(self.burst), budget)),
+                'paused_for': max(self.paused_until - now, 0.0),
+                'throttled': self.throttled,
+                'delayed': self.delayed,
+                'waited': self.waited,
+            }
+
+
+api_limiter = TokenBucket()
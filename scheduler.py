@@ -0,0 +1,154 @@
+import math
+import zlib
+
+
+SCHEDULE_IN_PAST = 'Нельзя планировать таймер "{key}" до начала колеса.'
+
+
+def jitter(key, period):
+    """Возвращает детерминированное смещение ключа в пределах периода.
+
+    Смещение зависит только от ключа, поэтому после перезапуска аккаунт
+    попадает в тот же момент внутри периода, а аккаунты равномерно
+    распределяются по периоду вместо одновременного старта.
+    """
+    if period <= 0:
+        return 0.0
+    spread = zlib.crc32(str(key).encode()) / 0xFFFFFFFF
+    return spread * period
+
+
+class LagStats:
+    """Отставание срабатывания таймеров от запланированного времени."""
+
+    def __init__(self):
+        """Создаёт пустые счётчики отставания."""
+        self.fired = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, lag):
+        """Учитывает отставание одного таймера."""
+        self.fired += 1
+        self.total += lag
+        if lag > self.max:
+            self.max = lag
+
+    @property
+    def mean(self):
+        """Среднее отставание в секундах."""
+        return self.total / self.fired if self.fired else 0.0
+
+
+class TimingWheel:
+    """Иерархическое колесо таймеров с O(1) вставкой и отменой.
+
+    Уровень `level` состоит из `slots` корзин по `slots ** level` тиков.
+    Таймер кладётся на самый нижний уровень, который покрывает его
+    задержку, и при обороте младшего колеса переносится уровнем ниже.
+    Таймеры дальше горизонта всех уровней ждут в корзине старшего уровня
+    и переносятся, пока не окажутся в пределах горизонта.
+    """
+
+    def __init__(self, tick=1.0, slots=64, levels=4, start=0.0):
+        """Создаёт пустое колесо, начинающееся в момент `start`."""
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.start = start
+        self.current = 0
+        self.spans = [slots ** level for level in range(levels + 1)]
+        self.wheels = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self.timers = {}
+        self.ready = {}
+        self.lag = LagStats()
+
+    def __len__(self):
+        """Количество запланированных таймеров."""
+        return len(self.timers)
+
+    def __contains__(self, key):
+        """Проверяет, запланирован ли таймер для ключа."""
+        return key in self.timers
+
+    def when(self, key):
+        """Возвращает запланированное время срабатывания таймера."""
+        return self.start + self.timers[key][2] * self.tick
+
+    def schedule(self, key, when):
+        """Планирует срабатывание `key` в момент `when`, заменяя прежний."""
+        if when < self.start:
+            raise ValueError(SCHEDULE_IN_PAST.format(key=key))
+        self.cancel(key)
+        self.place(key, math.ceil((when - self.start) / self.tick))
+
+    def cancel(self, key):
+        """Отменяет таймер. Возвращает True, если таймер был."""
+        timer = self.timers.pop(key, None)
+        if timer is None:
+            return False
+        bucket, _, _ = timer
+        del bucket[key]
+        return True
+
+    def place(self, key, deadline):
+        """Кладёт таймер в корзину, соответствующую его сроку."""
+        delta = deadline - self.current
+        if delta <= 0:
+            bucket = self.ready
+        else:
+            level = 0
+            while level < self.levels - 1 and delta >= self.spans[level + 1]:
+                level += 1
+            target = min(deadline, self.current + self.spans[level + 1])
+            index = (target // self.spans[level]) % self.slots
+            bucket = self.wheels[level][index]
+        bucket[key] = deadline
+        self.timers[key] = (bucket, key, deadline)
+
+    def cascade(self, level):
+        """Переносит таймеры текущей корзины уровня `level` ниже."""
+        index = (self.current // self.spans[level]) % self.slots
+        bucket = self.wheels[level][index]
+        if not bucket:
+            return
+        self.wheels[level][index] = {}
+        for key, deadline in bucket.items():
+            self.place(key, deadline)
+
+    def advance(self, now):
+        """Продвигает колесо до `now` и возвращает сработавшие таймеры.
+
+        Возвращается список пар (ключ, запланированное время); отставание
+        `now` от запланированного времени учитывается в `self.lag`.
+        """
+        target = math.floor((now - self.start) / self.tick)
+        due = []
+        self.collect(self.ready, due, now)
+        while self.current < target:
+            self.current += 1
+            index = self.current % self.slots
+            if index == 0:
+                for level in range(self.levels - 1, 0, -1):
+                    if self.current % self.spans[level] == 0:
+                        self.cascade(level)
+            bucket = self.wheels[0][index]
+            if bucket:
+                self.wheels[0][index] = {}
+                self.collect(bucket, due, now)
+            self.collect(self.ready, due, now)
+        return due
+
+    def collect(self, bucket, due, now):
+        """Снимает таймеры корзины как сработавшие."""
+        if bucket is self.ready:
+            if not bucket:
+                return
+            self.ready = {}
+        for key, deadline in bucket.items():
+            del self.timers[key]
+            when = self.start + deadline * self.tick
+            self.lag.add(max(now - when, 0.0))
+            due.append((key, when))
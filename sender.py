@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+import telegram
+
+from ratelimit import TokenBucket
+
+
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', 1))
+TELEGRAM_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_MAX_ATTEMPTS', 5))
+RATE_WINDOW = 10
+
+RETRY_AFTER = 'Telegram просит подождать {delay} с перед отправкой в {chat}.'
+GAVE_UP = 'Сообщение в чат {chat} не отправлено за {attempts} попыток.'
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitedSender:
+    """Отправляет сообщения в пределах ограничений Telegram.
+
+    Telegram допускает около 30 сообщений в секунду на бота и около одного
+    в секунду в один чат. Перед отправкой сообщение ждёт токен в ведре
+    своего чата, а затем в общем ведре. Ответ `RetryAfter` приостанавливает
+    общее ведро ровно на запрошенное время, после чего сообщение
+    отправляется повторно.
+    """
+
+    def __init__(self, deliver, global_rate=TELEGRAM_GLOBAL_RATE,
+                 chat_rate=TELEGRAM_CHAT_RATE,
+                 max_attempts=TELEGRAM_MAX_ATTEMPTS, clock=time.monotonic):
+        """Задаёт функцию доставки и ограничения скорости."""
+        self.deliver = deliver
+        self.global_limiter = TokenBucket(
+            global_rate, max(int(global_rate), 1), clock
+        )
+        self.chat_rate = chat_rate
+        self.chats = {}
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.delivered = 0
+        self.retried = 0
+        self.recent = deque()
+
+    def chat_delay(self, chat_id):
+        """Занимает место в ведре чата или возвращает время ожидания.
+
+        В отличие от `send` не ждёт: `Outbox` откладывает сообщение в
+        очередь чата и тем временем отправляет сообщения других чатов.
+        """
+        return self.chat_limiter(chat_id).try_reserve()
+
+    def chat_limiter(self, chat_id):
+        """Возвращает ведро токенов чата."""
+        if chat_id not in self.chats:
+            self.chats[chat_id] = TokenBucket(
+                self.chat_rate, 1, self.clock
+            )
+        return self.chats[chat_id]
+
+    async def send(self, message, reserved=False):
+        """Отправляет сообщение, соблюдая ограничения и `RetryAfter`.
+
+        С `reserved` место в ведре чата уже занято через `chat_delay`, и
+        первая попытка ждёт только общее ведро.
+        """
+        for attempt in range(self.max_attempts):
+            if attempt or not reserved:
+                await asyncio.sleep(
+                    self.chat_limiter(message.chat_id).reserve()
+                )
+            await asyncio.sleep(self.global_limiter.reserve())
+            try:
+                sent = await self.deliver(message)
+            except telegram.error.RetryAfter as error:
+                self.retried += 1
+                self.global_limiter.penalize(error.retry_after)
+                logger.warning(RETRY_AFTER.format(
+                    delay=error.retry_after, chat=message.chat_id
+                ))
+                continue
+            if sent is not None:
+                self.count_delivery()
+            return sent
+        logger.error(GAVE_UP.format(
+            chat=message.chat_id, attempts=self.max_attempts
+        ))
+        return None
+
+    def count_delivery(self):
+        """Учитывает доставку в скользящем окне."""
+        now = self.clock()
+        self.delivered += 1
+        self.recent.append(now)
+        while self.recent and self.recent[0] <= now - RATE_WINDOW:
+            self.recent.popleft()
+
+    def stats(self):
+        """Возвращает скорость доставки и счётчики ограничений."""
+        now = self.clock()
+        while self.recent and self.recent[0] <= now - RATE_WINDOW:
+            self.recent.popleft()
+        limiter = self.global_limiter.stats()
+        return {
+            'delivered': self.delivered,
+            'delivered_per_second': len(self.recent) / RATE_WINDOW,
+            'retried': self.retried,
+            'paused_for': limiter['paused_for'],
+            'delayed': limiter['delayed'],
+            'chats': len(self.chats),
+        }
@@ -0,0 +1,39 @@
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 30))
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+
+class PooledSession(requests.Session):
+    """HTTP-сессия с пулом keep-alive соединений и таймаутами.
+
+    Соединения с API переиспользуются между запросами, поэтому TCP и TLS
+    рукопожатия выполняются один раз на соединение пула, а не на каждый
+    опрос. Сессию можно разделять между потоками: при `pool_block=True`
+    потоки ждут свободного соединения, а не открывают лишние.
+    """
+
+    def __init__(self, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT,
+                 pool_block=True):
+        """Подключает адаптеры с пулом на `pool_size` соединений."""
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            pool_block=pool_block
+        )
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+
+    def request(self, method, url, **kwargs):
+        """Выполняет запрос, подставляя таймауты сессии по умолчанию."""
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().request(method, url, **kwargs)
@@ -0,0 +1,52 @@
+from metrics import status_transitions
+
+
+def homework_key(homework):
+    """Возвращает ключ работы: её id или, если его нет, название."""
+    key = homework.get('id')
+    return homework.get('homework_name') if key is None else key
+
+
+class StatusIndex:
+    """Последние известные статусы работ одного аккаунта.
+
+    Для каждой работы хранится пара (статус, `date_updated`). Ответ API
+    сравнивается с индексом за один проход по самому ответу, поэтому
+    стоимость сравнения зависит от размера ответа, а не от числа
+    известных работ.
+    """
+
+    def __init__(self, entries=None, on_commit=None):
+        """Создаёт индекс из словаря `entries`."""
+        self.entries = {} if entries is None else entries
+        self.on_commit = on_commit
+
+    def __len__(self):
+        """Количество известных работ."""
+        return len(self.entries)
+
+    def get(self, homework):
+        """Возвращает известную пару (статус, дата) для работы."""
+        return self.entries.get(homework_key(homework))
+
+    def changed(self, homework):
+        """Проверяет, отличается ли статус работы от известного."""
+        return self.get(homework) != (
+            homework.get('status'), homework.get('date_updated')
+        )
+
+    def diff(self, homeworks):
+        """Возвращает работы с новым статусом, от старых к новым."""
+        changed = list(filter(self.changed, homeworks))
+        changed.sort(key=lambda homework: homework.get('date_updated') or '')
+        return changed
+
+    def commit(self, homework):
+        """Запоминает статус работы после доставки уведомления."""
+        key = homework_key(homework)
+        entry = self.entries[key] = (
+            homework.get('status'), homework.get('date_updated')
+        )
+        status_transitions.inc(entry[0])
+        if self.on_commit is not None:
+            self.on_commit(key, *entry)
@@ -0,0 +1,614 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from functools import partial
+
+from statuses import StatusIndex
+
+
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')
+STATE_PATH = os.getenv('STATE_PATH', 'state.db')
+STATE_BATCH_SIZE = int(os.getenv('STATE_BATCH_SIZE', 500))
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', 1))
+STATE_BUSY_TIMEOUT = float(os.getenv('STATE_BUSY_TIMEOUT', 30))
+STATE_WRITE_ATTEMPTS = 3
+
+UNKNOWN_BACKEND = 'Неизвестное хранилище состояния "{name}". Доступны: {names}'
+STATE_LOADED = 'Состояние загружено из {path} за {elapsed:.1f} мс.'
+BROKEN_LOG_RECORD = 'Пропущена повреждённая запись журнала {path}: {record}'
+WRITE_RETRY = 'Пачка изменений не записана в {path}, повтор: {error}'
+WRITE_FAILED = 'Пачка из {count} изменений потеряна: {path}: {error}'
+RECORD_OPERATIONS = {
+    'from_date': 'save_timestamp',
+    'status': 'save_status',
+    'put': 'put_message',
+    'ack': 'ack_message',
+    'board': 'save_board',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tenants (
+    tenant TEXT PRIMARY KEY,
+    from_date INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS statuses (
+    tenant TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT,
+    date_updated TEXT,
+    PRIMARY KEY (tenant, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS outbox (
+    tenant TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (tenant, message_id)
+);
+CREATE TABLE IF NOT EXISTS boards (
+    tenant TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    message_id INTEGER,
+    digest TEXT,
+    entries TEXT NOT NULL,
+    PRIMARY KEY (tenant, chat_id)
+);
+'''
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """Хранилище состояния аккаунтов в памяти процесса.
+
+    Для каждого аккаунта хранит `from_date`, индекс статусов работ,
+    исходящие сообщения, ещё не подтверждённые Telegram, и доски статусов
+    его чатов. Остальные
+    хранилища повторяют этот интерфейс и добавляют запись на диск.
+    """
+
+    def __init__(self):
+        """Создаёт пустое хранилище."""
+        self.timestamps = {}
+        self.statuses = {}
+        self.outbox = {}
+        self.boards = {}
+
+    def load_timestamp(self, tenant, default):
+        """Возвращает сохранённый `from_date` аккаунта или `default`."""
+        return self.timestamps.get(tenant, default)
+
+    def load_index(self, tenant):
+        """Возвращает индекс статусов, сохраняющий изменения в хранилище."""
+        return StatusIndex(
+            self.statuses.setdefault(tenant, {}),
+            on_commit=partial(self.save_status, tenant)
+        )
+
+    def save_timestamp(self, tenant, timestamp):
+        """Сохраняет `from_date` аккаунта."""
+        self.timestamps[tenant] = timestamp
+
+    def save_status(self, tenant, key, status, date_updated):
+        """Сохраняет последний доставленный статус работы."""
+        self.statuses.setdefault(tenant, {})[key] = (status, date_updated)
+
+    def put_message(self, tenant, message_id, chat_id, text, created=None):
+        """Сохраняет исходящее сообщение до подтверждения доставки."""
+        self.outbox.setdefault(tenant, {})[message_id] = (
+            chat_id, text, time.time() if created is None else created
+        )
+
+    def ack_message(self, tenant, message_id):
+        """Удаляет доставленное сообщение."""
+        self.outbox.get(tenant, {}).pop(message_id, None)
+
+    def pending_messages(self, tenant):
+        """Возвращает недоставленные сообщения: (id, чат, текст, время)."""
+        return [
+            (message_id, *message)
+            for message_id, message in self.outbox.get(tenant, {}).items()
+        ]
+
+    def load_board(self, tenant, chat_id):
+        """Возвращает доску чата: (id сообщения, хеш текста, работы)."""
+        message_id, digest, entries = self.boards.get(
+            (tenant, chat_id), (None, None, {})
+        )
+        return message_id, digest, dict(entries)
+
+    def save_board(self, tenant, chat_id, message_id, digest, entries):
+        """Сохраняет доску статусов чата."""
+        self.boards[tenant, chat_id] = (message_id, digest, dict(entries))
+
+    def reload(self, tenant):
+        """Перечитывает состояние аккаунта, изменённое другой репликой."""
+
+    def flush(self):
+        """Записывает накопленные изменения."""
+
+    def close(self):
+        """Записывает изменения и освобождает ресурсы."""
+        self.flush()
+
+
+class BatchingStore(MemoryStore, ABC):
+    """Основа хранилищ, записывающих изменения пачками.
+
+    Изменения копятся до `batch_size` штук или до `flush_interval` секунд
+    и записываются одной транзакцией, поэтому тысячи обновлений в секунду
+    не превращаются в тысячи синхронизаций диска.
+    """
+
+    def __init__(self, batch_size=STATE_BATCH_SIZE,
+                 flush_interval=STATE_FLUSH_INTERVAL):
+        """Задаёт размер пачки и период записи."""
+        super().__init__()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self.pending = 0
+        self.flushed_at = time.monotonic()
+
+    def changed(self):
+        """Учитывает изменение и при необходимости записывает пачку."""
+        self.pending += 1
+        if self.full():
+            self.flush()
+
+    def full(self):
+        """Проверяет, пора ли записать накопленную пачку."""
+        return (
+            self.pending >= self.batch_size
+            or time.monotonic() - self.flushed_at >= self.flush_interval
+        )
+
+    def flush(self):
+        """Записывает накопленные изменения."""
+        with self.lock:
+            if self.pending:
+                self.write_batch()
+            self.pending = 0
+            self.flushed_at = time.monotonic()
+
+    @abstractmethod
+    def write_batch(self):
+        """Фиксирует пачку изменений на диске."""
+
+
+class ThreadedStore(BatchingStore):
+    """Основа хранилищ, записывающих пачки в отдельном потоке.
+
+    Изменения копятся в памяти, а готовую пачку забирает из очереди поток
+    записи, поэтому цикл событий не ждёт диска. `flush` передаёт
+    накопленное потоку и ждёт окончания записи.
+    """
+
+    def __init__(self, **kwargs):
+        """Создаёт пустую очередь пачек; поток запускает `start_writer`."""
+        super().__init__(**kwargs)
+        self.writes = []
+        self.batches = queue.Queue()
+        self.writer = None
+
+    def start_writer(self, name):
+        """Запускает поток записи с именем `name`."""
+        self.writer = threading.Thread(
+            target=self.write_batches, name=name, daemon=True
+        )
+        self.writer.start()
+
+    def add(self, write):
+        """Добавляет изменение в текущую пачку."""
+        with self.lock:
+            self.writes.append(write)
+            self.changed()
+
+    def changed(self):
+        """Учитывает изменение и передаёт полную пачку потоку записи.
+
+        Записи пачки здесь не ждут: изменения приходят и из цикла
+        событий.
+        """
+        self.pending += 1
+        if self.full():
+            BatchingStore.flush(self)
+
+    def flush(self):
+        """Записывает накопленные изменения и ждёт окончания записи."""
+        super().flush()
+        self.batches.join()
+
+    def write_batch(self):
+        """Передаёт накопленные изменения потоку записи."""
+        self.batches.put(self.writes)
+        self.writes = []
+
+    def write_batches(self):
+        """Записывает пачки из очереди, пока не получит None."""
+        while True:
+            batch = self.batches.get()
+            try:
+                if batch is None:
+                    return
+                self.commit(batch)
+            finally:
+                self.batches.task_done()
+
+    @abstractmethod
+    def commit(self, batch):
+        """Записывает пачку в потоке записи."""
+
+    def close(self):
+        """Записывает изменения и останавливает поток записи."""
+        self.flush()
+        self.batches.put(None)
+        self.writer.join()
+
+
+class SQLiteStore(ThreadedStore):
+    """Хранилище состояния в SQLite в режиме WAL.
+
+    Изменения копятся в памяти, а готовую пачку записывает отдельный
+    поток одной короткой транзакцией `BEGIN IMMEDIATE`. Так цикл событий
+    не ждёт диска и блокировки базы, а база не остаётся заблокированной
+    между пачками, и её могут делить несколько процессов. Занятую другим
+    процессом базу поток ждёт до `busy_timeout` секунд.
+    """
+
+    def __init__(self, path=STATE_PATH, busy_timeout=STATE_BUSY_TIMEOUT,
+                 **kwargs):
+        """Открывает базу состояния в файле `path`."""
+        super().__init__(**kwargs)
+        self.path = path
+        started = time.perf_counter()
+        self.connection = self.connect(busy_timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.load()
+        self.write_connection = self.connect(busy_timeout)
+        self.start_writer('sqlite-store')
+        logger.info(STATE_LOADED.format(
+            path=path, elapsed=(time.perf_counter() - started) * 1000
+        ))
+
+    def connect(self, busy_timeout):
+        """Открывает соединение без неявных транзакций."""
+        connection = sqlite3.connect(
+            self.path, timeout=busy_timeout, isolation_level=None,
+            check_same_thread=False
+        )
+        connection.execute(f'PRAGMA busy_timeout={int(busy_timeout * 1000)}')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    def load(self):
+        """Читает состояние всех аккаунтов в память."""
+        rows = self.connection.execute('SELECT tenant, from_date FROM tenants')
+        self.timestamps = dict(rows)
+        rows = self.connection.execute(
+            'SELECT tenant, key, status, date_updated FROM statuses'
+        )
+        for tenant, key, status, date_updated in rows:
+            self.statuses.setdefault(tenant, {})[json.loads(key)] = (
+                status, date_updated
+            )
+        rows = self.connection.execute(
+            'SELECT tenant, message_id, chat_id, text, created FROM outbox'
+        )
+        for tenant, message_id, chat_id, text, created in rows:
+            self.outbox.setdefault(tenant, {})[message_id] = (
+                chat_id, text, created
+            )
+        rows = self.connection.execute(
+            'SELECT tenant, chat_id, message_id, digest, entries FROM boards'
+        )
+        for tenant, chat_id, message_id, digest, entries in rows:
+            super().save_board(
+                tenant, chat_id, message_id, digest, load_entries(entries)
+            )
+
+    def reload(self, tenant):
+        """Перечитывает состояние аккаунта, изменённое другой репликой.
+
+        Нужно, когда реплика получает аккаунт в аренду: в памяти мог
+        остаться снимок, сделанный до того, как аккаунт опрашивала
+        другая реплика. Накопленные изменения сначала записываются, иначе
+        перечитанное состояние потеряло бы их.
+        """
+        with self.lock:
+            self.flush()
+            rows = self.connection.execute(
+                'SELECT from_date FROM tenants WHERE tenant = ?', (tenant,)
+            ).fetchall()
+            if rows:
+                self.timestamps[tenant] = rows[0][0]
+            entries = self.statuses.setdefault(tenant, {})
+            entries.clear()
+            for key, status, date_updated in self.connection.execute(
+                'SELECT key, status, date_updated FROM statuses '
+                'WHERE tenant = ?', (tenant,)
+            ):
+                entries[json.loads(key)] = (status, date_updated)
+            self.outbox[tenant] = {
+                message_id: (chat_id, text, created)
+                for message_id, chat_id, text, created in (
+                    self.connection.execute(
+                        'SELECT message_id, chat_id, text, created '
+                        'FROM outbox WHERE tenant = ?', (tenant,)
+                    )
+                )
+            }
+            for chat_id, message_id, digest, entries in (
+                    self.connection.execute(
+                        'SELECT chat_id, message_id, digest, entries '
+                        'FROM boards WHERE tenant = ?', (tenant,)
+                    )):
+                MemoryStore.save_board(
+                    self, tenant, chat_id, message_id, digest,
+                    load_entries(entries)
+                )
+
+    def execute(self, sql, parameters):
+        """Добавляет изменение в текущую пачку."""
+        self.add((sql, parameters))
+
+    def save_timestamp(self, tenant, timestamp):
+        """Сохраняет `from_date` аккаунта."""
+        super().save_timestamp(tenant, timestamp)
+        self.execute(
+            'INSERT OR REPLACE INTO tenants VALUES (?, ?)', (tenant, timestamp)
+        )
+
+    def save_status(self, tenant, key, status, date_updated):
+        """Сохраняет последний доставленный статус работы."""
+        super().save_status(tenant, key, status, date_updated)
+        self.execute(
+            'INSERT OR REPLACE INTO statuses VALUES (?, ?, ?, ?)',
+            (tenant, json.dumps(key), status, date_updated)
+        )
+
+    def put_message(self, tenant, message_id, chat_id, text, created=None):
+        """Сохраняет исходящее сообщение до подтверждения доставки."""
+        super().put_message(tenant, message_id, chat_id, text, created)
+        _, _, created = self.outbox[tenant][message_id]
+        self.execute(
+            'INSERT OR REPLACE INTO outbox VALUES (?, ?, ?, ?, ?)',
+            (tenant, message_id, str(chat_id), text, created)
+        )
+
+    def ack_message(self, tenant, message_id):
+        """Удаляет доставленное сообщение."""
+        super().ack_message(tenant, message_id)
+        self.execute(
+            'DELETE FROM outbox WHERE tenant = ? AND message_id = ?',
+            (tenant, message_id)
+        )
+
+    def save_board(self, tenant, chat_id, message_id, digest, entries):
+        """Сохраняет доску статусов чата."""
+        super().save_board(tenant, chat_id, message_id, digest, entries)
+        self.execute(
+            'INSERT OR REPLACE INTO boards VALUES (?, ?, ?, ?, ?)',
+            (tenant, chat_id, message_id, digest, dump_entries(entries))
+        )
+
+    def commit(self, batch):
+        """Записывает пачку одной транзакцией, повторяя при сбое."""
+        connection = self.write_connection
+        for attempt in range(1, STATE_WRITE_ATTEMPTS + 1):
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    for sql, parameters in batch:
+                        connection.execute(sql, parameters)
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                return
+            except sqlite3.Error as error:
+                if attempt == STATE_WRITE_ATTEMPTS:
+                    logger.critical(WRITE_FAILED.format(
+                        count=len(batch), path=self.path, error=error
+                    ))
+                else:
+                    logger.warning(WRITE_RETRY.format(
+                        path=self.path, error=error
+                    ))
+
+    def close(self):
+        """Записывает изменения и закрывает базу."""
+        super().close()
+        self.write_connection.close()
+        self.connection.close()
+
+
+class LogStore(ThreadedStore):
+    """Хранилище состояния в журнале с добавлением записей в конец.
+
+    Каждое изменение — строка JSON. При запуске журнал проигрывается
+    целиком, а `compact` переписывает его снимком текущего состояния,
+    когда устаревших записей становится больше живых. Дописывает,
+    синхронизирует и сжимает журнал поток записи. Снимок он делает по
+    своей копии состояния `mirror`, которую ведёт по тем же записям,
+    поэтому не читает словари, которые меняет цикл событий.
+    """
+
+    def __init__(self, path=STATE_PATH, **kwargs):
+        """Читает состояние из журнала `path`."""
+        super().__init__(**kwargs)
+        self.path = path
+        self.records = 0
+        self.mirror = MemoryStore()
+        started = time.perf_counter()
+        if os.path.exists(path):
+            self.replay()
+        self.file = open(path, 'a', encoding='utf-8')
+        logger.info(STATE_LOADED.format(
+            path=path, elapsed=(time.perf_counter() - started) * 1000
+        ))
+        self.compact()
+        self.start_writer('log-store')
+
+    def replay(self):
+        """Восстанавливает состояние по записям журнала."""
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    apply_record(self.mirror, *json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    logger.warning(BROKEN_LOG_RECORD.format(
+                        path=self.path, record=line.strip()
+                    ))
+                    continue
+                self.records += 1
+        self.timestamps = dict(self.mirror.timestamps)
+        self.statuses = {
+            tenant: dict(entries)
+            for tenant, entries in self.mirror.statuses.items()
+        }
+        self.outbox = {
+            tenant: dict(messages)
+            for tenant, messages in self.mirror.outbox.items()
+        }
+        self.boards = dict(self.mirror.boards)
+
+    def append(self, *record):
+        """Добавляет запись в пачку для журнала."""
+        self.add(record)
+
+    def save_timestamp(self, tenant, timestamp):
+        """Сохраняет `from_date` аккаунта."""
+        super().save_timestamp(tenant, timestamp)
+        self.append('from_date', tenant, timestamp)
+
+    def save_status(self, tenant, key, status, date_updated):
+        """Сохраняет последний доставленный статус работы."""
+        super().save_status(tenant, key, status, date_updated)
+        self.append('status', tenant, key, status, date_updated)
+
+    def put_message(self, tenant, message_id, chat_id, text, created=None):
+        """Сохраняет исходящее сообщение до подтверждения доставки."""
+        super().put_message(tenant, message_id, chat_id, text, created)
+        _, _, created = self.outbox[tenant][message_id]
+        self.append('put', tenant, message_id, chat_id, text, created)
+
+    def ack_message(self, tenant, message_id):
+        """Удаляет доставленное сообщение."""
+        super().ack_message(tenant, message_id)
+        self.append('ack', tenant, message_id)
+
+    def save_board(self, tenant, chat_id, message_id, digest, entries):
+        """Сохраняет доску статусов чата."""
+        super().save_board(tenant, chat_id, message_id, digest, entries)
+        self.append(
+            'board', tenant, chat_id, message_id, digest,
+            dump_entries(entries)
+        )
+
+    def commit(self, batch):
+        """Дописывает пачку в журнал, синхронизирует и сжимает его."""
+        try:
+            for record in batch:
+                self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                apply_record(self.mirror, *record)
+            self.records += len(batch)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.compact()
+        except OSError as error:
+            logger.critical(WRITE_FAILED.format(
+                count=len(batch), path=self.path, error=error
+            ))
+
+    def snapshot(self):
+        """Возвращает записи, воспроизводящие записанное состояние."""
+        mirror = self.mirror
+        for tenant, timestamp in mirror.timestamps.items():
+            yield 'from_date', tenant, timestamp
+        for tenant, entries in mirror.statuses.items():
+            for key, (status, date_updated) in entries.items():
+                yield 'status', tenant, key, status, date_updated
+        for tenant, messages in mirror.outbox.items():
+            for message_id, (chat_id, text, created) in messages.items():
+                yield 'put', tenant, message_id, chat_id, text, created
+        for (tenant, chat_id), (message_id, digest, entries) in (
+                mirror.boards.items()):
+            yield (
+                'board', tenant, chat_id, message_id, digest,
+                dump_entries(entries)
+            )
+
+    def compact(self, force=False):
+        """Переписывает журнал снимком, если он сильно разросся.
+
+        Вызывается из потока записи, а до его запуска — при открытии.
+        """
+        mirror = self.mirror
+        live = (
+            len(mirror.timestamps)
+            + sum(map(len, mirror.statuses.values()))
+            + sum(map(len, mirror.outbox.values()))
+            + len(mirror.boards)
+        )
+        if not force and self.records <= 2 * live + self.batch_size:
+            return
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            for record in self.snapshot():
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self.file.close()
+        os.replace(temporary, self.path)
+        self.file = open(self.path, 'a', encoding='utf-8')
+        self.records = live
+
+    def close(self):
+        """Записывает изменения и закрывает журнал."""
+        super().close()
+        self.file.close()
+
+
+def apply_record(store, operation, *arguments):
+    """Применяет запись журнала к хранилищу в памяти."""
+    if operation == 'board':
+        *arguments, entries = arguments
+        arguments.append(load_entries(entries))
+    getattr(store, RECORD_OPERATIONS[operation])(*arguments)
+
+
+def dump_entries(entries):
+    """Сериализует работы доски: ключи работ бывают числами и строками."""
+    return json.dumps(
+        [[key, name, status] for key, (name, status) in entries.items()],
+        ensure_ascii=False
+    )
+
+
+def load_entries(data):
+    """Восстанавливает работы доски из `dump_entries`."""
+    return {key: (name, status) for key, name, status in json.loads(data)}
+
+
+BACKENDS = {
+    'memory': lambda path: MemoryStore(),
+    'sqlite': SQLiteStore,
+    'log': LogStore,
+}
+
+
+def open_store(backend=STATE_BACKEND, path=STATE_PATH):
+    """Открывает хранилище состояния по имени бэкенда."""
+    if backend not in BACKENDS:
+        raise ValueError(UNKNOWN_BACKEND.format(
+            name=backend, names=', '.join(BACKENDS)
+        ))
+    return BACKENDS[backend](path)
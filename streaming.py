@@ -0,0 +1,167 @@
+import codecs
+import json
+import os
+from functools import partial
+
+from decoder import HOMEWORK_NOT_LIST, HOMEWORKS_NOT_IN_RESPONSE
+from homework import DECODER, api_params, check_api_error, get_response
+from metrics import homeworks_per_response
+
+
+API_STREAMING = os.getenv('API_STREAMING', 'false').lower() == 'true'
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 64 * 1024))
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 100))
+
+WHITESPACE = ' \t\r\n'
+
+STREAM_TRUNCATED = 'Ответ API оборвался до конца JSON-документа.'
+UNEXPECTED_TOKEN = (
+    'Неожиданный символ {token!r} в ответе API, ожидался {expected}.'
+)
+
+
+class HomeworkStream:
+    """Потоковый разбор ответа API по мере загрузки.
+
+    Элементы массива `homeworks` разбираются по одному и сразу
+    отдаются записями `Homework`, поэтому в памяти одновременно
+    находятся только непрочитанный хвост загрузки и текущая работа.
+    Остальные поля ответа собираются в `fields` и проверяются в конце.
+    """
+
+    def __init__(self, chunks, decoder=DECODER, check=None, close=None):
+        """Создаёт разборщик потока фрагментов `chunks`."""
+        self.chunks = iter(chunks)
+        self.decoder = decoder
+        self.check = check
+        self.on_close = close
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.exhausted = False
+        self.fields = {}
+        self.has_homeworks = False
+        self.count = 0
+        self.bytes = 0
+
+    @property
+    def current_date(self):
+        """`current_date` из ответа; известна после разбора всего ответа."""
+        return self.decoder.current_date(self.fields.get('current_date'))
+
+    def fill(self):
+        """Дочитывает следующий кусок ответа. False, если ответ кончился."""
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.exhausted = True
+            self.buffer += self.text.decode(b'', final=True)
+            return False
+        self.bytes += len(chunk)
+        self.buffer += self.text.decode(chunk)
+        return True
+
+    def peek(self):
+        """Пропускает пробелы и возвращает следующий значимый символ."""
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position] in WHITESPACE):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError(STREAM_TRUNCATED)
+
+    def expect(self, *tokens):
+        """Читает один из ожидаемых символов-разделителей."""
+        token = self.peek()
+        if token not in tokens:
+            raise ValueError(UNEXPECTED_TOKEN.format(
+                token=token, expected=' или '.join(tokens)
+            ))
+        self.position += 1
+        return token
+
+    def value(self):
+        """Разбирает следующее JSON-значение, дочитывая ответ по мере нужды.
+
+        Число, закончившееся ровно на конце буфера, считается
+        прочитанным, только когда ответ кончился: иначе `12` могло
+        оказаться началом `123`. Объекты, массивы и строки ограничены
+        скобками и кавычками, поэтому отдаются сразу.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.position)
+                if (end < len(self.buffer) or self.exhausted
+                        or not isinstance(value, (int, float))):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+    def __iter__(self):
+        """Отдаёт записи `Homework` по мере разбора ответа."""
+        try:
+            self.expect('{')
+            if self.peek() == '}':
+                self.position += 1
+            else:
+                while True:
+                    key = self.value()
+                    self.expect(':')
+                    if key == 'homeworks' and self.peek() == '[':
+                        self.has_homeworks = True
+                        yield from self.homeworks()
+                    else:
+                        self.fields[key] = self.value()
+                    if self.expect(',', '}') == '}':
+                        break
+        finally:
+            self.close()
+        if self.check is not None:
+            self.check(self.fields)
+        if not self.has_homeworks:
+            if 'homeworks' not in self.fields:
+                raise KeyError(HOMEWORKS_NOT_IN_RESPONSE)
+            raise TypeError(HOMEWORK_NOT_LIST.format(
+                type(self.fields['homeworks'])
+            ))
+        self.decoder.current_date(self.fields.get('current_date'))
+        homeworks_per_response.observe(self.count)
+
+    def homeworks(self):
+        """Разбирает массив `homeworks` по одному элементу."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            homework = self.decoder.homework(self.value())
+            self.count += 1
+            yield homework
+            if self.expect(',', ']') == ']':
+                return
+
+    def close(self):
+        """Закрывает соединение с API."""
+        if self.on_close is not None:
+            self.on_close()
+            self.on_close = None
+
+
+def stream_api(client, headers, timestamp, chunk_size=STREAM_CHUNK_SIZE):
+    """Запрашивает статусы работ и возвращает их потоковый разбор."""
+    rq_pars = api_params(headers, timestamp)
+    response = get_response(client, rq_pars, stream=True)
+    return HomeworkStream(
+        response.iter_content(chunk_size),
+        check=partial(check_api_error, rq_pars=rq_pars),
+        close=response.close
+    )
@@ -0,0 +1,56 @@
+import logging
+
+
+SUBSCRIBED = 'Чат {chat} подписан на обновления аккаунта {tenant}.'
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriptions:
+    """Реестр подписок: токен API домашки и чаты, получающие его статусы.
+
+    Токен опрашивается один раз за цикл, а результат рассылается всем
+    подписанным чатам, поэтому число запросов к API зависит от числа
+    токенов, а не от числа подписчиков.
+    """
+
+    def __init__(self):
+        """Создаёт пустой набор подписок."""
+        self.chats = {}
+        self.owners = {}
+
+    @classmethod
+    def from_tenants(cls, tenants):
+        """Строит реестр по аккаунтам; аккаунты с одним токеном сливаются."""
+        subscriptions = cls()
+        for tenant in tenants:
+            for chat_id in (tenant.chat_id, *tenant.subscribers):
+                subscriptions.subscribe(tenant, chat_id)
+        return subscriptions
+
+    def subscribe(self, tenant, chat_id):
+        """Подписывает чат на статусы токена аккаунта."""
+        token = tenant.practicum_token
+        owner = self.owners.setdefault(token, tenant)
+        chats = self.chats.setdefault(token, [])
+        if chat_id not in chats:
+            chats.append(chat_id)
+            logger.info(SUBSCRIBED.format(chat=chat_id, tenant=owner.name))
+
+    def unsubscribe(self, tenant, chat_id):
+        """Отписывает чат; владелец токена остаётся в реестре."""
+        chats = self.chats.get(tenant.practicum_token, [])
+        if chat_id in chats and len(chats) > 1:
+            chats.remove(chat_id)
+
+    def tenants(self):
+        """Возвращает по одному опрашиваемому аккаунту на токен."""
+        return list(self.owners.values())
+
+    def chats_of(self, tenant):
+        """Возвращает чаты, подписанные на токен аккаунта."""
+        return list(self.chats.get(tenant.practicum_token, ()))
+
+    def __len__(self):
+        """Число подписок по всем токенам."""
+        return sum(map(len, self.chats.values()))
@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from engine import (
+    MAX_WORKERS, MISSED_TELEGRAM_TOKEN, TELEGRAM_TOKEN, TENANTS_FILE,
+    PollingEngine, load_tenants
+)
+from logconfig import current_queue, redirect_logging, setup_logging
+from storage import STATE_BACKEND, open_store
+
+
+SUPERVISOR_WORKERS = int(os.getenv('SUPERVISOR_WORKERS', os.cpu_count()))
+SUPERVISOR_REPLICAS = int(os.getenv('SUPERVISOR_REPLICAS', 100))
+SUPERVISOR_TICK = float(os.getenv('SUPERVISOR_TICK', 1))
+SUPERVISOR_REPORT_PERIOD = float(os.getenv('SUPERVISOR_REPORT_PERIOD', 60))
+SUPERVISOR_RESTART_DELAY = float(os.getenv('SUPERVISOR_RESTART_DELAY', 5))
+SHARED_BACKENDS = ('memory', 'sqlite')
+
+WORKER_STARTED = 'Процесс {name} (pid {pid}) запущен: аккаунтов {count}.'
+WORKER_DIED = (
+    'Процесс {name} (pid {pid}) завершился с кодом {code}, '
+    'перезапуск через {delay:.0f} с.'
+)
+WORKER_REPORT = (
+    'Процесс {name} (pid {pid}): аккаунтов {tenants}, '
+    'опросов {polls_rate:.2f}/с, доставлено {delivered_rate:.2f}/с, '
+    'сбоев доставки {failed}, перезапусков {restarts}.'
+)
+SUPERVISOR_REPORT = (
+    'Всего процессов {workers}: опросов {polls_rate:.2f}/с, '
+    'доставлено {delivered_rate:.2f}/с.'
+)
+BACKEND_NOT_SHARED = (
+    'Хранилище "{backend}" нельзя разделить между процессами. '
+    'Используйте одно из: {names}.'
+)
+
+logger = logging.getLogger(__name__)
+
+
+def ring_hash(key):
+    """Возвращает положение ключа на кольце."""
+    return int.from_bytes(
+        hashlib.blake2b(str(key).encode(), digest_size=8).digest(), 'big'
+    )
+
+
+class HashRing:
+    """Кольцо согласованного хеширования аккаунтов по процессам.
+
+    Каждый процесс занимает на кольце `replicas` точек, а ключ
+    принадлежит процессу первой точки по часовой стрелке. При
+    добавлении или удалении одного из N процессов переезжает около 1/N
+    ключей, остальные аккаунты остаются на своих процессах.
+    """
+
+    def __init__(self, nodes=(), replicas=SUPERVISOR_REPLICAS):
+        """Создаёт кольцо из узлов `nodes`."""
+        self.replicas = replicas
+        self.points = []
+        self.owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        """Добавляет процесс на кольцо."""
+        for replica in range(self.replicas):
+            point = ring_hash(f'{node}#{replica}')
+            bisect.insort(self.points, point)
+            self.owners[point] = node
+
+    def remove(self, node):
+        """Убирает процесс с кольца."""
+        for replica in range(self.replicas):
+            point = ring_hash(f'{node}#{replica}')
+            self.points.remove(point)
+            del self.owners[point]
+
+    def node(self, key):
+        """Возвращает процесс, которому принадлежит ключ."""
+        index = bisect.bisect(self.points, ring_hash(key))
+        return self.owners[self.points[index % len(self.points)]]
+
+    def assign(self, tenants):
+        """Распределяет аккаунты по процессам.
+
+        Ключ — токен API, поэтому аккаунты с общим токеном попадают в один
+        процесс и опрашиваются там один раз.
+        """
+        shards = {node: [] for node in set(self.owners.values())}
+        for tenant in tenants:
+            shards[self.node(tenant.practicum_token)].append(tenant)
+        return shards
+
+
+def counters(engine):
+    """Возвращает накопленные счётчики движка процесса."""
+    return {
+        'tenants': len(engine.tenants),
+        'polls': engine.polls,
+        'delivered': engine.outbox.delivered,
+        'failed': engine.outbox.failed,
+    }
+
+
+async def serve(name, engine, reports, period):
+    """Запускает движок и периодически отправляет его счётчики."""
+    runner = asyncio.create_task(engine.run())
+    asyncio.get_running_loop().add_signal_handler(
+        signal.SIGTERM, runner.cancel
+    )
+    while True:
+        done, _ = await asyncio.wait({runner}, timeout=period)
+        reports.put((name, os.getpid(), time.monotonic(), counters(engine)))
+        if done:
+            if not runner.cancelled():
+                runner.result()
+            return
+
+
+def work(name, tenants, reports, period=SUPERVISOR_REPORT_PERIOD,
+         log_queue=None):
+    """Точка входа рабочего процесса: опрашивает свою долю аккаунтов.
+
+    События журнала уходят в очередь `log_queue` супервизора, и в файл
+    журнала пишет только он.
+    """
+    if log_queue is not None:
+        redirect_logging(log_queue, logging.getLogger().level)
+    import telegram
+    from telegram.utils.request import Request
+
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN, request=Request(con_pool_size=MAX_WORKERS)
+    )
+    engine = PollingEngine(tenants, bot, store=open_store())
+    asyncio.run(serve(name, engine, reports, period))
+
+
+class WorkerStats:
+    """Последние счётчики рабочего процесса и скорость их роста."""
+
+    def __init__(self):
+        """Создаёт показатели ещё не отчитавшегося процесса."""
+        self.pid = None
+        self.at = None
+        self.counters = {}
+        self.rates = {}
+        self.restarts = 0
+
+    def update(self, pid, at, counters):
+        """Учитывает новый отчёт процесса."""
+        if pid == self.pid and self.at is not None and at > self.at:
+            self.rates = {
+                name: (counters[name] - self.counters.get(name, 0))
+                / (at - self.at)
+                for name in ('polls', 'delivered')
+            }
+        self.pid = pid
+        self.at = at
+        self.counters = counters
+
+
+class Supervisor:
+    """Запускает рабочие процессы и следит за ними.
+
+    Аккаунты делятся между `workers` процессами кольцом согласованного
+    хеширования. Упавший процесс перезапускается с тем же набором
+    аккаунтов через `restart_delay` секунд. Процессы присылают счётчики
+    опросов и доставок, а супервизор раз в `report_period` секунд пишет в
+    журнал скорость каждого процесса и общую.
+    """
+
+    def __init__(self, tenants, workers=SUPERVISOR_WORKERS, target=work,
+                 report_period=SUPERVISOR_REPORT_PERIOD,
+                 restart_delay=SUPERVISOR_RESTART_DELAY,
+                 tick=SUPERVISOR_TICK, log_queue=None):
+        """Задаёт аккаунты, число процессов и периоды проверок."""
+        self.names = [f'worker-{index}' for index in range(workers)]
+        self.ring = HashRing(self.names)
+        self.shards = self.ring.assign(tenants)
+        self.target = target
+        self.report_period = report_period
+        self.restart_delay = restart_delay
+        self.tick = tick
+        self.log_queue = log_queue
+        self.context = multiprocessing.get_context()
+        self.reports = self.context.Queue()
+        self.processes = {}
+        self.restart_at = {}
+        self.stats = {name: WorkerStats() for name in self.names}
+        self.reported_at = time.monotonic()
+
+    def spawn(self, name):
+        """Запускает рабочий процесс со своей долей аккаунтов."""
+        tenants = self.shards.get(name, [])
+        process = self.context.Process(
+            target=self.target, name=name,
+            args=(name, tenants, self.reports, self.report_period),
+            kwargs=(
+                {} if self.log_queue is None
+                else {'log_queue': self.log_queue}
+            )
+        )
+        process.start()
+        self.processes[name] = process
+        logger.info(WORKER_STARTED.format(
+            name=name, pid=process.pid, count=len(tenants)
+        ))
+
+    def start(self):
+        """Запускает все рабочие процессы."""
+        for name in self.names:
+            self.spawn(name)
+
+    def check(self, now):
+        """Перезапускает упавшие процессы, когда истекла задержка."""
+        for name, process in self.processes.items():
+            if process.is_alive() or process.exitcode is None:
+                continue
+            if name not in self.restart_at:
+                logger.error(WORKER_DIED.format(
+                    name=name, pid=process.pid, code=process.exitcode,
+                    delay=self.restart_delay
+                ))
+                self.restart_at[name] = now + self.restart_delay
+            if now >= self.restart_at[name]:
+                del self.restart_at[name]
+                process.close()
+                self.stats[name].restarts += 1
+                self.spawn(name)
+
+    def collect(self):
+        """Забирает отчёты процессов из очереди."""
+        while True:
+            try:
+                name, pid, at, counters = self.reports.get_nowait()
+            except queue.Empty:
+                return
+            self.stats[name].update(pid, at, counters)
+
+    def report(self, now):
+        """Раз в `report_period` секунд журналирует скорость процессов."""
+        if now - self.reported_at < self.report_period:
+            return
+        self.reported_at = now
+        for name, stats in self.stats.items():
+            logger.info(WORKER_REPORT.format(
+                name=name, pid=stats.pid,
+                tenants=stats.counters.get('tenants', 0),
+                polls_rate=stats.rates.get('polls', 0.0),
+                delivered_rate=stats.rates.get('delivered', 0.0),
+                failed=stats.counters.get('failed', 0),
+                restarts=stats.restarts
+            ))
+        logger.info(SUPERVISOR_REPORT.format(
+            workers=len(self.stats),
+            polls_rate=sum(
+                stats.rates.get('polls', 0.0) for stats in self.stats.values()
+            ),
+            delivered_rate=sum(
+                stats.rates.get('delivered', 0.0)
+                for stats in self.stats.values()
+            )
+        ))
+
+    def stop(self, timeout=10):
+        """Останавливает рабочие процессы, давая им сохранить состояние."""
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.collect()
+
+    def run(self):
+        """Запускает процессы и следит за ними до SIGTERM или Ctrl+C."""
+        signal.signal(signal.SIGTERM, interrupt)
+        self.start()
+        try:
+            while True:
+                time.sleep(self.tick)
+                now = time.monotonic()
+                self.collect()
+                self.check(now)
+                self.report(now)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+
+def interrupt(signum, frame):
+    """Превращает SIGTERM в KeyboardInterrupt для штатной остановки."""
+    raise KeyboardInterrupt
+
+
+def parse_args(args=None):
+    """Разбирает аргументы командной строки."""
+    parser = argparse.ArgumentParser(
+        description='Опрашивает API домашки в нескольких процессах.'
+    )
+    parser.add_argument('tenants', nargs='?', default=TENANTS_FILE,
+                        help='файл аккаунтов')
+    parser.add_argument('--workers', type=int, default=SUPERVISOR_WORKERS,
+                        help='число рабочих процессов')
+    return parser.parse_args(args)
+
+
+def main():
+    """Запускает супервизор рабочих процессов для аккаунтов из файла."""
+    args = parse_args()
+    if not TELEGRAM_TOKEN:
+        logger.critical(MISSED_TELEGRAM_TOKEN)
+        raise UnboundLocalError(MISSED_TELEGRAM_TOKEN)
+    if args.workers > 1 and STATE_BACKEND not in SHARED_BACKENDS:
+        raise ValueError(BACKEND_NOT_SHARED.format(
+            backend=STATE_BACKEND, names=', '.join(SHARED_BACKENDS)
+        ))
+    Supervisor(
+        load_tenants(args.tenants), args.workers, log_queue=current_queue()
+    ).run()
+
+
+if __name__ == '__main__':
+    setup_logging(
+        logging.INFO, log_queue=multiprocessing.get_context().Queue()
+    )
+    main()
@@ -0,0 +1,195 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import utils
+from ratelimit import TokenBucket
+
+DAY = 24 * 60 * 60
+SINCE = 1672531200
+
+
+def homework(id, status, timestamp):
+    return {
+        'id': id, 'homework_name': f'hw{id}', 'status': status,
+        'date_updated': time.strftime(
+            '%Y-%m-%dT%H:%M:%SZ', time.gmtime(timestamp)
+        ),
+    }
+
+
+class HistoryClient:
+    """Отдаёт работы, изменённые не раньше `from_date`, как API."""
+
+    def __init__(self, homeworks, fail_token=None):
+        self.homeworks = homeworks
+        self.fail_token = fail_token
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+
+    def get(self, *args, headers=None, params=None, **kwargs):
+        from_date = params['from_date']
+        with self.lock:
+            self.calls.append(from_date)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        if headers['Authorization'] == f'OAuth {self.fail_token}':
+            return utils.MockResponseGET(http_status=500)
+        since = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(from_date))
+        return utils.MockResponseGET(data={
+            'homeworks': [
+                item for item in self.homeworks
+                if item['date_updated'] >= since
+            ],
+            'current_date': SINCE + 10 * DAY,
+        })
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+        return object()
+
+
+@pytest.fixture
+def backfill_module():
+    import backfill
+    return backfill
+
+
+@pytest.fixture
+def engine_module():
+    import engine
+    return engine
+
+
+def run_backfill(backfill_module, engine_module, tenants, client, bot,
+                 days=4, **kwargs):
+    engine = engine_module.PollingEngine(
+        tenants, bot, client=client, chat_rate=1000,
+        limiter=TokenBucket(rate=1000, burst=1000)
+    )
+    return asyncio.run(backfill_module.Backfill(
+        engine, SINCE, SINCE + days * DAY, **kwargs
+    ).run())
+
+
+class TestBackfill:
+
+    def test_in_period(self, backfill_module):
+        until = SINCE + DAY
+        assert backfill_module.in_period(homework(1, 'approved', SINCE), until)
+        assert not backfill_module.in_period(
+            homework(1, 'approved', until), until
+        ), 'Проверьте, что конец периода не входит в период.'
+        assert backfill_module.in_period({'id': 1}, until), (
+            'Проверьте, что работа без даты относится к периоду.'
+        )
+
+    def test_parse_date(self, backfill_module):
+        assert backfill_module.parse_date(str(SINCE)) == SINCE, (
+            'Проверьте, что `parse_date` принимает Unix-время.'
+        )
+        assert backfill_module.parse_date('2023-01-01T00:00:00Z') == SINCE, (
+            'Проверьте, что `parse_date` принимает дату в формате ISO 8601.'
+        )
+        assert backfill_module.parse_date('2023-01-01') == SINCE, (
+            'Проверьте, что дата без часового пояса считается UTC.'
+        )
+
+    def test_sends_only_new_transitions(self, backfill_module,
+                                        engine_module):
+        tenant = engine_module.Tenant('student', 'sometoken', '12345')
+        history = [
+            homework(1, 'approved', SINCE + DAY // 2),
+            homework(2, 'reviewing', SINCE + DAY + 10),
+            homework(3, 'rejected', SINCE + 3 * DAY + 10),
+            homework(4, 'approved', SINCE + 5 * DAY),
+        ]
+        client = HistoryClient(history)
+        bot = FakeBot()
+        engine = engine_module.PollingEngine(
+            [tenant], bot, client=client, chat_rate=1000,
+            limiter=TokenBucket(rate=1000, burst=1000)
+        )
+        engine.state(tenant).index.commit(
+            backfill_module.DECODER.homework(history[0])
+        )
+        backfill = asyncio.run(backfill_module.Backfill(
+            engine, SINCE, SINCE + 4 * DAY
+        ).run())
+        assert client.calls == [SINCE], (
+            'Проверьте, что история аккаунта загружается одним запросом.'
+        )
+        assert len(bot.sent) == 2, (
+            'Проверьте, что отправляются только статусы внутри периода, '
+            'которых ещё нет в индексе.'
+        )
+        assert backfill.changed == 2 and backfill.delivered == 2, (
+            'Проверьте, что отчёт учитывает новые и доставленные статусы.'
+        )
+        assert engine.states['student'].timestamp != SINCE + 10 * DAY, (
+            'Проверьте, что восстановление не сдвигает `from_date` опроса.'
+        )
+
+    def test_concurrency_limits(self, backfill_module, engine_module):
+        tenants = [
+            engine_module.Tenant(f'student{i}', f'token{i}', str(i))
+            for i in range(6)
+        ]
+        client = HistoryClient([])
+        backfill = run_backfill(
+            backfill_module, engine_module, tenants, client, FakeBot(),
+            days=8, concurrency=3
+        )
+        assert backfill.fetched == 6, (
+            'Проверьте, что каждый аккаунт загружается одним запросом.'
+        )
+        assert 1 < client.max_active <= 3, (
+            'Проверьте, что аккаунты загружаются параллельно, а общее '
+            'число одновременных запросов ограничено.'
+        )
+
+    def test_failed_tenant(self, backfill_module, engine_module):
+        tenants = [
+            engine_module.Tenant('student', 'sometoken', '12345'),
+            engine_module.Tenant('other', 'othertoken', '54321'),
+        ]
+        client = HistoryClient(
+            [homework(1, 'approved', SINCE + 10)], fail_token='sometoken'
+        )
+        bot = FakeBot()
+        backfill = run_backfill(
+            backfill_module, engine_module, tenants, client, bot, days=2
+        )
+        assert backfill.failed == 1 and backfill.fetched == 1, (
+            'Проверьте, что сбой одного аккаунта не останавливает остальные.'
+        )
+        assert bot.sent == [('54321', bot.sent[0][1])], (
+            'Проверьте, что статусы загруженных аккаунтов отправляются.'
+        )
+        assert 'с ошибкой: 1' in backfill.report(), (
+            'Проверьте, что отчёт показывает аккаунты с ошибкой.'
+        )
+
+    def test_dry_run(self, backfill_module, engine_module):
+        tenant = engine_module.Tenant('student', 'sometoken', '12345')
+        client = HistoryClient([homework(1, 'approved', SINCE + 10)])
+        bot = FakeBot()
+        backfill = run_backfill(
+            backfill_module, engine_module, [tenant], client, bot,
+            dry_run=True
+        )
+        assert backfill.changed == 1 and not bot.sent, (
+            'Проверьте, что в режиме `--dry-run` статусы только считаются.'
+        )
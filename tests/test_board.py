@@ -0,0 +1,119 @@
+import telegram
+
+from board import StatusBoard
+from storage import MemoryStore
+
+
+class Sent:
+    def __init__(self, message_id):
+        self.message_id = message_id
+
+
+class BoardBot:
+    def __init__(self, edit_error=None):
+        self.calls = []
+        self.edit_error = edit_error
+
+    def send_message(self, chat_id, text, **kwargs):
+        self.calls.append(('send', text))
+        return Sent(len(self.calls))
+
+    def edit_message_text(self, text, chat_id=None, message_id=None):
+        self.calls.append(('edit', message_id))
+        if self.edit_error is not None:
+            raise self.edit_error
+        return True
+
+    def pin_chat_message(self, chat_id, message_id, **kwargs):
+        self.calls.append(('pin', message_id))
+
+
+def homework(status, name='hw1'):
+    return {'id': 1, 'homework_name': name, 'status': status}
+
+
+class TestStatusBoard:
+
+    def test_board_is_published_then_edited(self):
+        store = MemoryStore()
+        bot = BoardBot()
+        board = StatusBoard('student', 123, store)
+        board.publish(bot, '123', board.render([homework('reviewing')]))
+        board.publish(bot, '123', board.render([homework('approved')]))
+        assert [call[0] for call in bot.calls] == ['send', 'pin', 'edit'], (
+            'Проверьте, что доска публикуется и закрепляется один раз, '
+            'а затем редактируется.'
+        )
+        restored = StatusBoard('student', '123', store)
+        assert restored.message_id == board.message_id, (
+            'Проверьте, что id сообщения доски сохраняется в хранилище.'
+        )
+        assert restored.render([homework('approved')]) is None
+
+    def test_unchanged_text_skips_edit(self):
+        board = StatusBoard('student', 123, MemoryStore())
+        board.publish(BoardBot(), '123', board.render([homework('approved')]))
+        assert board.render([homework('approved')]) is None, (
+            'Проверьте, что доска не редактируется без изменения текста.'
+        )
+        assert board.skipped == 1
+
+    def test_not_modified_is_success(self):
+        board = StatusBoard('student', 123, MemoryStore())
+        board.publish(BoardBot(), '123', board.render([homework('approved')]))
+        bot = BoardBot(telegram.error.BadRequest(
+            'Message is not modified: specified new message content'
+        ))
+        assert board.publish(
+            bot, '123', board.render([homework('rejected')])
+        ) is True
+
+    def test_lost_board_is_republished(self):
+        board = StatusBoard('student', 123, MemoryStore())
+        board.publish(BoardBot(), '123', board.render([homework('approved')]))
+        bot = BoardBot(telegram.error.BadRequest('Message to edit not found'))
+        board.publish(bot, '123', board.render([homework('rejected')]))
+        assert [call[0] for call in bot.calls] == ['edit', 'send', 'pin']
+
+    def test_long_history_fits_message_limit(self):
+        board = StatusBoard('student', 123, MemoryStore())
+        text = board.render([
+            {'id': number, 'homework_name': f'homework_{number:04d}.zip',
+             'status': 'approved'}
+            for number in range(1000)
+        ] + [
+            {'id': 5000, 'homework_name': 'zz_last.zip',
+             'status': 'reviewing'},
+        ])
+        assert len(text) <= 4096, (
+            'Проверьте, что доска не длиннее лимита сообщения Telegram.'
+        )
+        lines = text.splitlines()
+        assert '👀 zz_last.zip' in lines, (
+            'Проверьте, что работы на проверке не вытесняются принятыми.'
+        )
+        shown = sum(line.startswith('✅') for line in lines)
+        assert lines[-1] == f'И ещё принятых работ: {1000 - shown}.', (
+            'Проверьте, что доска сообщает, сколько работ не поместилось.'
+        )
+        assert '✅ homework_0999.zip' in lines, (
+            'Проверьте, что с доски первыми уходят старые принятые работы.'
+        )
+        assert len(board.entries) == 1001
+
+    def test_approved_footer_fits_limit(self):
+        for limit in range(60, 160):
+            board = StatusBoard('student', 123, MemoryStore(), limit=limit)
+            board.render([
+                {'id': number, 'homework_name': f'hw_{number}.zip',
+                 'status': 'approved'}
+                for number in range(200)
+            ])
+            text = board.text()
+            assert text.splitlines()[-1].startswith('И ещё принятых работ'), (
+                'Проверьте, что скрыты только принятые работы.'
+            )
+            assert len(text) <= limit, (
+                'Проверьте, что строка о скрытых принятых работах '
+                'учитывается в лимите доски.'
+            )
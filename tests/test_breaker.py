@@ -0,0 +1,99 @@
+import pytest
+import telegram
+
+from breaker import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, is_api_failure,
+    is_telegram_failure
+)
+from exceptions import CircuitOpenError, NotOkStatusResponseError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError('down')
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker('api', failure_threshold=2, recovery_timeout=10,
+                          clock=clock)
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_threshold_and_fails_fast(self, breaker):
+        calls = []
+
+        def counted():
+            calls.append(1)
+            fail()
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(counted)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.call(counted)
+        assert len(calls) == 2, (
+            'Проверьте, что разомкнутый предохранитель не вызывает сервис.'
+        )
+        assert breaker.rejected == 1
+
+    def test_half_open_probe(self, breaker, clock):
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        clock.now = 10
+        breaker.before_call()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.on_error(ConnectionError())
+        assert breaker.state == OPEN, (
+            'Проверьте, что неудачная проба снова размыкает предохранитель.'
+        )
+        closed = []
+        breaker.on_close = lambda: closed.append(breaker.state)
+        clock.now = 20
+        assert breaker.call(lambda: 'ok') == 'ok'
+        assert breaker.state == CLOSED
+        assert closed == [CLOSED], (
+            'Проверьте, что `on_close` вызывается при замыкании цепи.'
+        )
+
+    def test_ignored_errors_do_not_open(self, clock):
+        breaker = CircuitBreaker('api', failure_threshold=1, clock=clock,
+                                 is_failure=is_api_failure)
+        with pytest.raises(NotOkStatusResponseError):
+            breaker.call(self.raise_status, 401)
+        assert breaker.state == CLOSED, (
+            'Проверьте, что ошибка аккаунта не размыкает предохранитель API.'
+        )
+        with pytest.raises(NotOkStatusResponseError):
+            breaker.call(self.raise_status, 502)
+        assert breaker.state == OPEN
+
+    @staticmethod
+    def raise_status(status):
+        raise NotOkStatusResponseError('error', status)
+
+    @pytest.mark.parametrize('error, expected', [
+        (telegram.error.TimedOut(), True),
+        (telegram.error.NetworkError('down'), True),
+        (telegram.error.BadRequest('bad'), False),
+        (telegram.error.Unauthorized('blocked'), False),
+    ])
+    def test_telegram_failures(self, error, expected):
+        assert is_telegram_failure(error) is expected
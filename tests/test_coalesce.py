@@ -0,0 +1,87 @@
+import asyncio
+import time
+from collections import namedtuple
+
+from coalesce import Coalescer, digest_text, split
+from latency import Timeline, latency_tracker
+from outbox import Message, Outbox
+
+Tenant = namedtuple('Tenant', ('name',))
+
+
+class TestCoalescer:
+
+    def test_window_merges_chat_messages(self):
+        sent = []
+
+        async def send(message):
+            sent.append((message.chat_id, message.text))
+            return message.text
+
+        async def scenario():
+            outbox = Outbox(send, workers=1)
+            await outbox.start()
+            coalescer = Coalescer(outbox, window=0.01)
+            acks = [await coalescer.put(Message(chat, text))
+                    for chat, text in ((1, 'a'), (1, 'b'), (2, 'c'))]
+            results = await asyncio.gather(*acks)
+            await outbox.stop()
+            return coalescer, results
+
+        coalescer, results = asyncio.run(scenario())
+        assert sorted(sent) == [(1, digest_text(['a', 'b'])), (2, 'c')], (
+            'Проверьте, что сообщения одного чата объединяются в дайджест.'
+        )
+        assert results == [True, True, True], (
+            'Проверьте, что доставка дайджеста подтверждает все сообщения.'
+        )
+        assert coalescer.stats()['merged'] == 2
+
+    def test_digest_keeps_tenant_of_each_verdict(self):
+        async def send(message):
+            return message.text
+
+        async def scenario():
+            outbox = Outbox(send, workers=1)
+            await outbox.start()
+            coalescer = Coalescer(outbox, window=0.01)
+            acks = [
+                await coalescer.put(Message(
+                    1, name, tenant=Tenant(name), timelines=(Timeline(
+                        reviewed=time.time() - age, tenant=name
+                    ),)
+                ))
+                for name, age in (('digest-fast', 1), ('digest-slow', 100))
+            ]
+            await asyncio.gather(*acks)
+            await outbox.stop()
+
+        asyncio.run(scenario())
+        assert latency_tracker.percentiles('digest-slow')[0.5] >= 100, (
+            'Проверьте, что задержка вердикта из дайджеста учитывается по '
+            'его аккаунту, а не по первому аккаунту дайджеста.'
+        )
+        assert latency_tracker.percentiles('digest-fast')[0.5] < 100
+
+    def test_failed_digest_fails_all_acks(self):
+        async def send(message):
+            return None
+
+        async def scenario():
+            outbox = Outbox(send, workers=1)
+            await outbox.start()
+            coalescer = Coalescer(outbox, window=0)
+            acks = [await coalescer.put(Message(1, text)) for text in 'ab']
+            results = await asyncio.gather(*acks)
+            await outbox.stop()
+            return results
+
+        assert asyncio.run(scenario()) == [False, False]
+
+
+def test_split_respects_message_limit():
+    batches = list(split(['x' * 40] * 5, limit=150))
+    assert [len(batch) for batch in batches] == [2, 2, 1], (
+        'Проверьте, что дайджест делится по лимиту длины сообщения.'
+    )
+    assert all(len(digest_text(batch)) <= 150 for batch in batches)
@@ -0,0 +1,64 @@
+import gzip
+import io
+import json
+
+import pytest
+import requests
+import urllib3
+
+import codec
+
+
+def gzipped_response(data):
+    body = gzip.compress(json.dumps(data).encode())
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = urllib3.HTTPResponse(
+        body=io.BytesIO(body), headers={'Content-Encoding': 'gzip'},
+        preload_content=False, decode_content=True
+    )
+    return response, len(body)
+
+
+class TestDecodeJson:
+
+    def test_compressed_response_is_measured(self):
+        data = {'homeworks': [{'homework_name': 'hw' * 50}] * 50}
+        response, wire_bytes = gzipped_response(data)
+        stats = codec.ResponseStats()
+        assert codec.decode_json(response, stats) == data
+        result = stats.stats()
+        assert result['wire_bytes'] == wire_bytes, (
+            'Проверьте, что учитываются байты, полученные из сети.'
+        )
+        assert result['body_bytes'] == len(json.dumps(data))
+        assert result['compression'] > 1
+
+    def test_response_without_body_uses_json(self):
+        class Response:
+            def json(self):
+                return {'homeworks': []}
+
+        stats = codec.ResponseStats()
+        assert codec.decode_json(Response(), stats) == {'homeworks': []}
+        assert stats.stats()['responses'] == 0
+
+
+@pytest.mark.parametrize('name', ['json', 'orjson'])
+def test_backends_agree(name):
+    assert codec.make_loads(name)(b'{"a": [1, "\\u0444"]}') == {
+        'a': [1, 'ф']
+    }
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        codec.make_loads('simplejson')
+
+
+def test_accept_encoding_keeps_headers():
+    headers = codec.accept_encoding({'Authorization': 'OAuth token'})
+    assert headers['Authorization'] == 'OAuth token'
+    assert 'gzip' in headers['Accept-Encoding'], (
+        'Проверьте, что запрос объявляет поддержку сжатия.'
+    )
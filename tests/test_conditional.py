@@ -0,0 +1,84 @@
+import json
+
+import requests
+
+from conditional import (
+    ConditionalStats, LastResponse, body_digest, request_changes
+)
+
+
+def response(data=None, status=200, headers=None):
+    result = requests.Response()
+    result.status_code = status
+    result._content = b'' if data is None else json.dumps(data).encode()
+    result.headers.update(headers or {})
+    return result
+
+
+class Client:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.headers = []
+
+    def get(self, headers=None, **kwargs):
+        self.headers.append(headers)
+        return self.responses.pop(0)
+
+
+HOMEWORK = {'id': 1, 'homework_name': 'hw', 'status': 'approved'}
+
+
+class TestRequestChanges:
+
+    def test_unchanged_body_is_not_decoded(self):
+        client = Client(
+            response({'homeworks': [HOMEWORK], 'current_date': 1}),
+            response({'homeworks': [HOMEWORK], 'current_date': 2}),
+            response({'homeworks': [], 'current_date': 3}),
+        )
+        last = LastResponse()
+        stats = ConditionalStats()
+        first = request_changes(client, {}, 0, last, stats)
+        second = request_changes(client, {}, 0, last, stats)
+        third = request_changes(client, {}, 0, last, stats)
+        assert second.homeworks is first.homeworks, (
+            'Проверьте, что неизменный ответ не разбирается заново.'
+        )
+        assert second.current_date == 2, (
+            'Проверьте, что `current_date` берётся из нового ответа.'
+        )
+        assert third.homeworks == []
+        assert stats.stats()['unchanged'] == 1
+        assert stats.stats()['polls'] == 3
+
+    def test_validators_are_sent(self):
+        client = Client(
+            response({'homeworks': [HOMEWORK], 'current_date': 1},
+                     headers={'ETag': '"v1"', 'Last-Modified': 'yesterday'}),
+            response(status=304),
+        )
+        last = LastResponse()
+        stats = ConditionalStats()
+        first = request_changes(client, {'Authorization': 'OAuth t'}, 0,
+                                last, stats)
+        second = request_changes(client, {'Authorization': 'OAuth t'}, 0,
+                                 last, stats)
+        assert 'If-None-Match' not in client.headers[0]
+        assert client.headers[1]['If-None-Match'] == '"v1"', (
+            'Проверьте, что запрос отправляется с `If-None-Match`.'
+        )
+        assert client.headers[1]['If-Modified-Since'] == 'yesterday'
+        assert second.homeworks is first.homeworks
+        assert second.current_date is None, (
+            'Проверьте, что при ответе 304 `from_date` не сдвигается.'
+        )
+        assert stats.stats()['not_modified'] == 1
+
+
+def test_digest_ignores_current_date():
+    assert body_digest(b'{"homeworks": [], "current_date": 1}') == (
+        body_digest(b'{"homeworks": [], "current_date":  22}')
+    )
+    assert body_digest(b'{"homeworks": []}') != body_digest(
+        b'{"homeworks": [1]}'
+    )
@@ -0,0 +1,71 @@
+import pytest
+
+from decoder import (
+    MISSED_HOMEWORK_KEYS, UNEXPERCTED_HOMEWORK_STATUS, Homework,
+    ResponseDecoder
+)
+
+STATUSES = ('approved', 'reviewing', 'rejected')
+
+
+@pytest.fixture
+def decoder():
+    return ResponseDecoder(STATUSES)
+
+
+class TestResponseDecoder:
+
+    def test_decode_builds_records(self, decoder):
+        response = decoder.decode({
+            'homeworks': [
+                {'id': 1, 'homework_name': 'hw1', 'status': ''.join(
+                    ['appr', 'oved']
+                ), 'date_updated': 'today', 'reviewer_comment': 'Ок'},
+                {'homework_name': 'hw2', 'status': 'reviewing'},
+            ],
+            'current_date': 100
+        })
+        assert response.current_date == 100
+        assert response.homeworks == [
+            Homework(1, 'hw1', 'approved', 'today'),
+            Homework(None, 'hw2', 'reviewing'),
+        ]
+        assert response.homeworks[0].status is STATUSES[0], (
+            'Проверьте, что строки статусов интернируются.'
+        )
+        assert not hasattr(response.homeworks[0], '__dict__'), (
+            'Проверьте, что записи работ используют `__slots__`.'
+        )
+
+    def test_record_behaves_like_dict(self):
+        homework = Homework(None, 'hw', 'approved')
+        assert homework.get('id') is None
+        assert homework.get('date_updated', '') == ''
+        assert homework['homework_name'] == 'hw'
+        assert 'status' in homework and 'id' not in homework
+        with pytest.raises(KeyError):
+            homework['reviewer_comment']
+
+    @pytest.mark.parametrize('item, error, message', [
+        ({'status': 'approved'}, KeyError,
+         MISSED_HOMEWORK_KEYS.format('homework_name')),
+        ({'homework_name': 'hw'}, KeyError,
+         MISSED_HOMEWORK_KEYS.format('status')),
+        ({'homework_name': 'hw', 'status': 'unknown'}, ValueError,
+         UNEXPERCTED_HOMEWORK_STATUS.format('unknown')),
+    ])
+    def test_invalid_homework_keeps_messages(self, decoder, item, error,
+                                             message):
+        with pytest.raises(error) as info:
+            decoder.decode({'homeworks': [item]})
+        assert message in str(info.value), (
+            'Проверьте, что сообщения об ошибках не изменились.'
+        )
+
+    @pytest.mark.parametrize('response', [
+        [], {'homeworks': {}}, {'homeworks': [], 'current_date': '1'},
+        {'homeworks': ['hw']},
+    ])
+    def test_invalid_types(self, decoder, response):
+        with pytest.raises(TypeError):
+            decoder.decode(response)
@@ -0,0 +1,52 @@
+from dedupe import DedupeCache, error_fingerprint, verdict_fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDedupeCache:
+
+    def test_repeat_is_suppressed_within_ttl(self):
+        clock = FakeClock()
+        cache = DedupeCache(ttl=60, maxsize=10, clock=clock)
+        assert not cache.seen('key')
+        cache.add('key')
+        assert cache.seen('key'), (
+            'Проверьте, что повтор в пределах окна подавляется.'
+        )
+        clock.now += 60
+        assert not cache.seen('key'), (
+            'Проверьте, что по истечении окна сообщение снова отправляется.'
+        )
+        stats = cache.stats()
+        assert (stats['hits'], stats['misses'], stats['expired']) == (1, 2, 1)
+
+    def test_size_is_bounded(self):
+        cache = DedupeCache(ttl=60, maxsize=3, clock=FakeClock())
+        for key in range(100):
+            cache.add(key)
+        assert len(cache) == 3, (
+            'Проверьте, что размер кэша ограничен при длительном сбое.'
+        )
+        assert cache.stats()['evictions'] == 97
+        assert cache.seen(99) and not cache.seen(0)
+
+
+def test_fingerprints_ignore_error_text():
+    assert error_fingerprint(
+        ValueError('from_date=1'), 'url'
+    ) == error_fingerprint(ValueError('from_date=2'), 'url'), (
+        'Проверьте, что отпечаток ошибки не зависит от её текста.'
+    )
+    homework = {'id': 1, 'status': 'approved', 'date_updated': 'today'}
+    assert verdict_fingerprint(1, homework) == verdict_fingerprint(
+        '1', dict(homework)
+    )
+    assert verdict_fingerprint(1, homework) != verdict_fingerprint(
+        1, dict(homework, status='rejected')
+    )
@@ -0,0 +1,552 @@
+import asyncio
+import json
+from functools import partial
+
+import pytest
+import telegram
+
+import utils
+from dedupe import DedupeCache
+from ratelimit import TokenBucket
+
+
+class FakeClient:
+    def __init__(self, data=None, http_status=200, headers=None):
+        self.data = data
+        self.http_status = http_status
+        self.headers = headers or {}
+        self.calls = []
+
+    def get(self, *args, **kwargs):
+        self.calls.append(kwargs)
+        response = utils.MockResponseGET(
+            *args, random_timestamp=1000198000,
+            http_status=self.http_status, data=self.data, **kwargs
+        )
+        response.headers = self.headers
+        return response
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
+        return object()
+
+
+@pytest.fixture
+def engine_module():
+    import engine
+    return engine
+
+
+@pytest.fixture
+def tenant(engine_module):
+    return engine_module.Tenant('student', 'sometoken', '12345')
+
+
+def run_poll(engine_module, tenant, client, bot, polls=1, **kwargs):
+    kwargs.setdefault('chat_rate', 1000)
+    engine = engine_module.PollingEngine(
+        [tenant], bot, client=client, **kwargs
+    )
+
+    async def poll():
+        await engine.outbox.start()
+        for _ in range(polls):
+            await engine.poll(tenant)
+            if engine.notifier is not engine.outbox:
+                await asyncio.gather(*engine.notifier.tasks)
+            await engine.outbox.join()
+            await asyncio.sleep(0)
+        await engine.outbox.stop()
+
+    try:
+        asyncio.run(poll())
+    finally:
+        engine.close()
+    return engine
+
+
+class TestEngine:
+
+    def test_load_tenants(self, engine_module, tmp_path):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps([
+            {'name': 'a', 'practicum_token': 't1', 'chat_id': 1},
+            {'name': 'b', 'practicum_token': 't2', 'chat_id': '2'},
+        ]))
+        tenants = engine_module.load_tenants(path)
+        assert [tenant.chat_id for tenant in tenants] == ['1', '2'], (
+            'Проверьте, что `load_tenants` читает все аккаунты из файла.'
+        )
+
+    @pytest.mark.parametrize('data, error', [
+        ({'name': 'a'}, TypeError),
+        ([{'name': 'a', 'chat_id': '1'}], KeyError),
+        ([{'name': 'a', 'practicum_token': 't', 'chat_id': '1'}] * 2,
+         ValueError),
+    ])
+    def test_load_invalid_tenants(self, engine_module, tmp_path, data,
+                                  error):
+        path = tmp_path / 'tenants.json'
+        path.write_text(json.dumps(data))
+        with pytest.raises(error):
+            engine_module.load_tenants(path)
+
+    def test_poll_sends_verdict_and_moves_timestamp(
+            self, engine_module, tenant, data_with_new_hw_status):
+        client = FakeClient(data_with_new_hw_status)
+        bot = FakeBot()
+        engine = run_poll(engine_module, tenant, client, bot)
+        assert client.calls[0]['headers']['Authorization'] == (
+            'OAuth sometoken'
+        ), 'Проверьте, что запрос идёт с токеном аккаунта.'
+        assert bot.sent and bot.sent[0][0] == '12345', (
+            'Проверьте, что вердикт отправляется в чат аккаунта.'
+        )
+        assert engine.states['student'].timestamp == (
+            data_with_new_hw_status['current_date']
+        ), 'Проверьте, что после отправки сдвигается `from_date`.'
+
+    def test_poll_error_is_sent_once(self, engine_module, tenant):
+        client = FakeClient(http_status=500)
+        bot = FakeBot()
+        run_poll(engine_module, tenant, client, bot, polls=2)
+        assert len(bot.sent) == 1, (
+            'Проверьте, что повторная ошибка не отправляется в чат.'
+        )
+
+    def test_alternating_errors_are_sent_once(self, engine_module, tenant):
+        class AlternatingClient(FakeClient):
+            def get(self, *args, **kwargs):
+                self.http_status = 500 if len(self.calls) % 2 else 404
+                return super().get(*args, **kwargs)
+
+        bot = FakeBot()
+        engine = run_poll(engine_module, tenant, AlternatingClient(), bot,
+                          polls=4)
+        assert len(bot.sent) == 1, (
+            'Проверьте, что чередующиеся ошибки одного класса не '
+            'отправляются в чат повторно.'
+        )
+        assert engine.dedupe.stats()['hits'] == 3
+
+    def test_dispatch_polls_due_tenants_and_reschedules(
+            self, engine_module, tenant, data_with_new_hw_status):
+        client = FakeClient(data_with_new_hw_status)
+        bot = FakeBot()
+        engine = engine_module.PollingEngine([tenant], bot, client=client)
+
+        async def dispatch_once():
+            await engine.outbox.start()
+            engine.wheel.schedule(tenant.name, engine.wheel.start)
+            engine.dispatch(engine.wheel.start + 1)
+            await asyncio.gather(*engine.tasks)
+            await engine.outbox.join()
+            await engine.outbox.stop()
+
+        try:
+            asyncio.run(dispatch_once())
+        finally:
+            engine.close()
+        assert bot.sent, 'Проверьте, что сработавший таймер запускает опрос.'
+        assert tenant.name in engine.wheel, (
+            'Проверьте, что после опроса планируется следующий.'
+        )
+
+    def test_throttled_response_pauses_limiter(self, engine_module, tenant):
+        client = FakeClient(http_status=429, headers={'Retry-After': '120'})
+        limiter = TokenBucket(rate=100, burst=100)
+        bot = FakeBot()
+        run_poll(engine_module, tenant, client, bot, limiter=limiter)
+        stats = limiter.stats()
+        assert stats['throttled'] == 1 and stats['paused_for'] > 100, (
+            'Проверьте, что ответ 429 замедляет все запросы к API.'
+        )
+        assert bot.sent == [], (
+            'Проверьте, что об ограничении частоты запросов не сообщается '
+            'в чат студента.'
+        )
+
+    def test_poll_notifies_every_changed_homework(self, engine_module,
+                                                  tenant):
+        data = {
+            'homeworks': [
+                {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing',
+                 'date_updated': '2026-10-02T10:00:00Z'},
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+                 'date_updated': '2026-10-01T10:00:00Z'},
+            ],
+            'current_date': 1000198000
+        }
+        bot = FakeBot()
+        engine = run_poll(engine_module, tenant, FakeClient(data), bot,
+                          polls=2)
+        assert [text for _, text in bot.sent] == [
+            engine_module.parse_status(homework)
+            for homework in reversed(data['homeworks'])
+        ], 'Проверьте, что о каждой новой работе сообщается ровно один раз.'
+        assert len(engine.states['student'].index) == 2
+
+    def test_digest_mode_sends_one_message(self, engine_module, tenant):
+        data = {
+            'homeworks': [
+                {'id': 2, 'homework_name': 'hw2', 'status': 'reviewing',
+                 'date_updated': '2026-10-02T10:00:00Z'},
+                {'id': 1, 'homework_name': 'hw1', 'status': 'approved',
+                 'date_updated': '2026-10-01T10:00:00Z'},
+            ],
+            'current_date': 1000198000
+        }
+        bot = FakeBot()
+        engine = run_poll(engine_module, tenant, FakeClient(data), bot,
+                          delivery_mode='digest', digest_window=0)
+        assert len(bot.sent) == 1, (
+            'Проверьте, что в режиме digest изменения чата уходят одним '
+            'сообщением.'
+        )
+        state = engine.states['student']
+        assert len(state.index) == 2
+        assert state.timestamp == data['current_date']
+
+    def test_board_mode_edits_one_message(self, engine_module, tenant,
+                                          data_with_new_hw_status):
+        class BoardBot(FakeBot):
+            def __init__(self):
+                super().__init__()
+                self.edited = []
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                super().send_message(chat_id, text)
+                return engine_module.telegram.Message(
+                    1, None, None, None
+                )
+
+            def edit_message_text(self, text, **kwargs):
+                self.edited.append(text)
+                return True
+
+            def pin_chat_message(self, *args, **kwargs):
+                return True
+
+        bot = BoardBot()
+        data = dict(data_with_new_hw_status)
+        engine = run_poll(engine_module, tenant, FakeClient(data), bot,
+                          delivery_mode='board')
+        data['homeworks'] = [
+            dict(homework, status='rejected', date_updated='later')
+            for homework in data['homeworks']
+        ]
+        run_poll(engine_module, tenant, FakeClient(data), bot,
+                 delivery_mode='board', store=engine.store)
+        assert len(bot.sent) == 1 and len(bot.edited) == 1, (
+            'Проверьте, что в режиме board доска публикуется один раз, '
+            'а затем редактируется.'
+        )
+
+    def test_token_is_polled_once_for_all_subscribers(
+            self, engine_module, data_with_new_hw_status):
+        student = engine_module.Tenant('student', 'token', '1', ('2',))
+        mentor = engine_module.Tenant('mentor', 'token', '3')
+        client = FakeClient(data_with_new_hw_status)
+        bot = FakeBot()
+        engine = engine_module.PollingEngine(
+            [student, mentor], bot, client=client, chat_rate=1000
+        )
+
+        async def poll():
+            await engine.outbox.start()
+            for tenant in engine.tenants.values():
+                await engine.poll(tenant)
+            await engine.outbox.join()
+            await asyncio.sleep(0)
+            await engine.outbox.stop()
+
+        try:
+            asyncio.run(poll())
+        finally:
+            engine.close()
+        assert len(client.calls) == 1, (
+            'Проверьте, что токен опрашивается один раз на всех подписчиков.'
+        )
+        assert sorted(chat_id for chat_id, _ in bot.sent) == ['1', '2', '3'], (
+            'Проверьте, что статус рассылается всем подписанным чатам.'
+        )
+        assert engine.states['student'].timestamp == (
+            data_with_new_hw_status['current_date']
+        )
+
+    def test_streaming_notifies_before_download_ends(self, engine_module,
+                                                     tenant):
+        import threading
+        sent = threading.Event()
+
+        class StreamingResponse:
+            status_code = 200
+            headers = {}
+
+            def iter_content(self, chunk_size):
+                yield b'{"homeworks": [{"id": 1, "homework_name": "hw1", '
+                yield b'"status": "approved", "date_updated": "d"}'
+                sent.wait(1)
+                self.waited = sent.is_set()
+                yield b'], "current_date": 1000198000}'
+
+            def close(self):
+                pass
+
+        class StreamingClient:
+            def get(self, **kwargs):
+                assert kwargs.get('stream'), (
+                    'Проверьте, что в потоковом режиме ответ не буферизуется.'
+                )
+                self.response = StreamingResponse()
+                return self.response
+
+        class SignallingBot(FakeBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                sent.set()
+                return super().send_message(chat_id, text)
+
+        client = StreamingClient()
+        bot = SignallingBot()
+        engine = run_poll(engine_module, tenant, client, bot,
+                          streaming=True, stream_batch=1)
+        assert client.response.waited, (
+            'Проверьте, что уведомление уходит до окончания загрузки.'
+        )
+        assert len(bot.sent) == 1
+        assert engine.states['student'].timestamp == 1000198000
+
+    def test_failed_delivery_keeps_from_date(self, engine_module, tenant,
+                                             data_with_new_hw_status):
+        class FailingBot(FakeBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                raise engine_module.telegram.error.TimedOut()
+
+        engine = run_poll(engine_module, tenant,
+                          FakeClient(data_with_new_hw_status), FailingBot())
+        state = engine.states['student']
+        assert state.timestamp != data_with_new_hw_status['current_date'], (
+            'Проверьте, что `from_date` не сдвигается, пока сообщение '
+            'не доставлено.'
+        )
+        assert len(state.index) == 0
+        assert engine.outbox.stats()['failed'] == 1
+
+    def test_durable_outbox_moves_from_date(self, engine_module, tenant,
+                                            data_with_new_hw_status):
+        from storage import MemoryStore
+
+        class FailingBot(FakeBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                raise engine_module.telegram.error.TimedOut()
+
+        store = MemoryStore()
+        engine = run_poll(engine_module, tenant,
+                          FakeClient(data_with_new_hw_status), FailingBot(),
+                          store=store, durable=True)
+        state = engine.states['student']
+        assert state.timestamp == data_with_new_hw_status['current_date'], (
+            'Проверьте, что с долговечной очередью `from_date` сдвигается '
+            'после записи вердикта в хранилище.'
+        )
+        assert len(store.pending_messages('student')) == 1
+
+        bot = FakeBot()
+        engine = engine_module.PollingEngine(
+            [tenant], bot, client=FakeClient(data_with_new_hw_status),
+            store=store, chat_rate=1000, durable=True
+        )
+
+        async def restart():
+            await engine.outbox.start()
+            while store.pending_messages('student'):
+                await asyncio.sleep(0.01)
+            await engine.outbox.stop()
+
+        try:
+            asyncio.run(restart())
+        finally:
+            engine.close()
+        assert len(bot.sent) == 1, (
+            'Проверьте, что после перезапуска сохранённый вердикт '
+            'доставляется один раз.'
+        )
+
+    def test_tenant_leased_elsewhere_is_not_polled(self, engine_module,
+                                                   tenant, tmp_path):
+        from leases import SQLiteLeases
+
+        path = str(tmp_path / 'leases.db')
+        other = SQLiteLeases(path, owner='other')
+        other.acquire([tenant.name])
+        client = FakeClient()
+        engine = engine_module.PollingEngine(
+            [tenant], FakeBot(), client=client, chat_rate=1000,
+            leases=SQLiteLeases(path, owner='this')
+        )
+
+        async def poll():
+            await engine.outbox.start()
+            await engine.renew_leases(0)
+            await engine.poll_scheduled(tenant)
+            await engine.outbox.stop()
+
+        try:
+            asyncio.run(poll())
+        finally:
+            engine.close()
+            other.close()
+        assert client.calls == [], (
+            'Проверьте, что реплика не опрашивает аккаунт, арендованный '
+            'другой репликой.'
+        )
+
+    def test_polling_tenant_is_not_handed_over(self, engine_module,
+                                               tmp_path):
+        from leases import SQLiteLeases
+
+        path = str(tmp_path / 'leases.db')
+        tenants = [
+            engine_module.Tenant(name, f'token_{name}', '12345')
+            for name in ('a', 'b')
+        ]
+        engine = engine_module.PollingEngine(
+            tenants, FakeBot(), client=FakeClient(), chat_rate=1000,
+            leases=SQLiteLeases(path, owner='this')
+        )
+        other = SQLiteLeases(path, owner='other')
+
+        async def renew():
+            await engine.renew_leases(0)
+            other.acquire(['a', 'b'])
+            engine.state(tenants[0]).polling = True
+            await engine.renew_leases(engine.leases.renew_period)
+            return set(engine.leases.owned)
+
+        try:
+            owned = asyncio.run(renew())
+        finally:
+            engine.close()
+            other.close()
+        assert owned == {'a'}, (
+            'Проверьте, что аккаунт, который сейчас опрашивается, не '
+            'отдаётся другой реплике.'
+        )
+
+    def test_lease_lost_during_fetch_skips_verdict(
+            self, engine_module, tenant, tmp_path, data_with_new_hw_status):
+        from leases import SQLiteLeases
+
+        now = [0.0]
+        leases = SQLiteLeases(
+            str(tmp_path / 'leases.db'), owner='this', clock=lambda: now[0]
+        )
+
+        class ExpiringClient(FakeClient):
+            def get(self, *args, **kwargs):
+                now[0] += leases.ttl
+                return super().get(*args, **kwargs)
+
+        bot = FakeBot()
+        engine = engine_module.PollingEngine(
+            [tenant], bot, client=ExpiringClient(data_with_new_hw_status),
+            chat_rate=1000, leases=leases
+        )
+
+        async def poll():
+            await engine.outbox.start()
+            await engine.renew_leases(0)
+            timestamp = engine.state(tenant).timestamp
+            await engine.poll_scheduled(tenant)
+            await engine.outbox.join()
+            await engine.outbox.stop()
+            return timestamp
+
+        try:
+            timestamp = asyncio.run(poll())
+        finally:
+            engine.close()
+        assert bot.sent == [], (
+            'Проверьте, что вердикт не отправляется, если аренда аккаунта '
+            'истекла, пока шёл запрос к API.'
+        )
+        assert engine.states['student'].timestamp == timestamp, (
+            'Проверьте, что `from_date` не сдвигается без аренды.'
+        )
+
+    def test_verdict_latency_is_tracked(self, engine_module, tenant,
+                                        data_with_new_hw_status):
+        from latency import latency_tracker
+
+        data = dict(data_with_new_hw_status, homeworks=[dict(
+            data_with_new_hw_status['homeworks'][0],
+            date_updated='2020-01-01T00:00:00Z'
+        )])
+        recorded = latency_tracker.recorded
+        run_poll(engine_module, tenant, FakeClient(data), FakeBot())
+        assert latency_tracker.recorded == recorded + 1, (
+            'Проверьте, что доставленный вердикт учитывается в задержке.'
+        )
+        assert latency_tracker.tenants()['student'][0.99] > 1e8, (
+            'Проверьте, что задержка считается от `date_updated` работы.'
+        )
+
+    def test_hand_over_evicts_latency(self, engine_module, tenant):
+        from latency import Timeline, latency_tracker
+
+        engine = engine_module.PollingEngine(
+            [tenant], FakeBot(), client=FakeClient(), chat_rate=1000
+        )
+        latency_tracker.record('student', Timeline(reviewed=0, delivered=1))
+        try:
+            asyncio.run(engine.hand_over({'student'}, set()))
+        finally:
+            engine.close()
+        assert 'student' not in latency_tracker.tenants(), (
+            'Проверьте, что задержки аккаунта, перешедшего к другой '
+            'реплике, удаляются.'
+        )
+
+    @pytest.mark.parametrize('error, committed', [
+        (telegram.error.Unauthorized('Forbidden: bot was blocked by the user'),
+         True),
+        (telegram.error.BadRequest('Message is too long'), True),
+        (telegram.error.TimedOut(), False),
+    ])
+    def test_failed_subscriber_does_not_repeat_verdict(
+            self, engine_module, error, committed, data_with_new_hw_status,
+            monkeypatch):
+        monkeypatch.setattr(
+            engine_module, 'DedupeCache', partial(DedupeCache, ttl=0)
+        )
+        tenant = engine_module.Tenant(
+            'student', 'sometoken', '12345', subscribers=('777',)
+        )
+
+        class PartialBot(FakeBot):
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                if chat_id == '777':
+                    raise error
+                return super().send_message(chat_id, text, **kwargs)
+
+        bot = PartialBot()
+        engine = run_poll(
+            engine_module, tenant, FakeClient(data_with_new_hw_status), bot,
+            polls=3
+        )
+        assert [chat for chat, _ in bot.sent] == ['12345'], (
+            'Проверьте, что сбой одного чата не повторяет вердикт остальным.'
+        )
+        state = engine.states['student']
+        assert (len(state.index) == 1) is committed, (
+            'Проверьте, что недоступный чат и отклонённое сообщение не '
+            'задерживают фиксацию вердикта, а временный сбой задерживает.'
+        )
+        assert (
+            state.timestamp == data_with_new_hw_status['current_date']
+        ) is committed
@@ -0,0 +1,172 @@
+import inspect
+import threading
+import time
+
+import pytest
+import telegram
+
+import homework
+from leases import SQLiteLeases
+from statuses import StatusIndex
+from storage import MemoryStore
+
+
+class ChatBot:
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+
+    def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        self.sent.append(chat_id)
+        return object()
+
+
+@pytest.fixture
+def chats(monkeypatch):
+    monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', '100')
+    monkeypatch.setattr(homework, 'TELEGRAM_SUBSCRIBERS', ['200'])
+
+
+class TestDelivery:
+
+    HOMEWORK = {
+        'id': 1, 'homework_name': 'hw1.zip', 'status': 'approved',
+        'date_updated': '2026-10-17T10:00:00Z',
+    }
+
+    def poll(self, bot, index, reached, cycles=3):
+        results = []
+        for _ in range(cycles):
+            homeworks = index.diff([self.HOMEWORK])
+            results.append(homework.notify(
+                bot, index, homeworks, mode='single', reached=reached
+            ))
+        return results
+
+    def test_blocked_subscriber_is_final(self, chats):
+        bot = ChatBot({'200': telegram.error.Unauthorized(
+            'Forbidden: bot was blocked by the user'
+        )})
+        index = StatusIndex()
+        assert self.poll(bot, index, {}) == [True, True, True], (
+            'Проверьте, что недоступный чат не мешает зафиксировать вердикт.'
+        )
+        assert bot.sent == ['100'], (
+            'Проверьте, что вердикт не повторяется в основной чат.'
+        )
+        assert len(index) == 1
+
+    def test_transient_failure_retries_only_that_chat(self, chats):
+        bot = ChatBot({'200': telegram.error.TimedOut()})
+        index = StatusIndex()
+        reached = {}
+        assert self.poll(bot, index, reached) == [False, False, False]
+        assert bot.sent == ['100'], (
+            'Проверьте, что при сбое подписчика основной чат не получает '
+            'вердикт повторно.'
+        )
+        bot.errors = {}
+        assert self.poll(bot, index, reached, cycles=1) == [True]
+        assert bot.sent == ['100', '200'] and reached == {}, (
+            'Проверьте, что после доставки подписчику вердикт фиксируется.'
+        )
+
+    @pytest.mark.parametrize('error, unreachable', [
+        (telegram.error.Unauthorized('Forbidden: user is deactivated'), True),
+        (telegram.error.BadRequest('Chat not found'), True),
+        (telegram.error.Unauthorized('Unauthorized'), False),
+        (telegram.error.BadRequest('Message is too long'), False),
+        (telegram.error.TimedOut(), False),
+    ])
+    def test_chat_unreachable(self, error, unreachable):
+        assert homework.chat_unreachable(error) is unreachable
+
+
+class TestReportError:
+
+    @pytest.mark.parametrize('retry_after, delay', [
+        (None, max(homework.RETRY_PERIOD, homework.API_DEFAULT_RETRY_AFTER)),
+        (30.0, homework.RETRY_PERIOD),
+        (3600.0, 3600.0),
+    ])
+    def test_throttling_is_not_reported(self, chats, retry_after, delay):
+        from dedupe import DedupeCache
+        from exceptions import TooManyRequestsError
+
+        bot = ChatBot({})
+        error = TooManyRequestsError('429', 429, retry_after)
+        assert homework.report_error(bot, error, DedupeCache()) == delay, (
+            'Проверьте, что после ограничения частоты бот ждёт '
+            '`Retry-After`, но не меньше `RETRY_PERIOD`.'
+        )
+        assert bot.sent == [], (
+            'Проверьте, что об ограничении частоты API в чат не пишется.'
+        )
+
+    def test_error_is_reported_once(self, chats):
+        from dedupe import DedupeCache
+
+        bot = ChatBot({})
+        sent_errors = DedupeCache()
+        delays = [
+            homework.report_error(bot, ValueError('boom'), sent_errors)
+            for _ in range(2)
+        ]
+        assert delays == [homework.RETRY_PERIOD] * 2
+        assert bot.sent == ['100'], (
+            'Проверьте, что о сбое в чат сообщается один раз.'
+        )
+
+
+class StopReplica(Exception):
+    pass
+
+
+class TestReplicas:
+
+    def test_lease_outlives_poll_period(self, monkeypatch, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        replicas = [
+            SQLiteLeases(path, owner=owner, ttl=0.3)
+            for owner in ('first', 'second')
+        ]
+        polls = []
+        deadline = time.monotonic() + 1.1
+        sleep = time.sleep
+
+        def get_api_answer(timestamp):
+            polls.append(threading.current_thread().name)
+            return {'homeworks': [], 'current_date': timestamp}
+
+        def sleep_until_deadline(seconds):
+            if time.monotonic() > deadline:
+                raise StopReplica
+            sleep(seconds)
+
+        main = inspect.unwrap(homework.main)
+
+        def replica():
+            with pytest.raises(StopReplica):
+                main()
+
+        monkeypatch.setattr(homework, 'open_leases', replicas.pop)
+        monkeypatch.setattr(homework, 'open_store', MemoryStore)
+        monkeypatch.setattr(homework, 'get_api_answer', get_api_answer)
+        monkeypatch.setattr(homework.telegram, 'Bot', lambda token: ChatBot({}))
+        monkeypatch.setattr(homework, 'RETRY_PERIOD', 0.35)
+        monkeypatch.setattr(homework.time, 'sleep', sleep_until_deadline)
+        threads = [
+            threading.Thread(target=replica, name=name)
+            for name in ('first', 'second')
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(1.5)
+        assert len(polls) >= 2 and len(set(polls)) == 1, (
+            'Проверьте, что аренда продлевается чаще, чем истекает, и '
+            'аккаунт опрашивает одна реплика, даже если `LEASE_TTL` '
+            'меньше `RETRY_PERIOD`.'
+        )
@@ -0,0 +1,77 @@
+import pytest
+
+import latency
+
+
+class TestLatency:
+
+    @pytest.mark.parametrize('value, expected', [
+        ('2020-01-01T00:00:00Z', 1577836800.0),
+        ('2020-01-01T03:00:00+03:00', 1577836800.0),
+        ('2020-01-01T00:00:00', 1577836800.0),
+        ('вчера', None),
+        (None, None),
+    ])
+    def test_reviewed_at(self, value, expected):
+        assert latency.reviewed_at({'date_updated': value}) == expected
+
+    def test_stages(self):
+        timeline = latency.Timeline(
+            fetched=110, parsed=111, reviewed=100, enqueued=111.5,
+            delivered=113
+        )
+        assert timeline.stages() == {
+            'fetch': 10, 'parse': 1, 'enqueue': 0.5, 'delivery': 1.5,
+            'total': 13,
+        }
+        assert latency.Timeline(fetched=90, reviewed=100).stages() == {
+            'fetch': 0.0
+        }, (
+            'Проверьте, что этапы с неизвестным концом пропускаются, а '
+            'расхождение часов не даёт отрицательной задержки.'
+        )
+
+    def test_percentiles_per_tenant_and_global(self):
+        tracker = latency.LatencyTracker(window=100)
+        for seconds in range(1, 201):
+            tracker.record('a', latency.Timeline(
+                reviewed=0, delivered=seconds
+            ))
+        tracker.record('b', latency.Timeline(reviewed=0, delivered=1000))
+        assert tracker.percentiles('a') == {
+            0.5: 150, 0.9: 190, 0.99: 199
+        }, 'Проверьте, что окно аккаунта хранит последние значения.'
+        assert tracker.percentiles()[0.5] == 151
+        assert tracker.quantile_samples()[('b', '0.5')] == 1000
+        stats = tracker.stats()
+        assert stats['delivered'] == 201
+        assert list(stats['slowest']) == ['b', 'a'], (
+            'Проверьте, что в отчёте первыми идут самые медленные аккаунты.'
+        )
+
+    def test_export_is_capped_to_slowest(self):
+        tracker = latency.LatencyTracker(window=10)
+        for number in range(latency.SLOWEST_TENANTS + 5):
+            tracker.record(f'tenant{number}', latency.Timeline(
+                reviewed=0, delivered=number
+            ))
+        tenants = {tenant for tenant, _ in tracker.quantile_samples()}
+        assert len(tenants) == latency.SLOWEST_TENANTS + 1, (
+            'Проверьте, что на страницу метрик попадают только самые '
+            'медленные аккаунты и общие квантили.'
+        )
+        assert {latency.ALL, 'tenant0'} - tenants == {'tenant0'}
+
+    def test_forget_evicts_tenant(self):
+        tracker = latency.LatencyTracker()
+        tracker.record('moved', latency.Timeline(reviewed=0, delivered=5))
+        tracker.forget('moved')
+        assert 'moved' not in tracker.tenants(), (
+            'Проверьте, что окно аккаунта другой реплики удаляется.'
+        )
+        assert tracker.percentiles()[0.5] == 5
+
+    def test_empty_tracker(self):
+        tracker = latency.LatencyTracker()
+        assert tracker.percentiles() == {}
+        assert tracker.stats() == {'delivered': 0}
@@ -0,0 +1,93 @@
+import pytest
+
+from leases import Leases, SQLiteLeases, open_leases
+
+TENANTS = [f'student{i}' for i in range(10)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / 'leases.db')
+    first = SQLiteLeases(path, owner='first', ttl=30, clock=clock)
+    second = SQLiteLeases(path, owner='second', ttl=30, clock=clock)
+    yield clock, first, second
+    for leases in (first, second):
+        leases.connection.close()
+
+
+class TestLeases:
+
+    def test_replicas_split_tenants(self, replicas):
+        clock, first, second = replicas
+        assert first.acquire(TENANTS) == set(TENANTS), (
+            'Проверьте, что единственная реплика арендует все аккаунты.'
+        )
+        assert second.acquire(TENANTS) == set()
+        first.acquire(TENANTS)
+        assert len(first.lost) == 5, (
+            'Проверьте, что реплика отдаёт аккаунты сверх своей доли.'
+        )
+        second.acquire(TENANTS)
+        assert len(first.owned) == len(second.owned) == 5
+        assert not first.owned & second.owned, (
+            'Проверьте, что один аккаунт арендует только одна реплика.'
+        )
+
+    def test_busy_tenants_are_kept(self, replicas):
+        clock, first, second = replicas
+        first.acquire(TENANTS)
+        second.acquire(TENANTS)
+        first.acquire(TENANTS, keep=TENANTS)
+        assert first.owned == set(TENANTS), (
+            'Проверьте, что аккаунты из `keep` не отдаются.'
+        )
+
+    def test_dead_replica_is_taken_over(self, replicas):
+        clock, first, second = replicas
+        first.acquire(TENANTS)
+        second.acquire(TENANTS)
+        first.acquire(TENANTS)
+        second.acquire(TENANTS)
+        first_owned = sorted(first.owned)[0]
+        clock.now += 31
+        assert not first.owns(first_owned), (
+            'Проверьте, что истёкшая аренда не позволяет опрашивать аккаунт.'
+        )
+        assert second.acquire(TENANTS) == set(TENANTS), (
+            'Проверьте, что аккаунты упавшей реплики переходят к живой '
+            'после истечения аренды.'
+        )
+        assert first_owned in second.gained
+
+    def test_close_releases_tenants(self, tmp_path):
+        path = str(tmp_path / 'leases.db')
+        first = SQLiteLeases(path, owner='first')
+        first.acquire(TENANTS)
+        first.close()
+        second = SQLiteLeases(path, owner='second')
+        assert second.acquire(TENANTS) == set(TENANTS), (
+            'Проверьте, что остановленная реплика сразу отдаёт аккаунты.'
+        )
+        second.close()
+
+    def test_claim_is_abstract(self):
+        class Incomplete(Leases):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+def test_open_leases(tmp_path):
+    assert open_leases('none') is None
+    with pytest.raises(ValueError):
+        open_leases('redis')
@@ -0,0 +1,81 @@
+import gzip
+import io
+import json
+import logging
+
+import pytest
+
+import logconfig
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers = root.handlers[:]
+    level = root.level
+    srcfile = logging._srcfile
+    yield root
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    logging._srcfile = srcfile
+
+
+class TestLogging:
+
+    def test_json_lines_go_through_queue(self, root_logger, tmp_path):
+        path = tmp_path / 'bot.log'
+        stream = io.StringIO()
+        listener = logconfig.setup_logging(
+            logging.DEBUG, str(path), fmt='json', stream=stream
+        )
+        assert [
+            type(handler) for handler in root_logger.handlers
+        ] == [logging.handlers.QueueHandler], (
+            'Проверьте, что корневой логгер только кладёт события в очередь.'
+        )
+        logging.getLogger('homework').info('Статус %s', 'approved')
+        listener.stop()
+        event = json.loads(path.read_text(encoding='utf-8'))
+        assert event['message'] == 'Статус approved'
+        assert (event['level'], event['logger']) == ('INFO', 'homework'), (
+            'Проверьте, что JSON-строка содержит уровень и имя логгера.'
+        )
+        assert json.loads(stream.getvalue()) == event
+
+    def test_text_format_without_caller(self, root_logger):
+        stream = io.StringIO()
+        listener = logconfig.setup_logging(logging.INFO, None, stream=stream)
+        logging.getLogger('engine').info('text')
+        listener.stop()
+        assert stream.getvalue().rstrip().endswith('engine: text')
+        assert logging._srcfile is None, (
+            'Проверьте, что без LOG_CALLER логгер не обходит стек вызова.'
+        )
+
+    def test_rotated_files_are_compressed(self, tmp_path):
+        path = tmp_path / 'bot.log'
+        handler = logconfig.rotating_handler(
+            str(path), max_bytes=100, backup_count=2, when='',
+            compressed=True
+        )
+        logger = logging.getLogger('rotation-test')
+        logger.propagate = False
+        logger.addHandler(handler)
+        try:
+            for number in range(20):
+                logger.warning('message %d', number)
+        finally:
+            logger.removeHandler(handler)
+            handler.close()
+        backups = sorted(path.parent.glob('bot.log.*'))
+        assert [backup.name for backup in backups] == [
+            'bot.log.1.gz', 'bot.log.2.gz'
+        ], 'Проверьте, что журнал ротируется и старые файлы сжимаются.'
+        assert b'message' in gzip.decompress(backups[0].read_bytes())
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            logconfig.make_formatter('xml')
@@ -0,0 +1,113 @@
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import homework
+import metrics
+
+
+@pytest.fixture
+def registry():
+    return metrics.Registry()
+
+
+class TestMetrics:
+
+    def test_counter_sums_thread_shards(self, registry):
+        counter = metrics.Counter(
+            'sends_total', 'Отправки.', ('result',), registry=registry
+        )
+
+        def send():
+            for _ in range(1000):
+                counter.inc('ok')
+
+        threads = [threading.Thread(target=send) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counter.inc('BadRequest', amount=2)
+        assert counter.value('ok') == 4000, (
+            'Проверьте, что значения потоков складываются без потерь.'
+        )
+        assert registry.render().splitlines() == [
+            '# HELP sends_total Отправки.',
+            '# TYPE sends_total counter',
+            'sends_total{result="BadRequest"} 2',
+            'sends_total{result="ok"} 4000',
+        ]
+
+    def test_histogram_buckets_are_cumulative(self, registry):
+        histogram = metrics.Histogram(
+            'size', 'Размер.', buckets=(1, 5), registry=registry
+        )
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+        assert list(histogram.samples()) == [
+            ('size_bucket', (('le', '1'),), 2),
+            ('size_bucket', (('le', '5'),), 3),
+            ('size_bucket', (('le', '+Inf'),), 4),
+            ('size_sum', (), 11.0),
+            ('size_count', (), 4),
+        ], 'Проверьте, что корзины включают верхнюю границу и накоплены.'
+
+    def test_gauge_function_and_label_escaping(self, registry):
+        gauge = metrics.Gauge(
+            'depth', 'Глубина.', ('queue',),
+            function=lambda: {('out"box',): 3}, registry=registry
+        )
+        gauge.set(1, 'pending')
+        assert registry.render().splitlines()[2:] == [
+            'depth{queue="out\\"box"} 3',
+            'depth{queue="pending"} 1',
+        ]
+
+    def test_http_endpoint(self, registry):
+        metrics.Counter('polls_total', 'Опросы.', registry=registry).inc()
+        server = metrics.start_metrics_server(
+            port=0, registry=registry
+        )
+        assert server is None, (
+            'Проверьте, что без METRICS_PORT сервер не запускается.'
+        )
+        server = metrics.ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            type('Handler', (metrics.MetricsHandler,), {'registry': registry})
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f'http://127.0.0.1:{server.server_port}'
+        try:
+            with urllib.request.urlopen(f'{url}/metrics', timeout=1) as page:
+                assert page.headers['Content-Type'] == metrics.CONTENT_TYPE
+                assert 'polls_total 1' in page.read().decode('utf-8')
+            with pytest.raises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(f'{url}/other', timeout=1)
+            assert error.value.code == 404
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_api_requests_by_status(self):
+
+        class Client:
+            status_code = 404
+            headers = {}
+
+            def get(self, **kwargs):
+                return self
+
+        before = metrics.api_requests.value('404')
+        with pytest.raises(homework.NotOkStatusResponseError):
+            homework.get_response(
+                Client(), homework.api_params({}, 0)
+            )
+        assert metrics.api_requests.value('404') == before + 1, (
+            'Проверьте, что запросы к API считаются по коду ответа.'
+        )
+        assert 'homework_api_request_seconds_count' in (
+            metrics.REGISTRY.render()
+        ), 'Проверьте, что время запроса к API попадает в гистограмму.'
@@ -0,0 +1,290 @@
+import asyncio
+import threading
+import time
+
+from outbox import Message, Outbox
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestOutbox:
+
+    def test_acks_report_delivery(self):
+        async def send(message):
+            return None if message.text == 'lost' else message.text
+
+        async def scenario():
+            outbox = Outbox(send, workers=2, maxsize=10)
+            await outbox.start()
+            acks = [await outbox.put(Message(1, text))
+                    for text in ('a', 'lost', 'b')]
+            results = await asyncio.gather(*acks)
+            await outbox.stop()
+            return outbox, results
+
+        outbox, results = run(scenario())
+        assert results == [True, False, True], (
+            'Проверьте, что подтверждение отражает результат доставки.'
+        )
+        stats = outbox.stats()
+        assert (stats['delivered'], stats['failed']) == (2, 1)
+        assert stats['depth'] == 0
+
+    def test_full_queue_applies_backpressure(self):
+        release = None
+
+        async def send(message):
+            await release.wait()
+            return message.text
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            outbox = Outbox(send, workers=1, maxsize=1)
+            await outbox.start()
+            await outbox.put(Message(1, 'first'))
+            await asyncio.sleep(0)
+            await outbox.put(Message(1, 'second'))
+            third = asyncio.create_task(outbox.put(Message(1, 'third')))
+            await asyncio.sleep(0)
+            blocked = not third.done()
+            release.set()
+            await third
+            await outbox.join()
+            await outbox.stop()
+            return outbox, blocked
+
+        outbox, blocked = run(scenario())
+        assert blocked, (
+            'Проверьте, что при заполненной очереди постановка ждёт.'
+        )
+        assert outbox.stats()['blocked'] == 1
+
+    def test_send_exception_is_failure(self):
+        async def send(message):
+            raise RuntimeError('boom')
+
+        async def scenario():
+            outbox = Outbox(send, workers=1)
+            await outbox.start()
+            ack = await outbox.put(Message(1, 'text'))
+            result = await ack
+            await outbox.stop()
+            return result
+
+        assert run(scenario()) is False
+
+
+class Tenant:
+    def __init__(self, name):
+        self.name = name
+
+
+class TestDurableOutbox:
+
+    def make(self, send, store, **kwargs):
+        from outbox import DurableOutbox
+        kwargs.setdefault('retry_period', 0.01)
+        return DurableOutbox(
+            send, store, {'student': Tenant('student')}, workers=1, **kwargs
+        )
+
+    def test_verdict_is_stored_until_delivered(self):
+        from storage import MemoryStore
+        store = MemoryStore()
+        online = False
+        sent = []
+
+        async def send(message):
+            if not online:
+                return None
+            sent.append(message.text)
+            return message.text
+
+        async def scenario():
+            nonlocal online
+            outbox = self.make(send, store)
+            await outbox.start()
+            ack = await outbox.put(Message(
+                1, 'text', tenant=Tenant('student'), key=('verdict', 1, 'a')
+            ))
+            accepted = await ack
+            await outbox.join()
+            stored = len(store.pending_messages('student'))
+            online = True
+            while store.pending_messages('student'):
+                await asyncio.sleep(0.01)
+            await outbox.stop()
+            return outbox, accepted, stored
+
+        outbox, accepted, stored = run(scenario())
+        assert accepted is True and stored == 1, (
+            'Проверьте, что вердикт подтверждается после записи в '
+            'хранилище и остаётся там, пока Telegram недоступен.'
+        )
+        assert sent == ['text'], (
+            'Проверьте, что сохранённый вердикт досылается, когда Telegram '
+            'снова доступен.'
+        )
+        assert outbox.stats()['pending'] == 0
+
+    def test_queued_tenants_are_reported(self):
+        from storage import MemoryStore
+        release = asyncio.Event()
+
+        async def send(message):
+            await release.wait()
+            return message.text
+
+        async def scenario():
+            outbox = self.make(send, MemoryStore())
+            await outbox.start()
+            await outbox.put(Message(
+                1, 'text', tenant=Tenant('student'), key=('verdict', 1, 'a')
+            ))
+            queued = outbox.queued_tenants()
+            release.set()
+            await outbox.join()
+            await outbox.stop()
+            return queued, outbox.queued_tenants()
+
+        queued, drained = run(scenario())
+        assert queued == {'student'} and drained == set(), (
+            'Проверьте, что аккаунт с сообщениями в очереди считается '
+            'занятым, пока они не отправлены.'
+        )
+
+    def test_redelivers_after_restart(self):
+        from storage import MemoryStore
+        store = MemoryStore()
+        now = time.time()
+        store.put_message('student', 'old', 1, 'old', created=now - 1)
+        store.put_message('student', 'older', 1, 'older', created=now - 2)
+        sent = []
+
+        async def send(message):
+            sent.append(message.text)
+            return message.text
+
+        async def scenario():
+            outbox = self.make(send, store)
+            await outbox.start()
+            await outbox.put(Message(
+                1, 'old', tenant=Tenant('student'), key=('old',)
+            ))
+            while store.pending_messages('student'):
+                await asyncio.sleep(0.01)
+            await outbox.stop()
+
+        run(scenario())
+        assert sent == ['older', 'old'], (
+            'Проверьте, что после перезапуска сохранённые сообщения '
+            'досылаются от старых к новым и не дублируются.'
+        )
+
+    def test_rejected_and_expired_are_dropped(self):
+        from exceptions import MessageRejectedError
+        from storage import MemoryStore
+        store = MemoryStore()
+        store.put_message(
+            'student', 'stale', 1, 'stale', created=time.time() - 120
+        )
+        sent = []
+
+        async def send(message):
+            sent.append(message.text)
+            raise MessageRejectedError('Bad Request: message is too long')
+
+        async def scenario():
+            outbox = self.make(send, store, ttl=60)
+            await outbox.start()
+            ack = await outbox.put(Message(
+                1, 'long', tenant=Tenant('student'), key=('long',)
+            ))
+            await ack
+            await outbox.join()
+            await asyncio.sleep(0.05)
+            await outbox.stop()
+            return outbox
+
+        stats = run(scenario()).stats()
+        assert sent == ['long'], (
+            'Проверьте, что отклонённое сообщение не повторяется, а '
+            'просроченное не отправляется.'
+        )
+        assert store.pending_messages('student') == [], (
+            'Проверьте, что отклонённые и просроченные сообщения удаляются '
+            'из хранилища.'
+        )
+        assert (stats['rejected'], stats['expired'], stats['pending']) == (
+            1, 1, 0
+        )
+
+    def test_redelivery_waits_for_recovery(self):
+        from storage import MemoryStore
+        store = MemoryStore()
+        now = time.time()
+        texts = [f'text{i}' for i in range(5)]
+        for age, text in enumerate(reversed(texts), start=1):
+            store.put_message('student', text, 1, text, created=now - age)
+        online = False
+        attempts = 0
+        sent = []
+
+        async def send(message):
+            nonlocal attempts
+            attempts += 1
+            if not online:
+                return None
+            sent.append(message.text)
+            return message.text
+
+        async def scenario():
+            nonlocal online
+            outbox = self.make(send, store, batch_size=2, retry_period=10)
+            await outbox.start()
+            await asyncio.sleep(0.05)
+            failed = attempts
+            online = True
+            thread = threading.Thread(target=outbox.wake)
+            thread.start()
+            thread.join()
+            while store.pending_messages('student'):
+                await asyncio.sleep(0.01)
+            await outbox.stop()
+            return failed
+
+        assert run(scenario()) == 2, (
+            'Проверьте, что после сбоя пачка повторяется не раньше '
+            '`retry_period`.'
+        )
+        assert sent == texts, (
+            'Проверьте, что после восстановления Telegram сообщения '
+            'досылаются пачка за пачкой, не дожидаясь `retry_period`.'
+        )
+
+    def test_errors_are_not_stored(self):
+        from outbox import ERROR
+        from storage import MemoryStore
+        store = MemoryStore()
+
+        async def send(message):
+            return None
+
+        async def scenario():
+            outbox = self.make(send, store)
+            await outbox.start()
+            ack = await outbox.put(Message(
+                1, 'error', kind=ERROR, tenant=Tenant('student')
+            ))
+            result = await ack
+            await outbox.stop()
+            return result
+
+        assert run(scenario()) is False, (
+            'Проверьте, что сообщения об ошибках не сохраняются и '
+            'подтверждаются результатом отправки.'
+        )
+        assert store.pending_messages('student') == []
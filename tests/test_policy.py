@@ -0,0 +1,55 @@
+import pytest
+
+from engine import TenantState
+from policy import AdaptivePolicy, FixedPolicy, make_policy
+
+
+@pytest.fixture
+def state():
+    return TenantState('student', 0)
+
+
+class TestPolicy:
+
+    def test_fixed_policy(self, state):
+        policy = FixedPolicy(600)
+        state.observe([{'homework_name': 'hw', 'status': 'reviewing'}])
+        assert policy.next_delay(state).delay == 600, (
+            'Проверьте, что фиксированная политика не меняет период.'
+        )
+
+    def test_adaptive_policy_backs_off_when_idle(self, state):
+        policy = AdaptivePolicy(period=600, fast=60, cap=3000, factor=2)
+        delays = []
+        for _ in range(5):
+            state.observe([])
+            delays.append(policy.next_delay(state).delay)
+        assert delays == [600, 1200, 2400, 3000, 3000], (
+            'Проверьте экспоненциальное увеличение периода с ограничением.'
+        )
+        assert policy.decisions['idle'] == 5, (
+            'Проверьте, что решения политики учитываются в счётчиках.'
+        )
+
+    def test_adaptive_policy_speeds_up_while_reviewing(self, state):
+        policy = AdaptivePolicy(period=600, fast=60)
+        state.observe([{'homework_name': 'hw', 'status': 'reviewing'}])
+        state.observe([])
+        assert policy.next_delay(state) == (60, 'reviewing'), (
+            'Проверьте, что работа на ревью сокращает период опроса.'
+        )
+        state.observe([{'homework_name': 'hw', 'status': 'approved'}])
+        assert policy.next_delay(state) == (60, 'changed'), (
+            'Проверьте, что изменения статуса сокращают период опроса.'
+        )
+        state.observe([])
+        assert policy.next_delay(state) == (600, 'idle')
+
+    def test_adaptive_policy_on_error(self, state):
+        policy = AdaptivePolicy(period=600)
+        state.failed = True
+        assert policy.next_delay(state) == (600, 'error')
+
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            make_policy('unknown')
@@ -0,0 +1,66 @@
+from email.utils import formatdate
+import time
+
+import pytest
+
+from ratelimit import TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestTokenBucket:
+
+    def test_burst_then_rate(self, clock):
+        bucket = TokenBucket(rate=2, burst=3, clock=clock)
+        waits = [bucket.reserve() for _ in range(5)]
+        assert waits == [0, 0, 0, 0.5, 1.0], (
+            'Проверьте, что после исчерпания запаса запросы идут с '
+            'заданной частотой.'
+        )
+        assert bucket.stats()['delayed'] == 2
+
+    def test_budget_restores(self, clock):
+        bucket = TokenBucket(rate=1, burst=5, clock=clock)
+        for _ in range(5):
+            bucket.reserve()
+        assert bucket.stats()['budget'] == 0
+        clock.now += 2
+        assert bucket.stats()['budget'] == 2
+
+    def test_penalize_pauses_all_requests(self, clock):
+        bucket = TokenBucket(rate=10, burst=10, clock=clock)
+        bucket.penalize(30)
+        assert bucket.reserve() == 30, (
+            'Проверьте, что после 429 запросы приостанавливаются на '
+            'время из `Retry-After`.'
+        )
+        assert bucket.reserve() == pytest.approx(30.1), (
+            'Проверьте, что после паузы запросы не идут пачкой.'
+        )
+        stats = bucket.stats()
+        assert stats['throttled'] == 1
+        assert stats['paused_for'] == 30
+
+
+class TestRetryAfter:
+
+    @pytest.mark.parametrize('value, expected', [
+        ('120', 120), ('0', 0), (None, None), ('soon', None)
+    ])
+    def test_seconds(self, value, expected):
+        assert parse_retry_after(value) == expected
+
+    def test_http_date(self):
+        value = formatdate(time.time() + 60, usegmt=True)
+        assert 55 <= parse_retry_after(value) <= 60
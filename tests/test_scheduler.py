@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from scheduler import TimingWheel, jitter
+
+
+class TestTimingWheel:
+
+    def test_fires_in_order_of_deadlines(self):
+        wheel = TimingWheel(tick=1, slots=4, levels=2)
+        wheel.schedule('late', 40)
+        wheel.schedule('soon', 3)
+        assert wheel.advance(2) == []
+        assert wheel.advance(3) == [('soon', 3)]
+        assert wheel.advance(39) == []
+        assert wheel.advance(45) == [('late', 40)], (
+            'Проверьте, что таймер дальше горизонта колеса не теряется.'
+        )
+        assert wheel.lag.max == 5, (
+            'Проверьте, что колесо считает отставание срабатывания.'
+        )
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimingWheel(tick=1, slots=4, levels=3)
+        wheel.schedule('a', 10)
+        wheel.schedule('b', 10)
+        assert wheel.cancel('a')
+        assert not wheel.cancel('a')
+        wheel.schedule('b', 20)
+        assert wheel.advance(15) == []
+        assert wheel.advance(20) == [('b', 20)]
+        assert len(wheel) == 0
+
+    def test_matches_brute_force(self):
+        rng = random.Random(0)
+        wheel = TimingWheel(tick=1, slots=4, levels=3)
+        expected = {}
+        now = 0
+        for _ in range(2000):
+            key = rng.randrange(50)
+            if rng.random() < 0.5:
+                expected[key] = now + rng.randint(0, 150)
+                wheel.schedule(key, expected[key])
+            else:
+                now += rng.randint(0, 10)
+                for fired, when in wheel.advance(now):
+                    assert expected.pop(fired) == when
+                assert all(when > now for when in expected.values()), (
+                    'Проверьте, что все просроченные таймеры срабатывают.'
+                )
+
+    def test_schedule_before_start(self):
+        with pytest.raises(ValueError):
+            TimingWheel(start=100).schedule('a', 50)
+
+
+class TestJitter:
+
+    def test_jitter_is_deterministic_and_bounded(self):
+        offsets = [jitter(f'tenant-{index}', 600) for index in range(1000)]
+        assert offsets == [
+            jitter(f'tenant-{index}', 600) for index in range(1000)
+        ]
+        assert all(0 <= offset <= 600 for offset in offsets)
+        buckets = {int(offset // 60) for offset in offsets}
+        assert len(buckets) == 10, (
+            'Проверьте, что старты аккаунтов распределены по периоду.'
+        )
@@ -0,0 +1,113 @@
+import asyncio
+from functools import partial
+
+import telegram
+
+from outbox import ERROR, Message, Outbox
+from sender import RateLimitedSender
+
+
+class TestRateLimitedSender:
+
+    def test_retry_after_pauses_and_resends(self):
+        calls = []
+
+        async def deliver(message):
+            calls.append(message.text)
+            if len(calls) == 1:
+                raise telegram.error.RetryAfter(0.01)
+            return message.text
+
+        sender = RateLimitedSender(deliver, global_rate=1000, chat_rate=1000)
+        assert asyncio.run(sender.send(Message(1, 'text'))) == 'text', (
+            'Проверьте, что после `RetryAfter` сообщение отправляется снова.'
+        )
+        assert calls == ['text', 'text']
+        stats = sender.stats()
+        assert stats['retried'] == 1 and stats['delivered'] == 1
+
+    def test_gives_up_after_max_attempts(self):
+        async def deliver(message):
+            raise telegram.error.RetryAfter(0)
+
+        sender = RateLimitedSender(deliver, global_rate=1000, chat_rate=1000,
+                                   max_attempts=2)
+        assert asyncio.run(sender.send(Message(1, 'text'))) is None
+
+    def test_chat_limit_spaces_messages(self):
+        moments = []
+
+        async def deliver(message):
+            moments.append(asyncio.get_running_loop().time())
+            return message.text
+
+        async def scenario():
+            sender = RateLimitedSender(deliver, global_rate=1000,
+                                       chat_rate=20)
+            await asyncio.gather(*(
+                sender.send(Message(1, str(index))) for index in range(3)
+            ))
+
+        asyncio.run(scenario())
+        assert moments[2] - moments[0] >= 0.09, (
+            'Проверьте, что сообщения в один чат не превышают его лимит.'
+        )
+
+    def test_chat_backlog_does_not_block_other_chats(self):
+        sent = []
+
+        async def deliver(message):
+            sent.append((message.text, asyncio.get_running_loop().time()))
+            return message.text
+
+        async def scenario():
+            sender = RateLimitedSender(deliver, global_rate=1000,
+                                       chat_rate=20)
+            outbox = Outbox(
+                partial(sender.send, reserved=True), workers=2,
+                ready=sender.chat_delay
+            )
+            await outbox.start()
+            started = asyncio.get_running_loop().time()
+            for index in range(6):
+                await outbox.put(Message('A', f'A{index}'))
+            await outbox.put(Message('B', 'B'))
+            await outbox.join()
+            await outbox.stop()
+            return started
+
+        started = asyncio.run(scenario())
+        moments = dict(sent)
+        assert moments['B'] - started < 0.05, (
+            'Проверьте, что очередь одного чата не задерживает другие чаты.'
+        )
+        assert [text for text, _ in sent if text != 'B'] == [
+            f'A{index}' for index in range(6)
+        ], 'Проверьте, что сообщения одного чата уходят по порядку.'
+        assert moments['A5'] - moments['A0'] >= 0.24, (
+            'Проверьте, что отложенные сообщения соблюдают лимит чата.'
+        )
+
+
+class TestPriorities:
+
+    def test_verdicts_go_before_errors(self):
+        order = []
+
+        async def send(message):
+            order.append(message.kind)
+            return message
+
+        async def scenario():
+            outbox = Outbox(send, workers=1)
+            outbox.queue = asyncio.PriorityQueue()
+            await outbox.put(Message(1, 'error', kind=ERROR))
+            await outbox.put(Message(1, 'verdict'))
+            outbox.tasks = [asyncio.create_task(outbox.worker())]
+            await outbox.join()
+            await outbox.stop()
+
+        asyncio.run(scenario())
+        assert order == ['verdict', 'error'], (
+            'Проверьте, что вердикты отправляются раньше ошибок.'
+        )
@@ -0,0 +1,42 @@
+import requests
+from requests.adapters import BaseAdapter
+
+from sessions import PooledSession
+
+
+class RecordingAdapter(BaseAdapter):
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{}'
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class TestPooledSession:
+
+    def test_default_timeout(self):
+        adapter = RecordingAdapter()
+        with PooledSession(timeout=(1, 2)) as session:
+            session.mount('https://', adapter)
+            session.get('https://example.com/')
+            session.get('https://example.com/', timeout=7)
+        assert adapter.timeouts == [(1, 2), 7], (
+            'Проверьте, что сессия подставляет таймауты по умолчанию и '
+            'не перекрывает явно переданные.'
+        )
+
+    def test_pool_size(self):
+        with PooledSession(pool_size=3) as session:
+            adapter = session.get_adapter('https://practicum.yandex.ru/')
+            assert adapter._pool_maxsize == 3, (
+                'Проверьте, что размер пула соединений настраивается.'
+            )
@@ -0,0 +1,44 @@
+from statuses import StatusIndex
+
+
+def homework(id, status, date, name='hw'):
+    return {'id': id, 'homework_name': name, 'status': status,
+            'date_updated': date}
+
+
+class TestStatusIndex:
+
+    def test_diff_returns_all_new_statuses_oldest_first(self):
+        index = StatusIndex()
+        homeworks = [
+            homework(2, 'reviewing', '2026-10-02T10:00:00Z'),
+            homework(1, 'approved', '2026-10-01T10:00:00Z'),
+        ]
+        assert [hw['id'] for hw in index.diff(homeworks)] == [1, 2], (
+            'Проверьте, что в ответе обрабатываются все работы, '
+            'от старых изменений к новым.'
+        )
+
+    def test_commit_suppresses_repeated_status(self):
+        index = StatusIndex()
+        first = homework(1, 'reviewing', '2026-10-01T10:00:00Z')
+        index.commit(first)
+        assert index.diff([first]) == [], (
+            'Проверьте, что об известном статусе не сообщается повторно.'
+        )
+        second = homework(1, 'approved', '2026-10-02T10:00:00Z')
+        assert index.diff([second]) == [second]
+        assert len(index) == 1
+
+    def test_new_review_with_same_status_is_transition(self):
+        index = StatusIndex()
+        index.commit(homework(1, 'rejected', '2026-10-01T10:00:00Z'))
+        again = homework(1, 'rejected', '2026-10-05T10:00:00Z')
+        assert index.diff([again]) == [again]
+
+    def test_name_is_key_without_id(self):
+        index = StatusIndex()
+        index.commit({'homework_name': 'hw1', 'status': 'approved'})
+        assert index.diff([{'homework_name': 'hw1', 'status': 'approved'},
+                           {'homework_name': 'hw2', 'status': 'approved'}]
+                          ) == [{'homework_name': 'hw2', 'status': 'approved'}]
@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from storage import (
+    BatchingStore, LogStore, MemoryStore, SQLiteStore, ThreadedStore,
+    open_store
+)
+
+
+def write_state(path, name, barrier, count):
+    store = SQLiteStore(path, batch_size=1000, flush_interval=3600)
+    store.save_timestamp(name, 1)
+    barrier.wait(timeout=1)
+    for number in range(count):
+        store.put_message(name, str(number), '12345', 'text')
+    store.close()
+
+
+@pytest.fixture(params=['sqlite', 'log'])
+def reopen(request, tmp_path):
+    path = str(tmp_path / 'state')
+
+    def reopen_store(**kwargs):
+        backend = {'sqlite': SQLiteStore, 'log': LogStore}[request.param]
+        return backend(path, **kwargs)
+
+    return reopen_store
+
+
+class TestStores:
+
+    def test_state_survives_restart(self, reopen):
+        store = reopen()
+        store.save_timestamp('student', 1000)
+        index = store.load_index('student')
+        index.commit({'id': 7, 'homework_name': 'hw',
+                      'status': 'approved', 'date_updated': 'today'})
+        index.commit({'homework_name': 'hw2', 'status': 'reviewing'})
+        store.put_message('student', 'm1', '12345', 'text')
+        store.put_message('student', 'm2', '12345', 'text')
+        store.ack_message('student', 'm1')
+        store.save_board('student', '12345', 42, 'abc', {7: ('hw', 'ok')})
+        store.close()
+
+        store = reopen()
+        assert store.load_timestamp('student', 0) == 1000, (
+            'Проверьте, что `from_date` переживает перезапуск.'
+        )
+        index = store.load_index('student')
+        assert index.get({'id': 7}) == ('approved', 'today'), (
+            'Проверьте, что индекс статусов переживает перезапуск.'
+        )
+        assert index.get({'homework_name': 'hw2'}) == ('reviewing', None)
+        assert [message[:3] for message in store.pending_messages(
+            'student'
+        )] == [('m2', '12345', 'text')], (
+            'Проверьте, что переживают перезапуск только недоставленные '
+            'сообщения.'
+        )
+        assert store.load_board('student', '12345') == (
+            42, 'abc', {7: ('hw', 'ok')}
+        ), 'Проверьте, что доска статусов переживает перезапуск.'
+        store.close()
+
+    def test_changes_are_batched(self, reopen):
+        store = reopen(batch_size=3, flush_interval=3600)
+        store.save_timestamp('a', 1)
+        store.save_timestamp('b', 2)
+        assert store.pending == 2
+        store.save_timestamp('c', 3)
+        assert store.pending == 0, (
+            'Проверьте, что пачка записывается при достижении размера.'
+        )
+        store.close()
+
+
+class TestLogStore:
+
+    def test_compaction_keeps_state(self, tmp_path):
+        path = str(tmp_path / 'state.log')
+        store = LogStore(path, batch_size=10)
+        for timestamp in range(100):
+            store.save_timestamp('student', timestamp)
+        store.close()
+        with open(path) as file:
+            assert len(file.readlines()) < 100, (
+                'Проверьте, что журнал сжимается при разрастании.'
+            )
+        assert LogStore(path).load_timestamp('student', None) == 99
+
+    def test_disk_is_written_off_caller_thread(self, tmp_path, monkeypatch):
+        path = str(tmp_path / 'state.log')
+        store = LogStore(path, batch_size=5, flush_interval=3600)
+        threads = set()
+        fsync = os.fsync
+
+        def record_fsync(descriptor):
+            threads.add(threading.current_thread().name)
+            fsync(descriptor)
+
+        monkeypatch.setattr(os, 'fsync', record_fsync)
+        index = store.load_index('student')
+        for number in range(100):
+            index.commit({'id': number % 7, 'status': str(number)})
+        store.flush()
+        assert threads == {'log-store'}, (
+            'Проверьте, что журнал синхронизируется и сжимается в потоке '
+            'записи, а не в вызывающем.'
+        )
+        store.close()
+        assert LogStore(path).load_index('student').get({'id': 1}) == (
+            '99', None
+        )
+
+    def test_broken_record_is_skipped(self, tmp_path):
+        path = tmp_path / 'state.log'
+        path.write_text('["from_date", "a", 5]\n{broken\n')
+        assert LogStore(str(path)).load_timestamp('a', None) == 5
+
+
+class TestSQLiteStore:
+
+    def test_reload_reads_other_replica(self, tmp_path):
+        path = str(tmp_path / 'state')
+        first = SQLiteStore(path)
+        second = SQLiteStore(path)
+        second.load_index('student')
+        first.save_timestamp('student', 1000)
+        first.load_index('student').commit(
+            {'id': 7, 'homework_name': 'hw', 'status': 'approved'}
+        )
+        first.put_message('student', 'm1', '12345', 'text')
+        first.flush()
+        second.reload('student')
+        assert second.load_timestamp('student', 0) == 1000, (
+            'Проверьте, что `reload` перечитывает `from_date` аккаунта.'
+        )
+        assert second.load_index('student').get({'id': 7}) == (
+            'approved', None
+        ), 'Проверьте, что `reload` перечитывает индекс статусов.'
+        assert [message[0] for message in second.pending_messages(
+            'student'
+        )] == ['m1']
+        first.close()
+        second.close()
+
+    def test_processes_share_database(self, tmp_path):
+        path = str(tmp_path / 'state')
+        SQLiteStore(path).close()
+        context = multiprocessing.get_context()
+        barrier = context.Barrier(2)
+        processes = [
+            context.Process(
+                target=write_state, args=(path, name, barrier, 200)
+            )
+            for name in ('first', 'second')
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(1.5)
+            if process.is_alive():
+                process.kill()
+        assert [process.exitcode for process in processes] == [0, 0], (
+            'Проверьте, что незаписанная пачка одного процесса не '
+            'блокирует базу для другого.'
+        )
+        store = SQLiteStore(path)
+        assert store.timestamps == {'first': 1, 'second': 1}
+        assert [
+            len(store.pending_messages(name)) for name in ('first', 'second')
+        ] == [200, 200], 'Проверьте, что изменения всех процессов записаны.'
+        store.close()
+
+
+@pytest.mark.parametrize('base', [BatchingStore, ThreadedStore])
+def test_write_hook_is_abstract(base):
+    class Incomplete(base):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_open_store():
+    assert isinstance(open_store('memory'), MemoryStore)
+    with pytest.raises(ValueError):
+        open_store('redis')
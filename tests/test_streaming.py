@@ -0,0 +1,95 @@
+import json
+import tracemalloc
+
+import pytest
+
+from decoder import HOMEWORKS_NOT_IN_RESPONSE, MISSED_HOMEWORK_KEYS
+from streaming import HomeworkStream
+
+
+def homeworks(count):
+    for number in range(count):
+        yield {'id': number, 'homework_name': f'Работа {number}',
+               'status': 'approved', 'date_updated': '2026-10-17T10:00:00Z'}
+
+
+def chunked(body, size):
+    return (body[start:start + size] for start in range(0, len(body), size))
+
+
+class TestHomeworkStream:
+
+    @pytest.mark.parametrize('size', [1, 7, 4096])
+    def test_chunk_boundaries(self, size):
+        body = json.dumps({
+            'homeworks': list(homeworks(20)), 'current_date': 1234567
+        }, ensure_ascii=False).encode()
+        stream = HomeworkStream(chunked(body, size))
+        records = list(stream)
+        assert [record.id for record in records] == list(range(20)), (
+            'Проверьте, что все работы разбираются при любом делении ответа.'
+        )
+        assert records[3].homework_name == 'Работа 3'
+        assert stream.current_date == 1234567, (
+            'Проверьте, что число на границе кусков читается целиком.'
+        )
+
+    def test_records_arrive_before_download_ends(self):
+        served = []
+
+        def chunks():
+            yield b'{"homeworks": ['
+            for number, homework in enumerate(homeworks(1000)):
+                served.append(number)
+                yield (',' if number else '').encode() + json.dumps(
+                    homework
+                ).encode()
+            yield b'], "current_date": 1}'
+
+        first = next(iter(HomeworkStream(chunks())))
+        assert first.id == 0 and len(served) < 5, (
+            'Проверьте, что работа отдаётся до окончания загрузки.'
+        )
+
+    def test_memory_stays_flat(self):
+        def body(count):
+            yield b'{"homeworks": ['
+            for number, homework in enumerate(homeworks(count)):
+                yield (',' if number else '').encode() + json.dumps(
+                    homework
+                ).encode()
+            yield b']}'
+
+        peaks = []
+        for count in (100, 1000):
+            tracemalloc.start()
+            for _ in HomeworkStream(body(count)):
+                pass
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        assert peaks[1] < peaks[0] * 2, (
+            'Проверьте, что пиковая память не растёт с размером истории.'
+        )
+
+    @pytest.mark.parametrize('body, error, message', [
+        (b'{"current_date": 1}', KeyError, HOMEWORKS_NOT_IN_RESPONSE),
+        (b'{"homeworks": [{"status": "approved"}]}', KeyError,
+         MISSED_HOMEWORK_KEYS.format('homework_name')),
+        (b'{"homeworks": {}}', TypeError, ''),
+        (b'[]', ValueError, ''),
+        (b'{"homeworks": [', ValueError, ''),
+    ])
+    def test_invalid_response(self, body, error, message):
+        with pytest.raises(error) as info:
+            list(HomeworkStream(chunked(body, 3)))
+        assert message in str(info.value)
+
+    def test_api_error_is_checked(self):
+        def check(fields):
+            if 'code' in fields:
+                raise RuntimeError(fields['code'])
+
+        with pytest.raises(RuntimeError):
+            list(HomeworkStream(
+                [b'{"code": "not_authenticated"}'], check=check
+            ))
@@ -0,0 +1,31 @@
+from collections import namedtuple
+
+from subscriptions import Subscriptions
+
+Tenant = namedtuple(
+    'Tenant', ('name', 'practicum_token', 'chat_id', 'subscribers')
+)
+
+
+class TestSubscriptions:
+
+    def test_same_token_is_polled_once(self):
+        subscriptions = Subscriptions.from_tenants([
+            Tenant('student', 'token', '1', ('2',)),
+            Tenant('mentor', 'token', '3', ()),
+            Tenant('other', 'token2', '4', ('4',)),
+        ])
+        assert [tenant.name for tenant in subscriptions.tenants()] == [
+            'student', 'other'
+        ], 'Проверьте, что каждый токен опрашивается одним аккаунтом.'
+        assert subscriptions.chats_of(Tenant('x', 'token', '', ())) == [
+            '1', '2', '3'
+        ], 'Проверьте, что на токен подписаны все его чаты.'
+        assert len(subscriptions) == 4
+
+    def test_unsubscribe_keeps_last_chat(self):
+        tenant = Tenant('student', 'token', '1', ('2',))
+        subscriptions = Subscriptions.from_tenants([tenant])
+        subscriptions.unsubscribe(tenant, '1')
+        subscriptions.unsubscribe(tenant, '2')
+        assert subscriptions.chats_of(tenant) == ['2']
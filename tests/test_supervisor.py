@@ -0,0 +1,95 @@
+import sys
+import time
+from collections import namedtuple
+
+import pytest
+
+Tenant = namedtuple('Tenant', ('name', 'practicum_token', 'chat_id'))
+
+
+def crash(name, tenants, reports, period):
+    reports.put((name, 0, 1.0, {'tenants': len(tenants), 'polls': 1,
+                                'delivered': 0, 'failed': 0}))
+    sys.exit(1)
+
+
+@pytest.fixture
+def supervisor_module():
+    import supervisor
+    return supervisor
+
+
+def make_tenants(count):
+    return [Tenant(f't{i}', f'token{i}', str(i)) for i in range(count)]
+
+
+class TestHashRing:
+
+    def test_assigns_every_tenant(self, supervisor_module):
+        ring = supervisor_module.HashRing(['a', 'b', 'c', 'd'])
+        shards = ring.assign(make_tenants(1000))
+        assert sum(map(len, shards.values())) == 1000
+        assert all(len(shard) > 150 for shard in shards.values()), (
+            'Проверьте, что аккаунты распределяются по процессам равномерно.'
+        )
+
+    def test_adding_node_moves_few_tenants(self, supervisor_module):
+        tenants = make_tenants(1000)
+        ring = supervisor_module.HashRing(['a', 'b', 'c', 'd'])
+        before = {t.name: ring.node(t.practicum_token) for t in tenants}
+        ring.add('e')
+        after = {t.name: ring.node(t.practicum_token) for t in tenants}
+        moved = [name for name in before if before[name] != after[name]]
+        assert 100 < len(moved) < 300, (
+            'Проверьте, что при добавлении процесса переезжает около 1/N '
+            'аккаунтов.'
+        )
+        assert all(after[name] == 'e' for name in moved), (
+            'Проверьте, что аккаунты переезжают только на новый процесс.'
+        )
+        ring.remove('e')
+        assert {
+            t.name: ring.node(t.practicum_token) for t in tenants
+        } == before, 'Проверьте, что удаление процесса возвращает аккаунты.'
+
+    def test_shared_token_stays_together(self, supervisor_module):
+        ring = supervisor_module.HashRing(['a', 'b', 'c'])
+        tenants = [Tenant(f't{i}', 'shared', str(i)) for i in range(10)]
+        shards = ring.assign(tenants)
+        assert sorted(map(len, shards.values())) == [0, 0, 10], (
+            'Проверьте, что аккаунты с общим токеном попадают в один процесс.'
+        )
+
+
+class TestSupervisor:
+
+    def test_worker_stats_rates(self, supervisor_module):
+        stats = supervisor_module.WorkerStats()
+        stats.update(1, 10.0, {'polls': 10, 'delivered': 0})
+        stats.update(1, 12.0, {'polls': 30, 'delivered': 4})
+        assert stats.rates == {'polls': 10.0, 'delivered': 2.0}
+        stats.update(2, 13.0, {'polls': 1, 'delivered': 0})
+        assert stats.rates == {'polls': 10.0, 'delivered': 2.0}, (
+            'Проверьте, что после перезапуска скорость не считается по '
+            'счётчикам прежнего процесса.'
+        )
+
+    def test_restarts_crashed_workers(self, supervisor_module):
+        supervisor = supervisor_module.Supervisor(
+            make_tenants(20), workers=2, target=crash, restart_delay=0
+        )
+        supervisor.start()
+        try:
+            for process in list(supervisor.processes.values()):
+                process.join(1)
+            supervisor.check(time.monotonic())
+            for process in list(supervisor.processes.values()):
+                process.join(1)
+        finally:
+            supervisor.stop()
+        assert [
+            stats.restarts for stats in supervisor.stats.values()
+        ] == [1, 1], 'Проверьте, что упавший процесс перезапускается.'
+        assert sum(
+            stats.counters['tenants'] for stats in supervisor.stats.values()
+        ) == 20, 'Проверьте, что супервизор собирает отчёты процессов.'